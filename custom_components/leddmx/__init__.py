@@ -1,22 +1,63 @@
 from __future__ import annotations
 
+from homeassistant.components import bluetooth
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, Event
+from homeassistant.core import HomeAssistant, Event, callback
 from homeassistant.const import CONF_MAC, EVENT_HOMEASSISTANT_STOP
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, CONF_RESET, CONF_DELAY
-from .dmxled import BJLEDInstance
+from .color import DEFAULT_PIPELINE, ColorPipeline
+from .const import (
+    DOMAIN,
+    CONF_ADAPTIVE_DELAY,
+    CONF_RESET,
+    CONF_DELAY,
+    CONF_GAMMA,
+    CONF_MAX_PARALLEL,
+    CONF_MEMBERS,
+    CONF_TRANSITION_FPS,
+    CONF_WHITE_BALANCE,
+    CONF_WRITE_RATE,
+    CONF_ADAPTIVE_RATE,
+    CONF_FINAL_RESENDS,
+    CONF_OPTIMISTIC,
+    CONF_STATE_RATE,
+    CONF_OFFLINE_MAX_AGE,
+)
+from .dmxled import (
+    DEFAULT_FINAL_RESENDS,
+    DEFAULT_OFFLINE_MAX_AGE,
+    BJLEDInstance,
+)
+from .gatt_cache import async_get_gatt_cache
+from .group import DEFAULT_MAX_PARALLEL, BJLEDGroup
+from .publish import DEFAULT_STATE_RATE
+from .ratelimit import DEFAULT_WRITE_RATE
+from .services import async_setup_services, async_stop_music_sync
+from .transition import DEFAULT_TRANSITION_FPS
 import logging
 
 LOGGER = logging.getLogger(__name__)
 PLATFORMS = ["light"]
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the LEDDMX services."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up from a config entry."""
+    if CONF_MEMBERS in entry.data:
+        return await _async_setup_group_entry(hass, entry)
     reset = entry.options.get(CONF_RESET, None) or entry.data.get(CONF_RESET, None)
     delay = entry.options.get(CONF_DELAY, None) or entry.data.get(CONF_DELAY, None)
     LOGGER.debug("Config Reset data: %s and config delay data: %s", reset, delay)
+    await async_get_gatt_cache(hass)
 
     instance = BJLEDInstance(
         entry.data[CONF_MAC],
@@ -25,6 +66,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         delay,
         hass,
     )
+    _apply_options(instance, entry)
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = instance
 
@@ -38,6 +80,54 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     entry.async_on_unload(
         hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
     )
+
+    @callback
+    def _async_advertisement(
+        service_info: bluetooth.BluetoothServiceInfoBleak,
+        change: bluetooth.BluetoothChange,
+    ) -> None:
+        """Mark the device available and pre-warm when it shows up again."""
+        instance.advertisement_seen(service_info)
+
+    entry.async_on_unload(
+        bluetooth.async_register_callback(
+            hass,
+            _async_advertisement,
+            bluetooth.BluetoothCallbackMatcher(address=instance.mac, connectable=True),
+            bluetooth.BluetoothScanningMode.PASSIVE,
+        )
+    )
+
+    @callback
+    def _async_unavailable(service_info: bluetooth.BluetoothServiceInfoBleak) -> None:
+        """Stop connecting once the device is no longer advertising."""
+        instance.advertising_stopped()
+
+    entry.async_on_unload(
+        bluetooth.async_track_unavailable(
+            hass, _async_unavailable, instance.mac, connectable=True
+        )
+    )
+
+    async def _async_prepare_on_start(hass: HomeAssistant) -> None:
+        """Connect once Home Assistant is up so the first command is fast."""
+        await instance.prepare("startup")
+
+    entry.async_on_unload(async_at_started(hass, _async_prepare_on_start))
+    return True
+
+
+async def _async_setup_group_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up a group of devices from a config entry."""
+    group = BJLEDGroup(
+        entry.data["name"],
+        entry.data[CONF_MEMBERS],
+        hass,
+        entry.data.get(CONF_MAX_PARALLEL, DEFAULT_MAX_PARALLEL),
+    )
+    hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN][entry.entry_id] = group
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
@@ -46,13 +136,51 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         instance = hass.data[DOMAIN][entry.entry_id]
+        await async_stop_music_sync(hass, [instance])
         await instance.stop()
     hass.data[DOMAIN].pop(entry.entry_id)
     return unload_ok
 
 
+def _apply_options(instance: BJLEDInstance, entry: ConfigEntry) -> None:
+    """Apply the entry options to a device instance."""
+    instance.color_pipeline = _color_pipeline(entry)
+    instance.transition_fps = entry.options.get(
+        CONF_TRANSITION_FPS, DEFAULT_TRANSITION_FPS
+    )
+    instance.adaptive_delay = entry.options.get(CONF_ADAPTIVE_DELAY, True)
+    instance.rate_limiter.configure(
+        entry.options.get(CONF_WRITE_RATE, DEFAULT_WRITE_RATE),
+        entry.options.get(CONF_ADAPTIVE_RATE, True),
+    )
+    instance.final_resends = entry.options.get(
+        CONF_FINAL_RESENDS, DEFAULT_FINAL_RESENDS
+    )
+    instance.optimistic = entry.options.get(CONF_OPTIMISTIC, False)
+    instance.state_throttle.configure(
+        entry.options.get(CONF_STATE_RATE, DEFAULT_STATE_RATE)
+    )
+    instance.offline_max_age = entry.options.get(
+        CONF_OFFLINE_MAX_AGE, DEFAULT_OFFLINE_MAX_AGE
+    )
+
+
+def _color_pipeline(entry: ConfigEntry) -> ColorPipeline:
+    """Build the color pipeline from the entry options.
+
+    Entries without gamma or white balance share the default pipeline.
+    """
+    white_balance = entry.options.get(CONF_WHITE_BALANCE)
+    pipeline = ColorPipeline(
+        entry.options.get(CONF_GAMMA),
+        tuple(white_balance) if white_balance else None,
+    )
+    return DEFAULT_PIPELINE if pipeline == DEFAULT_PIPELINE else pipeline
+
+
 async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Handle options update."""
     instance = hass.data[DOMAIN][entry.entry_id]
+    _apply_options(instance, entry)
     if entry.title != instance.name:
         await hass.config_entries.async_reload(entry.entry_id)
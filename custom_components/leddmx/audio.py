@@ -0,0 +1,297 @@
+"""Audio-reactive streaming for LEDDMX strips.
+
+PCM audio is read from a WAV file, a raw PCM file or pipe, or a TCP socket
+in a worker thread. Each hop the worker runs a windowed FFT over the last
+block of samples, folds the spectrum into bass/mid/treble energies with a
+single matrix product and maps them to red/green/blue. Only the resulting
+color crosses into the event loop, where the newest one is written to every
+target instance; colors that are superseded before they are written are
+dropped rather than queued, so the light never lags behind the music.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+import logging
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, BinaryIO
+from urllib.parse import urlparse
+import wave
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .dmxled import BJLEDInstance
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MUSIC_FPS = 30
+DEFAULT_SAMPLE_RATE = 44100
+BLOCK_SIZE = 2048
+# Bass, mid and treble bands in Hz, mapped to red, green and blue
+BANDS: tuple[tuple[float, float], ...] = ((20, 250), (250, 2000), (2000, 8000))
+# Per-frame decay of the running band peaks used for automatic gain
+PEAK_DECAY = 0.995
+SOCKET_TIMEOUT = 5.0
+
+
+class BandAnalyzer:
+    """Map blocks of mono samples to colors from their band energies."""
+
+    def __init__(self, sample_rate: int, block_size: int = BLOCK_SIZE) -> None:
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self._window = np.hanning(block_size)
+        frequencies = np.fft.rfftfreq(block_size, 1 / sample_rate)
+        # (bands, bins) matrix so band energies are one matrix product
+        self._band_matrix = np.stack(
+            [(frequencies >= low) & (frequencies < high) for low, high in BANDS]
+        ).astype(np.float64)
+        self._peaks = np.full(len(BANDS), 1e-9)
+
+    def energies(self, blocks: np.ndarray) -> np.ndarray:
+        """Return log band energies for an ``(N, block_size)`` sample array."""
+        spectrum = np.fft.rfft(blocks * self._window, axis=-1)
+        power = spectrum.real**2 + spectrum.imag**2
+        return np.log1p(power @ self._band_matrix.T)
+
+    def colors(self, blocks: np.ndarray) -> np.ndarray:
+        """Return an ``(N, 3)`` uint8 color array for consecutive blocks.
+
+        Each band is normalized by a running peak that decays over time, so
+        quiet passages still use the full color range.
+        """
+        energies = np.atleast_2d(self.energies(blocks))
+        levels = np.empty_like(energies)
+        peaks = self._peaks
+        for index, energy in enumerate(energies):
+            peaks = np.maximum(peaks * PEAK_DECAY, energy)
+            levels[index] = energy / peaks
+        self._peaks = peaks
+        return np.rint(np.clip(levels, 0, 1) ** 2 * 255).astype(np.uint8)
+
+
+@dataclass
+class AudioFormat:
+    """Format of raw signed 16-bit little-endian PCM."""
+
+    sample_rate: int = DEFAULT_SAMPLE_RATE
+    channels: int = 1
+
+
+def _to_mono(raw: bytes, channels: int) -> np.ndarray:
+    samples = np.frombuffer(raw, dtype="<i2").astype(np.float64) / 32768
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels]
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+class AudioSource:
+    """Read mono samples in hops from a WAV file, raw PCM file/pipe or socket.
+
+    ``source`` is a path (``.wav`` files are parsed, anything else is raw
+    PCM in ``audio_format``) or ``tcp://host:port`` for raw PCM over TCP.
+    """
+
+    def __init__(self, source: str, audio_format: AudioFormat | None = None) -> None:
+        self.source = source
+        self.format = audio_format or AudioFormat()
+        self._stream: BinaryIO | None = None
+        self._socket: socket.socket | None = None
+        self._wave: wave.Wave_read | None = None
+        # Files are read faster than real time, pipes and sockets are not
+        self.realtime = False
+
+    def open(self) -> None:
+        """Open the source; runs in the worker thread."""
+        url = urlparse(self.source)
+        if url.scheme == "tcp":
+            self._socket = socket.create_connection(
+                (url.hostname, url.port), timeout=SOCKET_TIMEOUT
+            )
+            self._stream = self._socket.makefile("rb")
+            return
+        if self.source.lower().endswith(".wav"):
+            self._wave = wave.open(self.source, "rb")
+            if self._wave.getsampwidth() != 2:
+                raise ValueError(f"{self.source}: only 16-bit WAV files are supported")
+            self.format = AudioFormat(
+                self._wave.getframerate(), self._wave.getnchannels()
+            )
+            self.realtime = True
+            return
+        self._stream = open(self.source, "rb")  # noqa: SIM115
+        self.realtime = self._stream.seekable()
+
+    def read(self, samples: int) -> np.ndarray:
+        """Return up to ``samples`` mono samples; empty at end of stream."""
+        if self._wave is not None:
+            return _to_mono(self._wave.readframes(samples), self.format.channels)
+        size = samples * 2 * self.format.channels
+        raw = self._stream.read(size) if self._stream else b""
+        return _to_mono(raw, self.format.channels)
+
+    def close(self) -> None:
+        """Close the source."""
+        for closable in (self._wave, self._stream, self._socket):
+            if closable is not None:
+                closable.close()
+        self._wave = self._stream = self._socket = None
+
+
+def iter_blocks(
+    source: AudioSource, hop: int, block_size: int = BLOCK_SIZE
+) -> Iterator[np.ndarray]:
+    """Yield the trailing ``block_size`` samples after every ``hop`` samples."""
+    block = np.zeros(block_size)
+    while True:
+        samples = source.read(hop)
+        if not len(samples):
+            return
+        samples = samples[-block_size:]
+        block = np.concatenate([block[len(samples) :], samples])
+        yield block
+
+
+@dataclass
+class MusicSyncStats:
+    """Throughput and audio-to-light latency of a music sync session."""
+
+    frames_analyzed: int = 0
+    frames_sent: int = 0
+    frames_dropped: int = 0
+    started: float = 0.0
+    stopped: float | None = None
+    max_latency: float = 0.0
+    _latency_total: float = field(default=0.0, repr=False)
+
+    def record_latency(self, latency: float) -> None:
+        """Record the delay from reading audio to writing its color."""
+        self._latency_total += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def mean_latency(self) -> float:
+        return self._latency_total / self.frames_sent if self.frames_sent else 0.0
+
+    @property
+    def achieved_fps(self) -> float:
+        end = self.stopped if self.stopped is not None else time.monotonic()
+        elapsed = end - self.started
+        return self.frames_sent / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "frames_analyzed": self.frames_analyzed,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "achieved_fps": round(self.achieved_fps, 2),
+            "mean_latency": round(self.mean_latency, 4),
+            "max_latency": round(self.max_latency, 4),
+        }
+
+
+class MusicSync:
+    """Stream colors derived from live audio to one or more instances."""
+
+    def __init__(
+        self,
+        instances: list[BJLEDInstance],
+        source: AudioSource,
+        fps: float = DEFAULT_MUSIC_FPS,
+    ) -> None:
+        self.instances = instances
+        self.source = source
+        self.fps = fps
+        self.stats = MusicSyncStats()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._writer: asyncio.Task | None = None
+        self._latest: tuple[tuple[int, int, int], float] | None = None
+        self._ready = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    def start(self) -> None:
+        """Start the analysis thread and the writer task."""
+        self.stats = MusicSyncStats(started=time.monotonic())
+        self._thread = threading.Thread(
+            target=self._analyze, name="leddmx_music_sync", daemon=True
+        )
+        self._thread.start()
+        self._writer = self._loop.create_task(self._write_colors())
+
+    async def stop(self) -> None:
+        """Stop the session and wait for the writer to finish."""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self.stats.stopped = time.monotonic()
+
+    def _analyze(self) -> None:
+        """Read and analyze audio; runs in the worker thread."""
+        try:
+            self.source.open()
+            sample_rate = self.source.format.sample_rate
+            hop = max(1, round(sample_rate / self.fps))
+            analyzer = BandAnalyzer(sample_rate)
+            started = time.monotonic()
+            for count, block in enumerate(iter_blocks(self.source, hop), 1):
+                if self._stop.is_set():
+                    return
+                if self.source.realtime:
+                    # Play files back in real time so the light follows the audio
+                    ahead = started + count * hop / sample_rate - time.monotonic()
+                    if ahead > 0:
+                        self._stop.wait(ahead)
+                captured = time.monotonic()
+                red, green, blue = analyzer.colors(block[None, :])[0].tolist()
+                self.stats.frames_analyzed += 1
+                self._loop.call_soon_threadsafe(
+                    self._publish, (red, green, blue), captured
+                )
+        except (OSError, ValueError, wave.Error) as err:
+            LOGGER.error("Music sync source %s failed: %s", self.source.source, err)
+        finally:
+            self.source.close()
+            self._stop.set()
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    def _publish(self, color: tuple[int, int, int], captured: float) -> None:
+        if self._latest is not None:
+            self.stats.frames_dropped += 1
+        self._latest = (color, captured)
+        self._ready.set()
+
+    async def _write_colors(self) -> None:
+        while True:
+            if self._latest is None:
+                if self._stop.is_set():
+                    break
+                await self._ready.wait()
+                self._ready.clear()
+                continue
+            color, captured = self._latest
+            self._latest = None
+            results = await asyncio.gather(
+                *(instance.write_stream_color(color) for instance in self.instances),
+                return_exceptions=True,
+            )
+            for instance, result in zip(self.instances, results):
+                if isinstance(result, Exception):
+                    LOGGER.debug("%s: Music sync write failed: %s", instance.name, result)
+            self.stats.frames_sent += 1
+            self.stats.record_latency(time.monotonic() - captured)
+        self.stats.stopped = time.monotonic()
+        LOGGER.debug("Music sync finished: %s", self.stats.as_dict())
@@ -0,0 +1,122 @@
+"""Fast-fail for strips that cannot be reached.
+
+A strip that is unplugged or out of range makes every command wait for
+``establish_connection`` and its retries while holding the connect lock, and
+every later command queues up behind it. The breaker counts consecutive
+failed connections. Once it opens, commands fail immediately without
+touching the radio. The next advertisement from the device (or, failing
+that, a long cooldown) half-opens it: one connection is tried, and its
+outcome closes or re-opens the breaker.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from bleak.exc import BleakError
+
+LOGGER = logging.getLogger(__name__)
+
+# Consecutive failed connections that open the breaker; each one already
+# includes the connection retries of bleak_retry_connector
+FAILURE_THRESHOLD = 3
+# Half-open after this long even if no advertisement was seen
+OPEN_COOLDOWN = 300.0
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(BleakError):
+    """The device failed too often; the call was rejected without connecting."""
+
+
+class CircuitBreaker:
+    """Track connection failures of one device and reject calls while open."""
+
+    def __init__(
+        self,
+        name: str,
+        threshold: int = FAILURE_THRESHOLD,
+        cooldown: float = OPEN_COOLDOWN,
+    ) -> None:
+        self._name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at: float | None = None
+        self.last_error: str | None = None
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == STATE_OPEN
+            and asyncio.get_running_loop().time() - self._opened_at >= self.cooldown
+        ):
+            self._half_open("cooldown")
+        return self._state
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if calls are currently rejected."""
+        if self.state == STATE_OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"{self._name}: Device unreachable after {self._failures} failed "
+                "connections, waiting for it to advertise again"
+            )
+
+    def record_success(self) -> bool:
+        """Close after a connection; returns True if the state changed."""
+        self._failures = 0
+        if self._state == STATE_CLOSED:
+            return False
+        LOGGER.debug("%s: Circuit breaker closed", self._name)
+        self._state = STATE_CLOSED
+        self._opened_at = None
+        return True
+
+    def record_failure(self, err: BaseException) -> bool:
+        """Count a failed connection; returns True if the breaker opened."""
+        self._failures += 1
+        self.last_error = f"{type(err).__name__}: {err}"
+        if self._state == STATE_OPEN:
+            return False
+        if self._state == STATE_CLOSED and self._failures < self.threshold:
+            return False
+        LOGGER.debug(
+            "%s: Circuit breaker opened after %s failed connections: %s",
+            self._name,
+            self._failures,
+            self.last_error,
+        )
+        self._state = STATE_OPEN
+        self._opened_at = asyncio.get_running_loop().time()
+        self.opened += 1
+        return True
+
+    def advertisement_seen(self) -> bool:
+        """Let one connection through again; returns True if the state changed."""
+        if self._state != STATE_OPEN:
+            return False
+        self._half_open("advertisement")
+        return True
+
+    def _half_open(self, reason: str) -> None:
+        LOGGER.debug("%s: Circuit breaker half-open (%s)", self._name, reason)
+        self._state = STATE_HALF_OPEN
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the breaker state for diagnostics."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "threshold": self.threshold,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,109 @@
+"""Encode and decode LEDDMX BLE frames.
+
+Every frame is nine bytes: ``7b ff <cmd> <p0> <p1> <p2> <p3> <p4> bf``.
+The RGB command (``07``) carries the scaled color in ``p0..p2``; the
+effect command (``03``) carries the firmware effect id in ``p0``.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import numpy as np
+
+from .effects import effects_dmx
+
+FRAME_LENGTH = 9
+FRAME_START = 0x7B
+FRAME_END = 0xBF
+CMD_EFFECT = 0x03
+CMD_RGB = 0x07
+
+RGB_OFFSET = 3
+EFFECT_ID_OFFSET = 3
+
+_RGB_TEMPLATE = bytes.fromhex("7b ff 07 00 00 00 00 ff bf")
+_EFFECT_TEMPLATE = bytes.fromhex("7b ff 03 00 ff ff ff ff bf")
+_RGB_TEMPLATE_ARRAY = np.frombuffer(_RGB_TEMPLATE, dtype=np.uint8)
+
+
+class FrameError(ValueError):
+    """Raised when a frame does not follow the LEDDMX framing."""
+
+
+class DecodedFrame(NamedTuple):
+    """A validated frame split into its command and payload."""
+
+    command: int
+    payload: bytes
+
+    @property
+    def rgb(self) -> tuple[int, int, int] | None:
+        """Return the color carried by an RGB frame."""
+        if self.command != CMD_RGB:
+            return None
+        return (self.payload[0], self.payload[1], self.payload[2])
+
+    @property
+    def effect_id(self) -> int | None:
+        """Return the firmware effect id carried by an effect frame."""
+        if self.command != CMD_EFFECT:
+            return None
+        return self.payload[0]
+
+
+def encode_rgb(red: int, green: int, blue: int) -> bytes:
+    """Return a new RGB frame, built in a single allocation."""
+    return bytes((FRAME_START, 0xFF, CMD_RGB, red, green, blue, 0x00, 0xFF, FRAME_END))
+
+
+def encode_effect(effect_id: int) -> bytes:
+    """Return the frame that starts a firmware effect."""
+    frame = bytearray(_EFFECT_TEMPLATE)
+    frame[EFFECT_ID_OFFSET] = effect_id
+    return bytes(frame)
+
+
+def encode_rgb_batch(colors: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """Encode an ``(N, 3)`` array of colors into an ``(N, 9)`` frame array.
+
+    The result is C-contiguous, so ``result.tobytes()`` (or
+    ``memoryview(result)``) is the frame stream in order. Pass ``out`` to
+    reuse a preallocated array of the same shape.
+    """
+    colors = np.asarray(colors)
+    if colors.ndim != 2 or colors.shape[1] != 3:
+        raise ValueError(f"Expected an (N, 3) color array, got {colors.shape}")
+    if out is None:
+        out = np.empty((colors.shape[0], FRAME_LENGTH), dtype=np.uint8)
+    out[:] = _RGB_TEMPLATE_ARRAY
+    out[:, RGB_OFFSET : RGB_OFFSET + 3] = colors
+    return out
+
+
+def iter_frames(stream: bytes | bytearray | memoryview) -> Iterator[memoryview]:
+    """Yield each frame of a frame stream as a zero-copy view."""
+    view = memoryview(stream)
+    if len(view) % FRAME_LENGTH:
+        raise FrameError(f"Stream length {len(view)} is not a multiple of {FRAME_LENGTH}")
+    for offset in range(0, len(view), FRAME_LENGTH):
+        yield view[offset : offset + FRAME_LENGTH]
+
+
+def decode_frame(frame: bytes | bytearray | memoryview) -> DecodedFrame:
+    """Validate a frame and return its command and payload."""
+    frame = bytes(frame)
+    if len(frame) != FRAME_LENGTH:
+        raise FrameError(f"Frame must be {FRAME_LENGTH} bytes, got {len(frame)}")
+    if frame[0] != FRAME_START or frame[1] != 0xFF or frame[-1] != FRAME_END:
+        raise FrameError(f"Bad frame delimiters: {frame.hex()}")
+    if frame[2] not in (CMD_RGB, CMD_EFFECT):
+        raise FrameError(f"Unknown command {frame[2]:#04x}: {frame.hex()}")
+    return DecodedFrame(frame[2], frame[3:-1])
+
+
+TURN_ON_FRAME = encode_rgb(0x00, 0x00, 0xFF)
+TURN_OFF_FRAME = encode_rgb(0x00, 0x00, 0x00)
+EFFECT_FRAMES: dict[str, bytes] = {
+    name: encode_effect(effect_id) for name, effect_id in effects_dmx.items()
+}
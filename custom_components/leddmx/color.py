@@ -0,0 +1,90 @@
+"""Color pipeline for LEDDMX frames.
+
+Brightness scaling, gamma correction and white balance are all lookup
+tables built once, so scaling a color is a few index operations per frame
+and a whole ``(N, 3)`` batch is scaled with vectorized NumPy indexing.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+_LEVELS = np.arange(256, dtype=np.uint32)
+
+# BRIGHTNESS_LUT[brightness, value] == round(value * brightness / 255)
+BRIGHTNESS_LUT: np.ndarray = (
+    (_LEVELS[:, None] * _LEVELS[None, :] + 127) // 255
+).astype(np.uint8)
+_BRIGHTNESS_ROWS: list[list[int]] = BRIGHTNESS_LUT.tolist()
+_IDENTITY_LUT: np.ndarray = _LEVELS.astype(np.uint8)
+
+
+def gamma_lut(gamma: float) -> np.ndarray:
+    """Return a 256-entry table mapping linear levels to gamma-corrected ones."""
+    if gamma <= 0:
+        raise ValueError(f"Gamma must be positive, got {gamma}")
+    return np.rint(255 * (_LEVELS / 255) ** gamma).astype(np.uint8)
+
+
+def white_balance_luts(white_balance: tuple[int, int, int]) -> np.ndarray:
+    """Return a ``(3, 256)`` table scaling each channel to the given white point."""
+    return np.stack([BRIGHTNESS_LUT[level] for level in white_balance])
+
+
+class ColorPipeline:
+    """Scale colors by brightness, then apply optional gamma and white balance."""
+
+    def __init__(
+        self,
+        gamma: float | None = None,
+        white_balance: tuple[int, int, int] | None = None,
+    ) -> None:
+        if gamma == 1.0:
+            gamma = None
+        if white_balance is not None and tuple(white_balance) == (255, 255, 255):
+            white_balance = None
+        self.gamma = gamma
+        self.white_balance = tuple(white_balance) if white_balance else None
+        channel_luts = np.stack([_IDENTITY_LUT] * 3)
+        if gamma is not None and gamma != 1.0:
+            channel_luts = np.stack([gamma_lut(gamma)] * 3)
+        if white_balance is not None:
+            balance = white_balance_luts(white_balance)
+            channel_luts = np.stack(
+                [balance[channel][channel_luts[channel]] for channel in range(3)]
+            )
+        self._channel_luts = channel_luts
+        self._channel_rows: list[list[int]] = channel_luts.tolist()
+
+    def __eq__(self, other: object) -> bool:
+        # Equal settings give equal tables, so encoded frames can be shared
+        if not isinstance(other, ColorPipeline):
+            return NotImplemented
+        return (self.gamma, self.white_balance) == (other.gamma, other.white_balance)
+
+    def __hash__(self) -> int:
+        return hash((self.gamma, self.white_balance))
+
+    def scale(
+        self, rgb: tuple[int, int, int], brightness: int
+    ) -> tuple[int, int, int]:
+        """Return the output color for ``rgb`` at ``brightness`` (0-255)."""
+        row = _BRIGHTNESS_ROWS[brightness]
+        red, green, blue = self._channel_rows
+        return (red[row[rgb[0]]], green[row[rgb[1]]], blue[row[rgb[2]]])
+
+    def scale_batch(
+        self, colors: np.ndarray, brightness: int | np.ndarray
+    ) -> np.ndarray:
+        """Scale an ``(N, 3)`` color array by one or ``N`` brightness levels."""
+        colors = np.asarray(colors, dtype=np.uint8)
+        brightness = np.asarray(brightness, dtype=np.uint8)
+        if brightness.ndim:
+            brightness = brightness[:, None]
+        scaled = BRIGHTNESS_LUT[brightness, colors]
+        out = np.empty_like(scaled)
+        for channel in range(3):
+            out[:, channel] = self._channel_luts[channel][scaled[:, channel]]
+        return out
+
+
+DEFAULT_PIPELINE = ColorPipeline()
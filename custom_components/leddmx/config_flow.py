@@ -17,9 +17,31 @@ from homeassistant.components.bluetooth import (
 from homeassistant.const import CONF_MAC
 from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
+import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.device_registry import format_mac
 
-from .const import CONF_DELAY, CONF_RESET, DOMAIN
+from .const import (
+    CONF_ADAPTIVE_DELAY,
+    CONF_ADAPTIVE_RATE,
+    CONF_DELAY,
+    CONF_FINAL_RESENDS,
+    CONF_GAMMA,
+    CONF_MAX_PARALLEL,
+    CONF_MEMBERS,
+    CONF_OFFLINE_MAX_AGE,
+    CONF_OPTIMISTIC,
+    CONF_RESET,
+    CONF_STATE_RATE,
+    CONF_TRANSITION_FPS,
+    CONF_WHITE_BALANCE,
+    CONF_WRITE_RATE,
+    DOMAIN,
+)
+from .dmxled import DEFAULT_FINAL_RESENDS, DEFAULT_OFFLINE_MAX_AGE
+from .group import DEFAULT_MAX_PARALLEL
+from .publish import DEFAULT_STATE_RATE
+from .ratelimit import DEFAULT_WRITE_RATE
+from .transition import DEFAULT_TRANSITION_FPS
 
 LOGGER = logging.getLogger(__name__)
 DATA_SCHEMA = vol.Schema({("host"): str})
@@ -65,6 +87,7 @@ class BJLEDFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         self._discovered_device: DeviceData | None = None
         self._discovered_devices: list[DeviceData] = []
         self._scan_task: asyncio.Task[None] | None = None
+        self._pick_device = False
 
     async def async_step_bluetooth(
         self, discovery_info: BluetoothServiceInfoBleak
@@ -95,6 +118,15 @@ class BJLEDFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     ) -> FlowResult:
         """Handle the user step to pick discovered device."""
         LOGGER.debug(f"step_user context: {self.context}")
+        if (
+            user_input is None
+            and not self._pick_device
+            and self.context.get("source") == config_entries.SOURCE_USER
+            and len(self._device_entries()) >= 2
+        ):
+            return self.async_show_menu(
+                step_id="user", menu_options=["device", "group"]
+            )
         if user_input is not None:
             self.mac = user_input[CONF_MAC]
             LOGGER.debug(f"MAC address: {self.mac}")
@@ -149,6 +181,60 @@ class BJLEDFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             errors={},
         )
 
+    async def async_step_device(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Add a single device."""
+        self._pick_device = True
+        return await self.async_step_user()
+
+    async def async_step_group(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Create a group light that drives several devices concurrently."""
+        errors = {}
+        devices = {
+            entry.data[CONF_MAC].upper(): entry.title
+            for entry in self._device_entries()
+        }
+        if user_input is not None:
+            members = sorted(user_input[CONF_MEMBERS])
+            if len(members) < 2:
+                errors[CONF_MEMBERS] = "too_few_members"
+            else:
+                await self.async_set_unique_id(f"group_{'_'.join(members)}")
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title=user_input["name"],
+                    data={
+                        "name": user_input["name"],
+                        CONF_MEMBERS: members,
+                        CONF_MAX_PARALLEL: user_input[CONF_MAX_PARALLEL],
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="group",
+            data_schema=vol.Schema(
+                {
+                    vol.Required("name"): str,
+                    vol.Required(CONF_MEMBERS): cv.multi_select(devices),
+                    vol.Optional(
+                        CONF_MAX_PARALLEL, default=DEFAULT_MAX_PARALLEL
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+                }
+            ),
+            errors=errors,
+        )
+
+    def _device_entries(self) -> list[config_entries.ConfigEntry]:
+        """Return the configured single-device entries."""
+        return [
+            entry
+            for entry in self._async_current_entries(include_ignore=False)
+            if CONF_MAC in entry.data
+        ]
+
     async def async_step_discover(
         self, user_input: "dict[str, Any] | None" = None
     ) -> FlowResult:
@@ -236,6 +322,12 @@ class BJLEDFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     def async_get_options_flow(entry: config_entries.ConfigEntry):
         return OptionsFlowHandler(entry)
 
+    @classmethod
+    @callback
+    def async_supports_options_flow(cls, entry: config_entries.ConfigEntry) -> bool:
+        """Groups have no device options."""
+        return CONF_MAC in entry.data
+
 
 class OptionsFlowHandler(config_entries.OptionsFlow):
     def __init__(self, config_entry):
@@ -251,18 +343,100 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         errors = {}
         options = self.config_entry.options or {CONF_RESET: False, CONF_DELAY: 120}
         if user_input is not None:
-            return self.async_create_entry(
-                title="",
-                data={
-                    CONF_RESET: user_input[CONF_RESET],
-                    CONF_DELAY: user_input[CONF_DELAY],
-                },
-            )
+            try:
+                white_balance = _parse_white_balance(user_input.get(CONF_WHITE_BALANCE))
+            except ValueError:
+                errors[CONF_WHITE_BALANCE] = "invalid_white_balance"
+            else:
+                return self.async_create_entry(
+                    title="",
+                    data={
+                        CONF_RESET: user_input.get(CONF_RESET, options.get(CONF_RESET)),
+                        CONF_DELAY: user_input[CONF_DELAY],
+                        CONF_ADAPTIVE_DELAY: user_input.get(CONF_ADAPTIVE_DELAY, True),
+                        CONF_GAMMA: user_input.get(CONF_GAMMA),
+                        CONF_WHITE_BALANCE: white_balance,
+                        CONF_TRANSITION_FPS: user_input.get(
+                            CONF_TRANSITION_FPS, DEFAULT_TRANSITION_FPS
+                        ),
+                        CONF_WRITE_RATE: user_input.get(
+                            CONF_WRITE_RATE, DEFAULT_WRITE_RATE
+                        ),
+                        CONF_ADAPTIVE_RATE: user_input.get(CONF_ADAPTIVE_RATE, True),
+                        CONF_FINAL_RESENDS: user_input.get(
+                            CONF_FINAL_RESENDS, DEFAULT_FINAL_RESENDS
+                        ),
+                        CONF_OPTIMISTIC: user_input.get(CONF_OPTIMISTIC, False),
+                        CONF_STATE_RATE: user_input.get(
+                            CONF_STATE_RATE, DEFAULT_STATE_RATE
+                        ),
+                        CONF_OFFLINE_MAX_AGE: user_input.get(
+                            CONF_OFFLINE_MAX_AGE, DEFAULT_OFFLINE_MAX_AGE
+                        ),
+                    },
+                )
 
+        white_balance = options.get(CONF_WHITE_BALANCE)
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema(
-                {vol.Optional(CONF_DELAY, default=options.get(CONF_DELAY)): int}
+                {
+                    vol.Optional(CONF_DELAY, default=options.get(CONF_DELAY)): int,
+                    vol.Optional(
+                        CONF_ADAPTIVE_DELAY,
+                        default=options.get(CONF_ADAPTIVE_DELAY, True),
+                    ): bool,
+                    vol.Optional(
+                        CONF_GAMMA, default=options.get(CONF_GAMMA) or 1.0
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=5.0)),
+                    vol.Optional(
+                        CONF_WHITE_BALANCE,
+                        default=",".join(str(v) for v in white_balance)
+                        if white_balance
+                        else "255,255,255",
+                    ): str,
+                    vol.Optional(
+                        CONF_TRANSITION_FPS,
+                        default=options.get(CONF_TRANSITION_FPS, DEFAULT_TRANSITION_FPS),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+                    vol.Optional(
+                        CONF_WRITE_RATE,
+                        default=options.get(CONF_WRITE_RATE, DEFAULT_WRITE_RATE),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+                    vol.Optional(
+                        CONF_ADAPTIVE_RATE,
+                        default=options.get(CONF_ADAPTIVE_RATE, True),
+                    ): bool,
+                    vol.Optional(
+                        CONF_FINAL_RESENDS,
+                        default=options.get(CONF_FINAL_RESENDS, DEFAULT_FINAL_RESENDS),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=5)),
+                    vol.Optional(
+                        CONF_OPTIMISTIC, default=options.get(CONF_OPTIMISTIC, False)
+                    ): bool,
+                    vol.Optional(
+                        CONF_STATE_RATE,
+                        default=options.get(CONF_STATE_RATE, DEFAULT_STATE_RATE),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.2, max=10)),
+                    vol.Optional(
+                        CONF_OFFLINE_MAX_AGE,
+                        default=options.get(
+                            CONF_OFFLINE_MAX_AGE, DEFAULT_OFFLINE_MAX_AGE
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+                }
             ),
             errors=errors,
         )
+
+
+def _parse_white_balance(value: str | None) -> list[int] | None:
+    """Parse an "R,G,B" white point, returning None when it is neutral."""
+    if not value:
+        return None
+    levels = [int(level) for level in value.split(",")]
+    if len(levels) != 3 or not all(0 <= level <= 255 for level in levels):
+        raise ValueError(f"Invalid white balance: {value}")
+    if levels == [255, 255, 255]:
+        return None
+    return levels
@@ -0,0 +1,291 @@
+"""Connection slots shared by every LEDDMX device on a Bluetooth adapter.
+
+An adapter (a local controller or an ESPHome proxy) can only hold a few
+connections at once. When every device connects on its own, a busy strip
+that needs a slot keeps failing while idle strips sit on theirs until their
+disconnect timer fires. The manager hands out the slots of each adapter:
+a device that needs one takes a free slot, else the least recently used
+idle device on that adapter is disconnected for it, else it waits in a
+first-come first-served queue until a slot is released.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import logging
+from typing import TYPE_CHECKING, Any
+
+from bleak.exc import BleakError
+
+from homeassistant.components import bluetooth
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_CONNECTION_MANAGER
+
+if TYPE_CHECKING:
+    from .dmxled import BJLEDInstance
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ADAPTER = "default"
+# How long a device waits in the queue for a slot before giving up
+SLOT_WAIT_TIMEOUT = 30.0
+
+
+@dataclass
+class AdapterSlots:
+    """Slot bookkeeping for one adapter."""
+
+    source: str
+    limit: int
+    # Connected devices, least recently used first
+    holders: OrderedDict[BJLEDInstance, None] = field(default_factory=OrderedDict)
+    # Every device that has connected through this adapter
+    devices: set[BJLEDInstance] = field(default_factory=set)
+    waiters: deque[tuple[BJLEDInstance, asyncio.Future]] = field(
+        default_factory=deque
+    )
+    granted: int = 0
+    evictions: int = 0
+    waits: int = 0
+    timeouts: int = 0
+    # Pre-warms turned away rather than evicting or queueing
+    declined: int = 0
+
+    @property
+    def free(self) -> bool:
+        return len(self.holders) < self.limit
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the slot usage for diagnostics."""
+        return {
+            "limit": self.limit,
+            "in_use": len(self.holders),
+            "devices": len(self.devices),
+            "holders": [instance.name for instance in self.holders],
+            "waiting": [instance.name for instance, _ in self.waiters],
+            "granted": self.granted,
+            "evictions": self.evictions,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "declined": self.declined,
+        }
+
+
+class ConnectionManager:
+    """Schedule the connection slots of every adapter between devices."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        default_slots: int = bluetooth.DEFAULT_CONNECTION_SLOTS,
+    ) -> None:
+        self._hass = hass
+        self._default_slots = default_slots
+        self._adapters: dict[str, AdapterSlots] = {}
+
+    def adapter_for(self, instance: BJLEDInstance) -> str:
+        """Return the source of the adapter that reaches ``instance``.
+
+        That is the scanner it is connected through, else the one Home
+        Assistant would likely pick from its advertisements. Before one was
+        seen, proxies name their source in the BLEDevice details, and local
+        BlueZ adapters are looked up by the adapter in the details.
+        """
+        if instance.source:
+            return instance.source
+        details = instance.ble_device.details
+        if not isinstance(details, dict):
+            return DEFAULT_ADAPTER
+        if details.get("source"):
+            return details["source"]
+        if adapter_path := details.get("props", {}).get("Adapter"):
+            adapter = adapter_path.rsplit("/", 1)[-1]
+            for scanner_device in bluetooth.async_scanner_devices_by_address(
+                self._hass, instance.mac, True
+            ):
+                if getattr(scanner_device.scanner, "adapter", None) == adapter:
+                    return scanner_device.scanner.source
+        return DEFAULT_ADAPTER
+
+    def _slots(self, instance: BJLEDInstance) -> AdapterSlots:
+        source = self.adapter_for(instance)
+        if (slots := self._adapters.get(source)) is None:
+            slots = self._adapters[source] = AdapterSlots(source, self._default_slots)
+        slots.limit = self._slot_limit(slots)
+        return slots
+
+    def _slot_limit(self, slots: AdapterSlots) -> int:
+        """Return how many slots the adapter has left for LEDDMX devices.
+
+        Adapters that report their allocations lose the slots held by other
+        integrations; the rest fall back to the Home Assistant default.
+        """
+        if slots.source == DEFAULT_ADAPTER:
+            return self._default_slots
+        scanner = bluetooth.async_scanner_by_source(self._hass, slots.source)
+        get_allocations = getattr(scanner, "get_allocations", None)
+        allocations = get_allocations() if get_allocations else None
+        if allocations is None:
+            return self._default_slots
+        ours = {instance.mac for instance in slots.holders}
+        foreign = sum(1 for address in allocations.allocated if address not in ours)
+        return max(1, allocations.slots - foreign)
+
+    def slot_share(self, instance: BJLEDInstance) -> float:
+        """Return the share of time ``instance`` may hold a slot on its adapter."""
+        slots = self._slots(instance)
+        devices = len(slots.devices | {instance})
+        return min(1.0, slots.limit / devices)
+
+    def forget(self, instance: BJLEDInstance) -> None:
+        """Drop an unloaded device from the slot bookkeeping."""
+        self.release(instance)
+        for slots in self._adapters.values():
+            slots.devices.discard(instance)
+
+    def holds_slot(self, instance: BJLEDInstance) -> bool:
+        return any(instance in slots.holders for slots in self._adapters.values())
+
+    async def acquire(self, instance: BJLEDInstance, evict: bool = True) -> None:
+        """Wait until ``instance`` may open a connection on its adapter.
+
+        Without ``evict`` (a speculative pre-warm) only a free slot is
+        taken; live connections are not dropped and commands not queued
+        behind.
+        """
+        slots = self._slots(instance)
+        if instance in slots.holders:
+            slots.holders.move_to_end(instance)
+            return
+        if not evict:
+            if slots.free and not slots.waiters:
+                self._grant(slots, instance)
+                return
+            slots.declined += 1
+            raise BleakError(
+                f"{instance.name}: No connection slot free on {slots.source}"
+            )
+        while not slots.free and not slots.waiters:
+            if not await self._evict_idle(slots, instance):
+                break
+        if slots.free and not slots.waiters:
+            self._grant(slots, instance)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        slots.waiters.append((instance, waiter))
+        slots.waits += 1
+        LOGGER.debug(
+            "%s: Waiting for a connection slot on %s (%s queued)",
+            instance.name,
+            slots.source,
+            len(slots.waiters),
+        )
+        try:
+            await asyncio.wait_for(waiter, SLOT_WAIT_TIMEOUT)
+        except asyncio.TimeoutError as err:
+            slots.timeouts += 1
+            raise BleakError(
+                f"{instance.name}: No connection slot free on {slots.source}"
+            ) from err
+        finally:
+            if (instance, waiter) in slots.waiters:
+                slots.waiters.remove((instance, waiter))
+
+    def _grant(self, slots: AdapterSlots, instance: BJLEDInstance) -> None:
+        slots.holders[instance] = None
+        slots.devices.add(instance)
+        slots.granted += 1
+
+    async def _evict_idle(self, slots: AdapterSlots, requester: BJLEDInstance) -> bool:
+        """Disconnect the least recently used idle device; False if none is idle."""
+        for holder in slots.holders:
+            if holder is not requester and holder.connection_idle:
+                LOGGER.debug(
+                    "%s: Releasing connection slot on %s for %s",
+                    holder.name,
+                    slots.source,
+                    requester.name,
+                )
+                slots.evictions += 1
+                await holder.release_connection()
+                # The disconnect normally releases the slot itself
+                slots.holders.pop(holder, None)
+                return True
+        return False
+
+    def confirm(self, instance: BJLEDInstance) -> str | None:
+        """Return the adapter a new connection of ``instance`` went through.
+
+        Home Assistant picks the adapter itself, so it is read back from
+        the slot allocations and the slot moved there if it was charged to
+        another adapter. None if no adapter reports the connection.
+        """
+        for scanner_device in bluetooth.async_scanner_devices_by_address(
+            self._hass, instance.mac, True
+        ):
+            scanner = scanner_device.scanner
+            get_allocations = getattr(scanner, "get_allocations", None)
+            allocations = get_allocations() if get_allocations else None
+            if allocations is not None and instance.mac in allocations.allocated:
+                source = scanner.source
+                break
+        else:
+            return None
+        if source not in self._adapters:
+            self._adapters[source] = AdapterSlots(source, self._default_slots)
+        target = self._adapters[source]
+        for slots in self._adapters.values():
+            if slots is not target and instance in slots.holders:
+                LOGGER.debug(
+                    "%s: Connected through %s rather than %s",
+                    instance.name,
+                    source,
+                    slots.source,
+                )
+                del slots.holders[instance]
+                slots.devices.discard(instance)
+                target.holders[instance] = None
+                target.devices.add(instance)
+                self._wake_next(slots)
+        return source
+
+    def touch(self, instance: BJLEDInstance) -> None:
+        """Mark ``instance`` as the most recently used device on its adapter."""
+        for slots in self._adapters.values():
+            if instance in slots.holders:
+                slots.holders.move_to_end(instance)
+
+    def release(self, instance: BJLEDInstance) -> None:
+        """Give the slot of a disconnected device to the next device in line."""
+        for slots in self._adapters.values():
+            if instance in slots.holders:
+                del slots.holders[instance]
+                self._wake_next(slots)
+
+    def _wake_next(self, slots: AdapterSlots) -> None:
+        while slots.waiters and slots.free:
+            instance, waiter = slots.waiters.popleft()
+            if waiter.done():
+                continue
+            self._grant(slots, instance)
+            waiter.set_result(None)
+
+    def notify_idle(self, instance: BJLEDInstance) -> None:
+        """Hand the slot of an idle device over if another device is waiting."""
+        for slots in self._adapters.values():
+            if instance in slots.holders and slots.waiters:
+                asyncio.create_task(self._evict_idle(slots, slots.waiters[0][0]))
+                return
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Return the slot usage of every adapter."""
+        return {source: slots.as_dict() for source, slots in self._adapters.items()}
+
+
+def get_connection_manager(hass: HomeAssistant) -> ConnectionManager:
+    """Return the connection manager shared by all entries."""
+    if (manager := hass.data.get(DATA_CONNECTION_MANAGER)) is None:
+        manager = hass.data[DATA_CONNECTION_MANAGER] = ConnectionManager(hass)
+    return manager
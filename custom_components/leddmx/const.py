@@ -3,3 +3,28 @@ from enum import Enum
 DOMAIN = "leddmx"
 CONF_RESET = "reset"
 CONF_DELAY = "delay"
+CONF_ADAPTIVE_DELAY = "adaptive_delay"
+CONF_GAMMA = "gamma"
+CONF_WHITE_BALANCE = "white_balance"
+CONF_TRANSITION_FPS = "transition_fps"
+CONF_WRITE_RATE = "write_rate"
+CONF_ADAPTIVE_RATE = "adaptive_rate"
+CONF_FINAL_RESENDS = "final_resends"
+CONF_OPTIMISTIC = "optimistic"
+CONF_STATE_RATE = "state_rate"
+CONF_OFFLINE_MAX_AGE = "offline_max_age"
+CONF_MEMBERS = "members"
+CONF_MAX_PARALLEL = "max_parallel"
+DATA_MUSIC_SYNC = f"{DOMAIN}_music_sync"
+DATA_CONNECTION_MANAGER = f"{DOMAIN}_connection_manager"
+DATA_GATT_CACHE = f"{DOMAIN}_gatt_cache"
+
+EVENT_COMMAND_FAILED = f"{DOMAIN}_command_failed"
+
+SERVICE_MUSIC_SYNC_START = "music_sync_start"
+SERVICE_MUSIC_SYNC_STOP = "music_sync_stop"
+SERVICE_PREPARE = "prepare"
+ATTR_SOURCE = "source"
+ATTR_SAMPLE_RATE = "sample_rate"
+ATTR_CHANNELS = "channels"
+ATTR_FPS = "fps"
@@ -0,0 +1,35 @@
+"""Diagnostics support for LEDDMX."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_MAC
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_CONNECTION_MANAGER, DATA_MUSIC_SYNC, DOMAIN
+
+TO_REDACT = {CONF_MAC}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    instance = hass.data[DOMAIN][entry.entry_id]
+    music_sync = [
+        session.stats.as_dict()
+        for session in hass.data.get(DATA_MUSIC_SYNC, [])
+        if instance in session.instances
+    ]
+    connections = hass.data.get(DATA_CONNECTION_MANAGER)
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "instance": instance.diagnostics(),
+        "music_sync": music_sync,
+        "connection_slots": connections.diagnostics() if connections else {},
+    }
@@ -1,105 +1,338 @@
 import asyncio
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from functools import lru_cache
 
 # import traceback
 import logging
-from typing import Any, TypeVar, cast
+from typing import Any
 
 from bleak.backends.device import BLEDevice
 from bleak.backends.service import BleakGATTServiceCollection
-from bleak.exc import BleakDBusError, BleakError
+from bleak.exc import (
+    BleakCharacteristicNotFoundError,
+    BleakDBusError,
+    BleakError,
+)
 from bleak_retry_connector import (
     BLEAK_RETRY_EXCEPTIONS as BLEAK_EXCEPTIONS,
     BleakClientWithServiceCache,
-    # BleakError,
     BleakNotFoundError,
+    # BleakError,
     # ble_device_has_changed,
     establish_connection,
 )
+import numpy as np
 
 from homeassistant.components import bluetooth
 from homeassistant.components.light import ColorMode
 
 LOGGER = logging.getLogger(__name__)
 
+from .breaker import STATE_OPEN, CircuitBreaker
+from .color import DEFAULT_PIPELINE, ColorPipeline
+from .connection import get_connection_manager
+from .codec import (
+    EFFECT_FRAMES,
+    FRAME_LENGTH,
+    TURN_OFF_FRAME,
+    TURN_ON_FRAME,
+    FrameError,
+    decode_frame,
+    encode_rgb,
+    encode_rgb_batch,
+)
 from .effects import effects_dmx as EFFECT_MAP
+from .gatt_cache import get_gatt_cache
+from .keepalive import KeepAlivePolicy
+from .publish import PublishThrottle
+from .ratelimit import TokenBucket
+from .renderer import HOST_EFFECT_FPS, HOST_EFFECTS, render_effect
+from .routing import PathTracker
+from .retry import (
+    DEFAULT_RETRY_DEADLINE,
+    LaneRegistry,
+    RetryBudget,
+    retry_bluetooth_connection_error,
+)
+from .transition import TransitionEngine, TransitionStats
 
-EFFECT_LIST = ["None"] + list(EFFECT_MAP.keys())
+EFFECT_LIST = ["None"] + list(EFFECT_MAP.keys()) + list(HOST_EFFECTS.keys())
 
 LEDDMX_NAME_PREFIX = "leddmx-"
 WRITE_CHARACTERISTIC_UUIDS = ["0000ffe1-0000-1000-8000-00805f9b34fb"]
 
-TURN_ON_CMD = bytearray.fromhex("7b ff 07 00 00 ff 00 ff bf")
-TURN_OFF_CMD = bytearray.fromhex("7b ff 07 00 00 00 00 ff bf")
-DEFAULT_ATTEMPTS = 3
-BLEAK_BACKOFF_TIME = 0.25
-RETRY_BACKOFF_EXCEPTIONS = BleakDBusError
+TURN_ON_CMD = TURN_ON_FRAME
+TURN_OFF_CMD = TURN_OFF_FRAME
+
+# An advertisement after this long without one pre-warms the connection
+PREWARM_ABSENCE = 300.0
+
+# Write lanes: on/off is written first and supersedes stale color writes
+LANE_POWER = "power"
+LANE_STATE = "state"
+
+# State frames written closer together than this form a burst
+BURST_GAP = 1.0
+# Quiet time after a burst before its final frame is sent again
+SETTLE_QUIET = 0.3
+DEFAULT_FINAL_RESENDS = 2
+
+# Minimum time between two pushes of the known state after a drop, so a
+# device that keeps dropping out is not rewritten on every advertisement
+RECONCILE_INTERVAL = 60.0
+
+# Commands to an unreachable device are kept this long by default
+DEFAULT_OFFLINE_MAX_AGE = 300
+
+# The address of the device whose queued state is being written. A context
+# variable, as the retry runs each attempt in a task of its own
+_flushing: ContextVar[str | None] = ContextVar("leddmx_flushing", default=None)
+
+# Enough for every member of a group and a music stream's recent colors
+FRAME_CACHE_SIZE = 512
+
+
+@lru_cache(maxsize=FRAME_CACHE_SIZE)
+def _scaled_rgb_frame(
+    pipeline: ColorPipeline, rgb: tuple[int, int, int], brightness: int
+) -> bytes:
+    """Encode an RGB frame once per pipeline, color and brightness.
+
+    Instances sharing a pipeline (every group member on default options)
+    are handed the same immutable frame instead of encoding their own.
+    """
+    return encode_rgb(*pipeline.scale(rgb, brightness))
+
+
+class _PendingWrite:
+    """A frame waiting in the write queue and the callers waiting on it."""
+
+    __slots__ = ("data", "power", "response", "waiters", "submitted", "abandoned")
+
+    def __init__(
+        self,
+        data: bytes | bytearray,
+        power: bool,
+        waiter: asyncio.Future,
+        submitted: float,
+        response: bool = False,
+    ) -> None:
+        self.data = data
+        self.power = power
+        self.response = response
+        self.waiters = [waiter]
+        self.submitted = submitted
+        # Superseded while being written; its write was cancelled
+        self.abandoned = False
+
+
+class BJLEDWriteQueue:
+    """Serialize writes to one device in a power lane and a state lane.
+
+    Power frames (on/off) are written before any waiting state frame, in
+    submission order, and never dropped. A state frame (color, brightness,
+    effect) that is still waiting when a newer one arrives is replaced by
+    it, and every caller waiting on the replaced frame is resolved once the
+    newer frame has been written. A power frame submitted with
+    ``supersede`` (off) drops the waiting state frame instead and resolves
+    its callers with the power frame, so the strip is not turned back on.
+    A state frame already being written, possibly still connecting, is
+    abandoned the same way, so off does not wait behind its connect.
+
+    With a ``limiter`` the queue takes a token before picking each frame,
+    so state frames keep coalescing while it waits.
+
+    The last state frame written and the length of the burst it ended
+    (state frames written less than ``BURST_GAP`` apart) are kept so the
+    final state of a burst can be confirmed. A power frame ends the burst.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        writer: Callable[[bytes | bytearray], Awaitable[None]],
+        on_idle: Callable[[], None] | None = None,
+        limiter: TokenBucket | None = None,
+    ) -> None:
+        self._name = name
+        self._writer = writer
+        self._on_idle = on_idle
+        self._limiter = limiter
+        self._power: deque[_PendingWrite] = deque()
+        self._state: _PendingWrite | None = None
+        self._drain_task: asyncio.Task | None = None
+        # The frame being written and its write
+        self._current: _PendingWrite | None = None
+        self._current_write: asyncio.Future | None = None
+        self.written = 0
+        self.coalesced = 0
+        self.superseded = 0
+        self.abandoned = 0
+        self.last_state: bytes | None = None
+        self.burst = 0
+        self._last_state_time: float | None = None
+        # Whether the last frame written was a power frame
+        self.last_power = False
+        # Frames written and seconds they waited in the queue, per lane
+        self.lane_stats = {
+            lane: {"frames": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for lane in (LANE_POWER, LANE_STATE)
+        }
 
-WrapFuncType = TypeVar("WrapFuncType", bound=Callable[..., Any])
+    async def submit(
+        self,
+        data: bytes | bytearray,
+        power: bool = False,
+        supersede: bool = False,
+        response: bool = False,
+    ) -> None:
+        """Queue a frame and wait until it, or a newer state frame, is written.
 
+        ``response`` asks the device to acknowledge a state frame; a newer
+        frame coalesced into it is written without.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        if power:
+            pending = _PendingWrite(data, True, waiter, loop.time())
+            if supersede and self._state is not None:
+                # Resolved first, so the power command has the last word
+                pending.waiters[:0] = self._state.waiters
+                self._state = None
+                self.superseded += 1
+            if supersede:
+                self._abandon_state(pending)
+            self._power.append(pending)
+        elif self._state is not None:
+            self._state.data = data
+            self._state.response = response
+            self._state.waiters.append(waiter)
+            self.coalesced += 1
+            LOGGER.debug(
+                "%s: Coalesced pending write (%s so far)", self._name, self.coalesced
+            )
+        else:
+            self._state = _PendingWrite(data, False, waiter, loop.time(), response)
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain())
+        await waiter
+
+    def _abandon_state(self, power: _PendingWrite) -> None:
+        """Cancel the write of a state frame that ``power`` supersedes."""
+        current = self._current
+        if (
+            current is None
+            or current.power
+            or self._current_write is None
+            or self._current_write.done()
+        ):
+            return
+        LOGGER.debug("%s: Abandoning the state frame being written", self._name)
+        power.waiters[:0] = current.waiters
+        current.waiters = []
+        current.abandoned = True
+        self.abandoned += 1
+        self._current_write.cancel()
 
-def retry_bluetooth_connection_error(func: WrapFuncType) -> WrapFuncType:
-    async def _async_wrap_retry_bluetooth_connection_error(
-        self: "BJLEDInstance", *args: Any, **kwargs: Any
-    ) -> Any:
-        attempts = DEFAULT_ATTEMPTS
-        max_attempts = attempts - 1
+    def _next(self) -> _PendingWrite | None:
+        if self._power:
+            return self._power.popleft()
+        pending, self._state = self._state, None
+        return pending
 
-        for attempt in range(attempts):
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._power or self._state is not None:
+            if self._limiter is not None:
+                await self._limiter.acquire()
+            if (pending := self._next()) is None:
+                break
+            stats = self.lane_stats[LANE_POWER if pending.power else LANE_STATE]
+            wait = loop.time() - pending.submitted
+            stats["frames"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            self._current = pending
+            self._current_write = asyncio.ensure_future(
+                self._writer(pending.data, True)
+                if pending.response
+                else self._writer(pending.data)
+            )
             try:
-                return await func(self, *args, **kwargs)
-            except BleakNotFoundError:
-                # The lock cannot be found so there is no
-                # point in retrying.
-                raise
-            except RETRY_BACKOFF_EXCEPTIONS as err:
-                if attempt >= max_attempts:
-                    LOGGER.debug(
-                        "%s: %s error calling %s, reach max attempts (%s/%s)",
-                        self.name,
-                        type(err),
-                        func,
-                        attempt,
-                        max_attempts,
-                        exc_info=True,
-                    )
+                await self._current_write
+            except asyncio.CancelledError:
+                if not pending.abandoned:
                     raise
-                LOGGER.debug(
-                    "%s: %s error calling %s, backing off %ss, retrying (%s/%s)...",
-                    self.name,
-                    type(err),
-                    func,
-                    BLEAK_BACKOFF_TIME,
-                    attempt,
-                    max_attempts,
-                    exc_info=True,
-                )
-                await asyncio.sleep(BLEAK_BACKOFF_TIME)
-            except BLEAK_EXCEPTIONS as err:
-                if attempt >= max_attempts:
-                    LOGGER.debug(
-                        "%s: %s error calling %s, reach max attempts (%s/%s): %s",
-                        self.name,
-                        type(err),
-                        func,
-                        attempt,
-                        max_attempts,
-                        err,
-                        exc_info=True,
-                    )
-                    raise
-                LOGGER.debug(
-                    "%s: %s error calling %s, retrying  (%s/%s)...: %s",
-                    self.name,
-                    type(err),
-                    func,
-                    attempt,
-                    max_attempts,
-                    err,
-                    exc_info=True,
-                )
+                # Its callers wait on the power frame that superseded it
+                continue
+            except Exception as err:  # pylint: disable=broad-except
+                for waiter in pending.waiters:
+                    if not waiter.done():
+                        waiter.set_exception(err)
+            else:
+                self.written += 1
+                if pending.power:
+                    self.last_power = True
+                    self.end_burst()
+                else:
+                    self._record_state(pending.data, loop.time())
+                for waiter in pending.waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+            finally:
+                self._current = self._current_write = None
+        if self._on_idle is not None:
+            self._on_idle()
 
-    return cast(WrapFuncType, _async_wrap_retry_bluetooth_connection_error)
+    def _record_state(self, data: bytes | bytearray, now: float) -> None:
+        if self._last_state_time is not None and now - self._last_state_time < BURST_GAP:
+            self.burst += 1
+        else:
+            self.burst = 1
+        self._last_state_time = now
+        self.last_state = bytes(data)
+        self.last_power = False
+
+    def end_burst(self) -> None:
+        """Count the next state frame as the start of a new burst."""
+        self.burst = 0
+
+    @property
+    def busy(self) -> bool:
+        """Whether frames are waiting or being written."""
+        return self._drain_task is not None and not self._drain_task.done()
+
+    def clear(self) -> None:
+        """Drop every pending frame and cancel the callers waiting on them."""
+        if self._drain_task and not self._drain_task.done():
+            self._drain_task.cancel()
+        self._drain_task = None
+        while (pending := self._next()) is not None:
+            for waiter in pending.waiters:
+                waiter.cancel()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the queue statistics for diagnostics."""
+        return {
+            "written": self.written,
+            "coalesced": self.coalesced,
+            "superseded": self.superseded,
+            "abandoned": self.abandoned,
+            "lanes": {
+                lane: {
+                    "frames": stats["frames"],
+                    "mean_wait": (
+                        round(stats["wait_total"] / stats["frames"], 4)
+                        if stats["frames"]
+                        else None
+                    ),
+                    "max_wait": round(stats["wait_max"], 4),
+                }
+                for lane, stats in self.lane_stats.items()
+            },
+        }
 
 
 class BJLEDInstance:
@@ -111,9 +344,15 @@ class BJLEDInstance:
         self._reset = reset
         self._delay = delay
         self._hass = hass
-        self._device: BLEDevice = bluetooth.async_ble_device_from_address(
-            self._hass, address
-        ) or BLEDevice(address, name or "LEDDMX", None)
+        device = bluetooth.async_ble_device_from_address(self._hass, address)
+        self._device: BLEDevice = device or BLEDevice(address, name or "LEDDMX", None)
+        # Advertisements through other scanners may carry no name
+        self._name = self._device.name or name
+        # Known to the Bluetooth stack means it advertised recently
+        self._available = device is not None
+        self._availability_changes = 0
+        # Stopped advertising while connected; unavailable once disconnected
+        self._advertising_lost = False
         self._connect_lock: asyncio.Lock = asyncio.Lock()
         self._client: BleakClientWithServiceCache | None = None
         self._disconnect_timer: asyncio.TimerHandle | None = None
@@ -125,9 +364,84 @@ class BJLEDInstance:
         self._effect = None
         self._effect_speed = 0x64
         self._color_mode = ColorMode.RGB
-        self._write_uuid = None
+        self._write_uuid: str | None = None
+        # Whether the write characteristic can acknowledge writes
+        self._write_with_response = False
+        self._gatt_cache = get_gatt_cache(hass)
+        self._gatt_stats = {"restored": False, "resolved": 0, "invalidated": 0}
+        if self._gatt_cache and (cached := self._gatt_cache.get(address)):
+            self._write_uuid = cached["write_uuid"]
+            self._write_with_response = "write" in cached.get("properties", [])
+            self._gatt_stats["restored"] = True
+        self.color_pipeline: ColorPipeline = DEFAULT_PIPELINE
         self._turn_on_cmd = None
         self._turn_off_cmd = None
+        self.retry_deadline = DEFAULT_RETRY_DEADLINE
+        self.last_retry: RetryBudget | None = None
+        self.lanes = LaneRegistry()
+        self._breaker = CircuitBreaker(self.name)
+        self._connections = get_connection_manager(hass)
+        # Paths are keyed by the source of the scanner that advertised them
+        self._paths = PathTracker()
+        if isinstance(device.details if device else None, dict) and (
+            source := device.details.get("source")
+        ):
+            self._paths.record_advertisement(source, device, None, self.loop.time())
+        self._keepalive = KeepAlivePolicy()
+        self.adaptive_delay = True
+        # Set from the options; read by the light entity
+        self.optimistic = False
+        self._last_activity: float | None = None
+        self._last_seen: float | None = None
+        # When the last connection ended; a device need not advertise while
+        # connected, so that time does not count as absence
+        self._last_connected: float | None = None
+        self._prepare_tasks: set[asyncio.Task] = set()
+        self._prewarm_stats: dict[str, Any] = {
+            "count": 0,
+            "failures": 0,
+            "last_trigger": None,
+            "last_duration": None,
+        }
+        self.rate_limiter = TokenBucket()
+        self._write_queue = BJLEDWriteQueue(
+            self.name, self._write, self._write_queue_idle, self.rate_limiter
+        )
+        self.final_resends = DEFAULT_FINAL_RESENDS
+        # One timer per quiet period: each idle between stream frames only
+        # pushes its deadline back
+        self._settle_timer: asyncio.TimerHandle | None = None
+        self._settle_due = 0.0
+        self._settle_task: asyncio.Task | None = None
+        self._settle_stats = {"bursts": 0, "confirmed": 0, "resends": 0, "skipped": 0}
+        # Frames written when the device dropped out; None while nothing is owed
+        self._reconcile_after: int | None = None
+        self._reconcile_task: asyncio.Task | None = None
+        self._last_reconcile: float | None = None
+        self._reconcile_stats = {
+            "drops": 0,
+            "pushed": 0,
+            "frames": 0,
+            "skipped": 0,
+            "deferred": 0,
+            "rate_limited": 0,
+            "failures": 0,
+        }
+        # Set from the options; 0 fails commands to unreachable devices
+        self.offline_max_age = DEFAULT_OFFLINE_MAX_AGE
+        # When the last command was queued and the state from before the first
+        self._offline_queued_at: float | None = None
+        self._offline_base: tuple[Any, ...] | None = None
+        self._offline_stats = {"queued": 0, "flushed": 0, "expired": 0}
+        self._transition_engine = TransitionEngine()
+        self._transition_task: asyncio.Task | None = None
+        self._host_effect_task: asyncio.Task | None = None
+        self._host_effect_stats = {"frames_sent": 0, "frames_dropped": 0}
+        self._output_in_sync = True
+        self._callbacks: list[Callable[[], None]] = []
+        self._output_callbacks: list[Callable[[], None]] = []
+        # Set from the options; used by the light entity
+        self.state_throttle = PublishThrottle()
         self._model = self._detect_model()
 
         LOGGER.debug(
@@ -147,34 +461,150 @@ class BJLEDInstance:
         self._turn_off_cmd = TURN_OFF_CMD
         return 0
 
-    async def _write(self, data: bytearray):
+    async def _write(self, data: bytes | bytearray, response: bool = False):
         """Send command to device and read response."""
         if data is None:
             raise ValueError(f"{self.name}: Command data is None (device model may not be supported)")
         await self._ensure_connected()
-        await self._write_while_connected(data)
+        await self._write_while_connected(data, response)
 
-    async def _write_while_connected(self, data: bytearray):
+    async def _write_while_connected(
+        self, data: bytes | bytearray, response: bool = False
+    ):
         if data is None:
             return
         LOGGER.debug("%s: Writing data: %s", self.name, data.hex())
-        await self._client.write_gatt_char(self._write_uuid, data, False)
+        started = self.loop.time()
+        try:
+            await self._client.write_gatt_char(self._write_uuid, data, response)
+        except BleakError as err:
+            self.rate_limiter.record_write(self.loop.time() - started, False)
+            if isinstance(err, BleakCharacteristicNotFoundError):
+                await self._invalidate_characteristics()
+            raise
+        self._last_activity = self.loop.time()
+        if not response:
+            self.rate_limiter.record_write(self._last_activity - started, True)
+
+    def _write_queue_idle(self) -> None:
+        """Hand the adapter slot over if needed and confirm the end of a burst."""
+        self._connections.notify_idle(self)
+        if self._write_queue.last_power:
+            # On or off has the last word; re-sending the color would undo off
+            self._cancel_settle()
+            return
+        if self._write_queue.burst > 1 and self.final_resends:
+            self._settle_due = self.loop.time() + SETTLE_QUIET
+            if self._settle_timer is None:
+                self._settle_timer = self.loop.call_at(
+                    self._settle_due, self._settle_quiet
+                )
+
+    def _settle_quiet(self) -> None:
+        """Start confirming the burst once no frame was written for a while."""
+        self._settle_timer = None
+        if self.loop.time() < self._settle_due:
+            # Written since the timer was set; wait for the quiet again
+            self._settle_timer = self.loop.call_at(self._settle_due, self._settle_quiet)
+            return
+        if self._settle_task and not self._settle_task.done():
+            self._settle_task.cancel()
+        self._settle_task = self.loop.create_task(
+            self._settle(self._write_queue.last_state)
+        )
+
+    def _cancel_settle(self) -> None:
+        if self._settle_timer is not None:
+            self._settle_timer.cancel()
+            self._settle_timer = None
+        if self._settle_task and not self._settle_task.done():
+            self._settle_task.cancel()
+
+    async def _settle(self, frame: bytes) -> None:
+        """Make sure the final frame of a burst arrived now that writes are quiet.
+
+        Frames are written without response, so the last one of a burst may
+        be lost. It is written once more with response when the
+        characteristic supports it, else re-sent ``final_resends`` times.
+        Anything written in the meantime replaces it.
+        """
+        stats = self._settle_stats
+        confirm = self._write_with_response
+        for attempt in range(1 if confirm else self.final_resends):
+            if attempt:
+                await asyncio.sleep(SETTLE_QUIET)
+            queue = self._write_queue
+            if queue.busy or queue.last_power or queue.last_state != frame:
+                stats["skipped"] += 1
+                return
+            if not attempt:
+                stats["bursts"] += 1
+            # A re-sent frame does not extend the burst it confirms
+            self._write_queue.end_burst()
+            try:
+                await self._write_queue.submit(frame, response=confirm)
+            except BLEAK_EXCEPTIONS as err:
+                LOGGER.debug("%s: Could not confirm the final frame: %s", self.name, err)
+                return
+            stats["confirmed" if confirm else "resends"] += 1
+
+    async def _invalidate_characteristics(self) -> None:
+        """Forget the write characteristic and services after a failed write."""
+        LOGGER.debug("%s: Write characteristic is gone, resolving again", self.name)
+        self._gatt_stats["invalidated"] += 1
+        self._write_uuid = None
+        self._cached_services = None
+        if self._gatt_cache:
+            self._gatt_cache.invalidate(self.mac)
+        if self._client:
+            try:
+                await self._client.clear_cache()
+            except BLEAK_EXCEPTIONS as err:
+                LOGGER.debug("%s: Could not clear the services cache: %s", self.name, err)
+        # Reconnect on the retry so services are discovered from scratch
+        await self._execute_disconnect()
 
     @property
     def mac(self):
         return self._device.address
 
+    @property
+    def ble_device(self) -> BLEDevice:
+        return self._device
+
+    @property
+    def connection_idle(self) -> bool:
+        """Whether the connection can be dropped without interrupting anything."""
+        return not (
+            self._write_queue.busy
+            or self._connect_lock.locked()
+            or self.transitioning
+            or self._host_effect_task is not None
+        )
+
+    async def release_connection(self) -> None:
+        """Disconnect so another device can use the adapter slot."""
+        if self._disconnect_timer:
+            self._disconnect_timer.cancel()
+            self._disconnect_timer = None
+        await self._execute_disconnect()
+
     @property
     def reset(self):
         return self._reset
 
     @property
     def name(self):
-        return self._device.name
+        return self._name
+
+    @property
+    def rssi(self) -> int | None:
+        return self._paths.last_rssi
 
     @property
-    def rssi(self):
-        return self._device.rssi
+    def source(self) -> str | None:
+        """Source of the scanner the device is, or likely would be, connected on."""
+        return self._paths.source(self.loop.time())
 
     @property
     def is_on(self):
@@ -200,29 +630,221 @@ class BJLEDInstance:
     def color_mode(self):
         return self._color_mode
 
-    @retry_bluetooth_connection_error
+    def restore_state(
+        self,
+        is_on: bool | None,
+        rgb: tuple[int, int, int] | None,
+        brightness: int | None,
+        effect: str | None,
+    ) -> None:
+        """Take over the state the light had before a restart.
+
+        Only a fresh instance is restored. The output is not assumed to
+        match, so the first command still writes, but it writes a single
+        frame for the restored color instead of starting from nothing.
+        """
+        if self._is_on is not None or self._rgb_color is not None:
+            return
+        LOGGER.debug(
+            "%s: Restoring state: on=%s rgb=%s brightness=%s effect=%s",
+            self.name,
+            is_on,
+            rgb,
+            brightness,
+            effect,
+        )
+        self._is_on = is_on
+        if rgb is not None:
+            self._rgb_color = tuple(rgb)
+        if brightness is not None:
+            self._brightness = brightness
+        self._effect = effect if effect in EFFECT_LIST and effect != "None" else None
+        self._output_in_sync = False
+
+    @property
+    def available(self) -> bool:
+        """Whether the device is advertising, i.e. worth connecting to."""
+        return self._available
+
+    def set_available(self, available: bool) -> None:
+        """Record an availability change and publish it, if it is one."""
+        if available == self._available:
+            return
+        LOGGER.debug(
+            "%s: Device is %s", self.name, "available" if available else "unavailable"
+        )
+        self._available = available
+        self._availability_changes += 1
+        if not available:
+            # It may come back from a power cycle in its default mode
+            self._mark_dropped()
+        self.notify_state_changed()
+
+    def advertising_stopped(self) -> None:
+        """Mark the device unavailable once it is no longer advertising.
+
+        Many controllers stop advertising while a client is connected, and
+        proxies expire them after a few minutes. A live connection keeps
+        the device available until it ends.
+        """
+        if self._client and self._client.is_connected:
+            LOGGER.debug("%s: Not advertising while connected", self.name)
+            self._advertising_lost = True
+            return
+        self.set_available(False)
+
+    @property
+    def circuit_state(self) -> str:
+        """State of the circuit breaker: closed, open or half_open."""
+        return self._breaker.state
+
+    @property
+    def coalesced_writes(self) -> int:
+        """Number of state writes replaced by a newer one before being sent."""
+        return self._write_queue.coalesced
+
+    @property
+    def transition_fps(self) -> float:
+        return self._transition_engine.fps
+
+    @transition_fps.setter
+    def transition_fps(self, fps: float) -> None:
+        self._transition_engine.fps = fps
+
+    @property
+    def transition_stats(self) -> TransitionStats | None:
+        """Pacing statistics of the last transition."""
+        return self._transition_engine.last_stats
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Return runtime statistics for the diagnostics download."""
+        transition_stats = self.transition_stats
+        return {
+            "write_queue": {
+                **self._write_queue.as_dict(),
+                "commands_superseded": dict(self.lanes.superseded),
+            },
+            "rate_limit": self.rate_limiter.as_dict(),
+            "final_frame": {
+                "resends_configured": self.final_resends,
+                "with_response": self._write_with_response,
+                **self._settle_stats,
+            },
+            "transition": {
+                "fps": self.transition_fps,
+                "running": self.transitioning,
+                "last": transition_stats.as_dict() if transition_stats else None,
+            },
+            "host_effect": {
+                "running": self._host_effect_task is not None,
+                **self._host_effect_stats,
+            },
+            "state_publish": self.state_throttle.as_dict(),
+            "reconcile": {
+                "pending": self._reconcile_after is not None,
+                **self._reconcile_stats,
+            },
+            "offline_queue": {
+                "max_age": self.offline_max_age,
+                "queued_age": (
+                    round(self.loop.time() - self._offline_queued_at, 1)
+                    if self._offline_queued_at is not None
+                    else None
+                ),
+                **self._offline_stats,
+            },
+            "retry": {
+                "deadline": self.retry_deadline,
+                "last": self.last_retry.as_dict() if self.last_retry else None,
+            },
+            "availability": {
+                "available": self._available,
+                "seconds_since_seen": (
+                    round(self.loop.time() - self._last_seen, 1)
+                    if self._last_seen is not None
+                    else None
+                ),
+                "changes": self._availability_changes,
+            },
+            "routing": self._paths.as_dict(self.loop.time()),
+            "circuit_breaker": self._breaker.as_dict(),
+            "prewarm": dict(self._prewarm_stats),
+            "gatt_cache": {
+                "write_uuid": self._write_uuid,
+                **self._gatt_stats,
+            },
+            "keepalive": {
+                "adaptive": self.adaptive_delay,
+                "configured_delay": self._delay,
+                "delay": self._disconnect_delay(),
+                **self._keepalive.as_dict(),
+            },
+        }
+
+    def register_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call ``callback`` when another caller changed the state; returns an unsubscribe."""
+        self._callbacks.append(callback)
+        return lambda: self._callbacks.remove(callback)
+
+    def notify_state_changed(self) -> None:
+        """Tell the registered listeners (the light entity) to publish the state."""
+        for callback in list(self._callbacks):
+            callback()
+
+    def register_output_callback(
+        self, callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Call ``callback`` for every frame a transition writes; returns an unsubscribe.
+
+        Host effects and music streams never end, so their frames are not
+        reported; publishing them would record a state change forever.
+        """
+        self._output_callbacks.append(callback)
+        return lambda: self._output_callbacks.remove(callback)
+
+    @property
+    def output_rgb(self) -> tuple[int, int, int] | None:
+        """Color of the last RGB frame written, as sent to the strip."""
+        if self._write_queue.last_state is None:
+            return None
+        try:
+            return decode_frame(self._write_queue.last_state).rgb
+        except FrameError:
+            return None
+
+    async def _submit_stream(self, frame: bytes | bytearray | memoryview) -> None:
+        """Write a frame of a transition and report the new output."""
+        await self._write_queue.submit(frame)
+        for callback in list(self._output_callbacks):
+            callback()
+
+    def _rgb_frame(self, rgb: tuple[int, int, int], brightness: int) -> bytes:
+        """Build the RGB packet for a color scaled to a brightness."""
+        return _scaled_rgb_frame(self.color_pipeline, tuple(rgb), brightness)
+
+    @staticmethod
+    def _effect_frame(effect: str) -> bytes:
+        """Return the precomputed packet that starts a firmware effect."""
+        return EFFECT_FRAMES[effect]
+
+    @retry_bluetooth_connection_error(lane=LANE_STATE, supersedes=(LANE_POWER,))
     async def set_rgb_color(
         self, rgb: tuple[int, int, int], brightness: int | None = None
     ):
+        self._cancel_streams()
+        queued = self._queue_offline()
         self._rgb_color = rgb
         if brightness is None:
             if self._brightness is None:
                 self._brightness = 255
-            else:
-                brightness = self._brightness
-        brightness_percent = int(brightness * 100 / 255)
-        # Now adjust the RBG values to match the brightness
-        red = int(rgb[0] * brightness_percent / 100)
-        green = int(rgb[1] * brightness_percent / 100)
-        blue = int(rgb[2] * brightness_percent / 100)
-        # RGB packet
-        rgb_packet = bytearray.fromhex("7b ff 07")
-        rgb_packet.append(red)
-        rgb_packet.append(green)
-        rgb_packet.append(blue)
-        rgb_packet.extend(bytearray.fromhex("00 ff bf"))
+            brightness = self._brightness
+        if queued:
+            self._brightness = brightness
+            return
+        rgb_packet = self._rgb_frame(rgb, brightness)
         LOGGER.info("RGB Packet: %s", rgb_packet.hex())
-        await self._write(rgb_packet)
+        await self._write_queue.submit(rgb_packet)
+        self._output_in_sync = True
 
     async def set_brightness_local(self, value: int):
         # 0 - 255, should convert automatically with the hex calls
@@ -230,21 +852,38 @@ class BJLEDInstance:
         self._brightness = value
         await self.set_rgb_color(self._rgb_color, value)
 
-    @retry_bluetooth_connection_error
+    @retry_bluetooth_connection_error(lane=LANE_POWER)
     async def turn_on(self):
-        await self._write(self._turn_on_cmd or TURN_ON_CMD)
+        self._cancel_streams()
+        if self._queue_offline():
+            self._is_on = True
+            return
+        await self._write_queue.submit(self._turn_on_cmd or TURN_ON_CMD, power=True)
         self._is_on = True
+        self._output_in_sync = True
 
-    @retry_bluetooth_connection_error
+    @retry_bluetooth_connection_error(lane=LANE_POWER, supersedes=(LANE_STATE,))
     async def turn_off(self):
-        await self._write(self._turn_off_cmd or TURN_OFF_CMD)
+        self._cancel_streams()
+        if self._queue_offline():
+            self._is_on = False
+            return
+        await self._write_queue.submit(
+            self._turn_off_cmd or TURN_OFF_CMD, power=True, supersede=True
+        )
         self._is_on = False
+        self._output_in_sync = True
 
-    @retry_bluetooth_connection_error
+    @retry_bluetooth_connection_error(lane=LANE_STATE, supersedes=(LANE_POWER,))
     async def set_effect(self, effect: str):
         if effect not in EFFECT_LIST:
             LOGGER.error("Effect %s not supported", effect)
             return
+        self._cancel_streams()
+        if self._queue_offline():
+            self._is_on = True
+            self._effect = None if effect == "None" else effect
+            return
         self._effect = effect
 
         if effect == "None":
@@ -253,43 +892,456 @@ class BJLEDInstance:
             await self.set_rgb_color(rgb)
             return
 
-        effect_id = EFFECT_MAP.get(effect)
-        hex_cmd = f"7b ff 03 {effect_id:02x} ff ff ff ff bf"
-        LOGGER.debug("Effect ID: %s", effect_id)
-        LOGGER.debug("Effect name: %s", effect)
-        LOGGER.debug("Effect hex_cmd: %s", hex_cmd)
-        await self._write(bytearray.fromhex(hex_cmd))
+        if effect in HOST_EFFECTS:
+            self._start_host_effect(effect)
+            return
+
+        await self._write_queue.submit(self._effect_frame(effect))
+        self._output_in_sync = True
+
+    def plan_state(
+        self,
+        rgb: tuple[int, int, int] | None = None,
+        brightness: int | None = None,
+        effect: str | None = None,
+    ) -> tuple[list[tuple[bytes | bytearray, bool]], dict[str, Any]]:
+        """Plan the fewest frames that turn the light on in the requested state.
+
+        The requested attributes are merged with the current state into one
+        target. A firmware effect is a single effect frame and a host effect
+        is streamed separately, so it plans no frames. Otherwise color
+        and brightness are one RGB frame, because the RGB frame also powers
+        the strip on. Nothing is sent when the target is already applied.
+        Returns the ``(frame, power)`` pairs to write and the target state.
+        """
+        if effect == "None":
+            effect = None
+            clear_effect = True
+        else:
+            clear_effect = rgb is not None
+        target = {
+            "is_on": True,
+            "rgb_color": rgb or self._rgb_color,
+            "brightness": (
+                brightness if brightness is not None else self._brightness or 255
+            ),
+            "effect": effect or (None if clear_effect else self._effect),
+        }
+        was_on = self._is_on is True and self._output_in_sync
+        if target["effect"] is not None:
+            if target["effect"] in HOST_EFFECTS or (
+                was_on and target["effect"] == self._effect
+            ):
+                return [], target
+            return [(self._effect_frame(target["effect"]), False)], target
+
+        changed = (
+            not was_on
+            or self._effect is not None
+            or target["rgb_color"] != self._rgb_color
+            or target["brightness"] != self._brightness
+        )
+        if not changed:
+            return [], target
+        if target["rgb_color"] is None:
+            if brightness is None and not clear_effect:
+                # Nothing to restore, plain power on
+                return [(self._turn_on_cmd or TURN_ON_CMD, True)], target
+            target["rgb_color"] = (255, 255, 255)
+        frame = self._rgb_frame(target["rgb_color"], target["brightness"])
+        return [(frame, False)], target
+
+    @retry_bluetooth_connection_error(lane=LANE_STATE, supersedes=(LANE_POWER,))
+    async def apply_state(
+        self,
+        rgb: tuple[int, int, int] | None = None,
+        brightness: int | None = None,
+        effect: str | None = None,
+    ) -> int:
+        """Turn on in the requested state and return the number of frames sent.
+
+        Returns None if a newer command superseded this one.
+        """
+        if effect is not None and effect not in EFFECT_LIST:
+            LOGGER.error("Effect %s not supported", effect)
+            effect = None
+        self._cancel_streams()
+        frames, target = self.plan_state(rgb, brightness, effect)
+        if queued := self._queue_offline():
+            frames = []
+        for frame, power in frames:
+            LOGGER.debug("%s: Planned frame: %s", self.name, frame.hex())
+            await self._write_queue.submit(frame, power=power)
+        if not queued:
+            self._output_in_sync = True
+        self._is_on = target["is_on"]
+        self._rgb_color = target["rgb_color"]
+        self._brightness = target["brightness"]
+        self._effect = target["effect"]
+        if self._effect in HOST_EFFECTS and not queued:
+            self._start_host_effect(self._effect)
+        return len(frames)
+
+    async def write_stream_color(self, rgb: tuple[int, int, int]) -> None:
+        """Write one color of an external stream at the current brightness.
+
+        The reported state is left alone; the next command rewrites it.
+        """
+        self._cancel_streams()
+        self._output_in_sync = False
+        await self._write_queue.submit(self._rgb_frame(rgb, self._brightness or 255))
+
+    @property
+    def transitioning(self) -> bool:
+        return self._transition_task is not None and not self._transition_task.done()
+
+    def start_transition(
+        self,
+        duration: float,
+        rgb: tuple[int, int, int] | None = None,
+        brightness: int | None = None,
+        turn_off: bool = False,
+    ) -> None:
+        """Fade to the requested state in the background over ``duration`` seconds.
+
+        The target becomes the reported state immediately; a later command
+        cancels the fade and starts from wherever the output is.
+        """
+        self._cancel_streams()
+        start_rgb = self._rgb_color or rgb or (255, 255, 255)
+        start_brightness = (self._brightness or 255) if self._is_on else 0
+        end_rgb = rgb or start_rgb
+        if turn_off:
+            end_brightness = 0
+            self._is_on = False
+        else:
+            end_brightness = (
+                brightness if brightness is not None else self._brightness or 255
+            )
+            self._is_on = True
+            self._rgb_color = end_rgb
+            self._brightness = end_brightness
+            self._effect = None
+        self._output_in_sync = False
+        self._transition_task = self.loop.create_task(
+            self._run_transition(
+                (start_rgb, start_brightness), (end_rgb, end_brightness), duration
+            )
+        )
+
+    async def _run_transition(
+        self,
+        start: tuple[tuple[int, int, int], int],
+        end: tuple[tuple[int, int, int], int],
+        duration: float,
+    ) -> None:
+        try:
+            await self._transition_engine.run(
+                start,
+                end,
+                duration,
+                self.color_pipeline,
+                self._submit_stream,
+                prepare=self._ensure_connected,
+            )
+        except BLEAK_EXCEPTIONS as err:
+            LOGGER.debug("%s: Transition aborted: %s", self.name, err)
+        else:
+            self._output_in_sync = True
+            self.notify_state_changed()
+
+    def _start_host_effect(self, effect: str) -> None:
+        """Render a host effect loop for the current state and stream it."""
+        self._cancel_streams()
+        host_effect = HOST_EFFECTS[effect]
+        colors = render_effect(
+            effect, tuple(self._rgb_color or host_effect.default_color), HOST_EFFECT_FPS
+        )
+        frames = encode_rgb_batch(
+            self.color_pipeline.scale_batch(colors, self._brightness or 255)
+        )
+        self._effect = effect
+        self._is_on = True
+        self._output_in_sync = True
+        self._host_effect_task = self.loop.create_task(
+            self._stream_frames(frames, HOST_EFFECT_FPS)
+        )
+
+    async def _stream_frames(self, frames: np.ndarray, fps: float) -> None:
+        """Write a frame loop at ``fps`` until cancelled, skipping late frames."""
+        stream = memoryview(frames).cast("B")
+        count = len(frames)
+        period = 1 / fps
+        stats = self._host_effect_stats
+        started = self.loop.time()
+        tick = 0
+        try:
+            while True:
+                due = started + tick * period
+                now = self.loop.time()
+                if now < due:
+                    await asyncio.sleep(due - now)
+                else:
+                    current = int((now - started) / period)
+                    stats["frames_dropped"] += current - tick
+                    tick = current
+                offset = (tick % count) * FRAME_LENGTH
+                await self._write_queue.submit(stream[offset : offset + FRAME_LENGTH])
+                stats["frames_sent"] += 1
+                tick += 1
+        except BLEAK_EXCEPTIONS as err:
+            LOGGER.debug("%s: Host effect stream stopped: %s", self.name, err)
+
+    def _cancel_host_effect(self) -> None:
+        if self._host_effect_task is None:
+            return
+        if not self._host_effect_task.done():
+            LOGGER.debug("%s: Stopping host effect", self.name)
+            self._host_effect_task.cancel()
+            self._output_in_sync = False
+        self._host_effect_task = None
+
+    def _cancel_streams(self) -> None:
+        """Stop any transition or host effect writing to the strip."""
+        self._cancel_transition()
+        self._cancel_host_effect()
+
+    def _cancel_transition(self) -> None:
+        if self._transition_task is None:
+            return
+        if not self._transition_task.done():
+            LOGGER.debug("%s: Cancelling running transition", self.name)
+            self._transition_task.cancel()
+        self._transition_task = None
+
+    async def prepare(self, trigger: str = "service") -> None:
+        """Connect ahead of a command so the command only pays for the write.
+
+        Failures are logged, not raised; the command connects as usual.
+        """
+        if self._client and self._client.is_connected:
+            self._reset_disconnect_timer()
+            return
+        stats = self._prewarm_stats
+        stats["count"] += 1
+        stats["last_trigger"] = trigger
+        started = self.loop.time()
+        LOGGER.debug("%s: Pre-warming connection (%s)", self.name, trigger)
+        try:
+            await self._ensure_connected(activity=False)
+        except BLEAK_EXCEPTIONS as err:
+            stats["failures"] += 1
+            LOGGER.debug("%s: Pre-warming failed: %s", self.name, err)
+            return
+        stats["last_duration"] = round(self.loop.time() - started, 3)
+
+    def advertisement_seen(
+        self, service_info: bluetooth.BluetoothServiceInfoBleak | None = None
+    ) -> None:
+        """Pre-warm when the device advertises after a period of absence.
+
+        An advertisement also makes the device available, lets connections
+        through an open breaker again and updates the path it came through.
+        """
+        if service_info is not None:
+            self._device = service_info.device
+            self._paths.record_advertisement(
+                service_info.source,
+                service_info.device,
+                service_info.rssi,
+                self.loop.time(),
+            )
+        breaker_changed = self._breaker.advertisement_seen()
+        self._advertising_lost = False
+        if not self._available:
+            self.set_available(True)
+        elif breaker_changed:
+            self.notify_state_changed()
+        now = self.loop.time()
+        present = [t for t in (self._last_seen, self._last_connected) if t is not None]
+        absent = not present or now - max(present) > PREWARM_ABSENCE
+        self._last_seen = now
+        if self._reconcile_after is not None and self._schedule_reconcile(now):
+            # Connecting is part of pushing the state
+            return
+        if absent and not (self._client and self._client.is_connected):
+            task = self.loop.create_task(self.prepare("advertisement"))
+            self._prepare_tasks.add(task)
+            task.add_done_callback(self._prepare_tasks.discard)
+
+    def _schedule_reconcile(self, now: float) -> bool:
+        """Push the known state in the background, at most once per interval."""
+        if self._reconcile_task is not None and not self._reconcile_task.done():
+            return True
+        if (
+            self._last_reconcile is not None
+            and now - self._last_reconcile < RECONCILE_INTERVAL
+        ):
+            self._reconcile_stats["rate_limited"] += 1
+            return False
+        self._last_reconcile = now
+        self._reconcile_task = self.loop.create_task(self._reconcile())
+        return True
+
+    async def _reconcile(self) -> None:
+        """Write the known state again after the device dropped out.
+
+        The device may have been power cycled and be back in its default
+        mode. Nothing is written if a command or stream has written since
+        the drop, as that already replaced whatever the device shows. While
+        a command is in flight the push waits for the next advertisement,
+        so it never supersedes the user's command. The state goes through
+        ``apply_state``, so it is the fewest frames for it and a newer
+        command supersedes it.
+
+        Commands queued while the device was unreachable are flushed the
+        same way. If the last one is older than ``offline_max_age`` the
+        state from before the first queued command is kept instead.
+        """
+        stats = self._reconcile_stats
+        written_before = self._reconcile_after
+        if written_before is None:
+            return
+        queued_at = self._offline_queued_at
+        if (
+            queued_at is not None
+            and self.loop.time() - queued_at > self.offline_max_age
+        ):
+            LOGGER.debug("%s: Queued command expired, not writing it", self.name)
+            self._offline_stats["expired"] += 1
+            (
+                self._is_on,
+                self._rgb_color,
+                self._brightness,
+                self._effect,
+            ) = self._offline_base
+            self._offline_queued_at = self._offline_base = None
+            queued_at = None
+            self.notify_state_changed()
+            if self._is_on is None:
+                # Nothing was known before the queued command
+                self._reconcile_after = None
+                return
+        if (
+            self._write_queue.written > written_before
+            or self.transitioning
+            or self._host_effect_task is not None
+        ):
+            self._reconcile_after = None
+            # Whatever was queued is replaced too; a later push must not
+            # fall back to its base
+            self._offline_queued_at = self._offline_base = None
+            stats["skipped"] += 1
+            return
+        if self.lanes.busy:
+            # The command writes (and skips the push) or fails and owes it
+            LOGGER.debug("%s: Command in flight, deferring the known state", self.name)
+            stats["deferred"] += 1
+            self._last_reconcile = None
+            return
+        LOGGER.debug("%s: Device is back, writing the known state again", self.name)
+        written = self._write_queue.written
+        token = _flushing.set(self.mac)
+        try:
+            if self._is_on:
+                # The frames apply_state wrote; a host effect it (re)started
+                # plans none and streams its own, which are not counted
+                sent = await self.apply_state(
+                    rgb=self._rgb_color, brightness=self._brightness, effect=self._effect
+                )
+                pushed = sent is not None and (
+                    sent > 0 or self._host_effect_task is not None
+                )
+            else:
+                await self.turn_off()
+                sent = self._write_queue.written - written
+                pushed = sent > 0
+        except BLEAK_EXCEPTIONS as err:
+            stats["failures"] += 1
+            LOGGER.debug("%s: Could not write the known state: %s", self.name, err)
+            return
+        finally:
+            _flushing.reset(token)
+        if not pushed:
+            # Superseded before writing; still owed on the next advertisement
+            LOGGER.debug("%s: Known state superseded, still owed", self.name)
+            stats["deferred"] += 1
+            self._last_reconcile = None
+            return
+        self._reconcile_after = None
+        stats["pushed"] += 1
+        stats["frames"] += sent
+        if queued_at is not None and self._offline_queued_at == queued_at:
+            self._offline_stats["flushed"] += 1
+            self._offline_queued_at = self._offline_base = None
 
     @retry_bluetooth_connection_error
     async def update(self):
         LOGGER.debug("%s: Update in bjled called", self.name)
         # I dont think we have anything to update
 
-    async def _ensure_connected(self) -> None:
-        """Ensure connection to device is established."""
+    async def _ensure_connected(self, activity: bool = True) -> None:
+        """Ensure connection to device is established.
+
+        ``activity`` is False for pre-warming, which is not a command and
+        so is not an idle gap for the keep-alive policy, and which only
+        takes a free connection slot.
+        """
+        if activity:
+            self._record_activity()
         if self._connect_lock.locked():
             LOGGER.debug(
                 "%s: Connection already in progress, waiting for it to complete",
                 self.name,
             )
         if self._client and self._client.is_connected:
+            self._connections.touch(self)
             self._reset_disconnect_timer()
             return
+        if not self._available:
+            raise BleakNotFoundError(
+                f"{self.name}: Device is not advertising, not connecting"
+            )
+        self._breaker.check()
         async with self._connect_lock:
             # Check again while holding the lock
             if self._client and self._client.is_connected:
+                self._connections.touch(self)
                 self._reset_disconnect_timer()
                 return
+            # Calls queued behind a connection that just opened the breaker
+            self._breaker.check()
+            await self._connections.acquire(self, evict=activity)
             LOGGER.debug("%s: Connecting", self.name)
-            client = await establish_connection(
-                BleakClientWithServiceCache,
-                self._device,
-                self.name,
-                self._disconnected,
-                cached_services=self._cached_services,
-                ble_device_callback=lambda: self._device,
-            )
-            LOGGER.debug("%s: Connected", self.name)
+            connect_started = self.loop.time()
+            try:
+                client = await establish_connection(
+                    BleakClientWithServiceCache,
+                    self._device,
+                    self.name,
+                    self._disconnected,
+                    cached_services=self._cached_services,
+                    ble_device_callback=lambda: self._device,
+                )
+            except BaseException as err:
+                self._connections.release(self)
+                if isinstance(err, BLEAK_EXCEPTIONS) and self._breaker.record_failure(
+                    err
+                ):
+                    self.notify_state_changed()
+                raise
+            self._paths.connected = self._connections.confirm(self)
+            LOGGER.debug("%s: Connected through %s", self.name, self._paths.connected)
+            if self._breaker.record_success():
+                self.notify_state_changed()
+            # Reachable, whether or not an advertisement was seen lately
+            self.set_available(True)
+            self._keepalive.record_reconnect(self.loop.time() - connect_started)
+            if self._write_uuid is not None:
+                # Remembered from an earlier connection, possibly before a restart
+                self._client = client
+                self._reset_disconnect_timer()
+                return
             resolved = self._resolve_characteristics(client.services)
             if not resolved:
                 # Try to handle services failing to load
@@ -304,25 +1356,61 @@ class BJLEDInstance:
         """Resolve characteristics."""
         for characteristic in WRITE_CHARACTERISTIC_UUIDS:
             if char := services.get_characteristic(characteristic):
-                self._write_uuid = char
+                # The UUID, not the object: bleak resolves it against the
+                # services of whichever client writes, so it stays valid
+                # across reconnects through another adapter or proxy
+                self._write_uuid = str(char.uuid)
+                self._write_with_response = "write" in char.properties
+                self._gatt_stats["resolved"] += 1
+                if self._gatt_cache:
+                    self._gatt_cache.update(self.mac, char)
                 break
         return bool(self._write_uuid)
 
+    def _record_activity(self) -> None:
+        """Feed the idle gap before this command to the keep-alive policy."""
+        now = self.loop.time()
+        if self._last_activity is not None:
+            connected = bool(self._client and self._client.is_connected)
+            samples = self._keepalive.samples
+            self._keepalive.record_gap(now - self._last_activity, connected)
+            if self.adaptive_delay and self._keepalive.samples != samples:
+                self._keepalive.choose(self._connections.slot_share(self))
+        self._last_activity = now
+
+    def _disconnect_delay(self) -> float | None:
+        """Return the learned disconnect delay, or the configured one."""
+        if not self._delay:
+            # 0 (or unset) keeps the connection open
+            return self._delay
+        if self.adaptive_delay and self._keepalive.delay is not None:
+            return self._keepalive.delay
+        return self._delay
+
     def _reset_disconnect_timer(self) -> None:
         """Reset disconnect timer."""
         if self._disconnect_timer:
             self._disconnect_timer.cancel()
         self._expected_disconnect = False
-        if self._delay is not None and self._delay != 0:
+        delay = self._disconnect_delay()
+        if delay is not None and delay != 0:
             LOGGER.debug(
                 "%s: Configured disconnect from device in %s seconds",
                 self.name,
-                self._delay,
+                delay,
             )
-            self._disconnect_timer = self.loop.call_later(self._delay, self._disconnect)
+            self._disconnect_timer = self.loop.call_later(delay, self._disconnect)
 
     def _disconnected(self, client: BleakClientWithServiceCache) -> None:
         """Disconnected callback."""
+        if self._client is None or client is self._client:
+            self._connections.release(self)
+            self._paths.connected = None
+        self._last_connected = self.loop.time()
+        if self._advertising_lost:
+            # Not seen advertising since it went quiet while connected
+            self._advertising_lost = False
+            self.set_available(False)
         if self._expected_disconnect:
             LOGGER.debug("%s: Disconnected from device", self.name)
             return
@@ -330,6 +1418,48 @@ class BJLEDInstance:
             "%s: Device unexpectedly disconnected (common with BLE, will reconnect on next use)",
             self.name,
         )
+        self._mark_dropped()
+
+    def _queue_offline(self) -> bool:
+        """Keep a command for later if the device cannot be reached now.
+
+        Returns True if the command should only record its target state.
+        The state is written by the reconciliation on the next
+        advertisement, so commands queued meanwhile collapse into the last
+        state.
+        """
+        if not self.offline_max_age or (
+            self._available and self._breaker.state != STATE_OPEN
+        ):
+            return False
+        if _flushing.get() == self.mac:
+            # Flushing; fail like any other command
+            return False
+        if self._offline_queued_at is None:
+            self._offline_base = (
+                self._is_on,
+                self._rgb_color,
+                self._brightness,
+                self._effect,
+            )
+        LOGGER.debug("%s: Device unreachable, queueing the command", self.name)
+        self._offline_queued_at = self.loop.time()
+        self._offline_stats["queued"] += 1
+        if self._reconcile_after is None:
+            self._reconcile_after = self._write_queue.written
+        # A new target is flushed on the next advertisement, however recent
+        # the last push was
+        self._last_reconcile = None
+        self._output_in_sync = False
+        return True
+
+    def _mark_dropped(self) -> None:
+        """Owe the device its state once it is back, unless a command rewrites it."""
+        if self._is_on is None or self._reconcile_after is not None:
+            return
+        self._reconcile_stats["drops"] += 1
+        self._reconcile_after = self._write_queue.written
+        self._output_in_sync = False
 
     def _disconnect(self) -> None:
         """Disconnect from device."""
@@ -339,11 +1469,21 @@ class BJLEDInstance:
     async def stop(self) -> None:
         """Stop the LEDBLE."""
         LOGGER.debug("%s: Stop", self.name)
+        self._cancel_streams()
+        self._cancel_settle()
+        for task in self._prepare_tasks:
+            task.cancel()
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+        self._write_queue.clear()
         await self._execute_disconnect()
+        self._connections.forget(self)
 
     async def _execute_timed_disconnect(self) -> None:
         """Execute timed disconnection."""
-        LOGGER.debug("%s: Disconnecting after timeout of %s", self.name, self._delay)
+        LOGGER.debug(
+            "%s: Disconnecting after timeout of %s", self.name, self._disconnect_delay()
+        )
         await self._execute_disconnect()
 
     async def _execute_disconnect(self) -> None:
@@ -352,7 +1492,6 @@ class BJLEDInstance:
             client = self._client
             self._expected_disconnect = True
             self._client = None
-            self._write_uuid = None
             if client and client.is_connected:
                 try:
                     await client.disconnect()
@@ -362,4 +1501,6 @@ class BJLEDInstance:
                         self.name,
                         err,
                     )
+            self._connections.release(self)
+            self._paths.connected = None
             LOGGER.debug("%s: Disconnected", self.name)
@@ -0,0 +1,75 @@
+"""Write characteristics remembered across restarts.
+
+Bleak (0.17+) and BlueZ already keep discovered GATT services on disk, and
+``establish_connection`` reuses them when they are valid. What is lost on
+restart is the characteristic the integration resolved for writing. It is
+stored per MAC in Home Assistant's storage so a cold-start reconnect goes
+straight to the write, and is dropped only when a write fails because the
+characteristic is gone.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from bleak.backends.characteristic import BleakGATTCharacteristic
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_GATT_CACHE, DOMAIN
+
+LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.gatt_cache"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+class GattCache:
+    """Resolved write characteristics per MAC, persisted in HA storage."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY
+        )
+        self._data: dict[str, dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        self._data = await self._store.async_load() or {}
+
+    def get(self, mac: str) -> dict[str, Any] | None:
+        return self._data.get(mac.upper())
+
+    def update(self, mac: str, characteristic: BleakGATTCharacteristic) -> None:
+        """Remember the write characteristic of ``mac``."""
+        entry = {
+            "write_uuid": str(characteristic.uuid),
+            "handle": characteristic.handle,
+            "service_uuid": str(characteristic.service_uuid),
+            "properties": list(characteristic.properties),
+        }
+        if self._data.get(mac.upper()) == entry:
+            return
+        self._data[mac.upper()] = entry
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    def invalidate(self, mac: str) -> None:
+        """Forget ``mac`` after its characteristic could not be written."""
+        if self._data.pop(mac.upper(), None) is not None:
+            LOGGER.debug("%s: Dropped cached write characteristic", mac)
+            self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+
+def get_gatt_cache(hass: HomeAssistant) -> GattCache | None:
+    """Return the loaded cache, if the integration has loaded it."""
+    return hass.data.get(DATA_GATT_CACHE)
+
+
+async def async_get_gatt_cache(hass: HomeAssistant) -> GattCache:
+    """Return the cache shared by all entries, loading it on first use."""
+    if (cache := hass.data.get(DATA_GATT_CACHE)) is None:
+        cache = GattCache(hass)
+        await cache.async_load()
+        hass.data[DATA_GATT_CACHE] = cache
+    return cache
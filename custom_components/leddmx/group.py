@@ -0,0 +1,237 @@
+"""Groups of LEDDMX strips driven as one light.
+
+A Home Assistant light group calls each member in turn, so every member
+waits for the previous one to connect and write. A LEDDMX group fans each
+command out to all members at once, bounded by a parallelism limit so a
+large group does not ask the adapter for more connections than it has.
+Members that share a color pipeline are handed the same encoded frame.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+import logging
+from typing import Any
+
+from homeassistant.components.light import ColorMode
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .dmxled import EFFECT_LIST, BJLEDInstance
+from .publish import PublishThrottle
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_PARALLEL = 4
+
+
+@dataclass
+class FanOutStats:
+    """Timing of one command fanned out to the group members."""
+
+    operation: str
+    members: int = 0
+    failures: int = 0
+    # Seconds from the start of the fan-out until each member finished
+    latencies: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def spread(self) -> float:
+        """Seconds between the first and the last member finishing."""
+        if not self.latencies:
+            return 0.0
+        return max(self.latencies.values()) - min(self.latencies.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics for diagnostics."""
+        return {
+            "operation": self.operation,
+            "members": self.members,
+            "failures": self.failures,
+            "latencies": {
+                name: round(latency, 4) for name, latency in self.latencies.items()
+            },
+            "spread": round(self.spread, 4),
+        }
+
+
+class BJLEDGroup:
+    """Drive several LEDDMX instances concurrently as one light."""
+
+    def __init__(
+        self,
+        name: str,
+        member_macs: list[str],
+        hass: HomeAssistant,
+        max_parallel: int = DEFAULT_MAX_PARALLEL,
+    ) -> None:
+        self._name = name
+        self._member_macs = [mac.upper() for mac in member_macs]
+        self._hass = hass
+        self.max_parallel = max_parallel
+        # The group light publishes once the fan-out is done
+        self.optimistic = False
+        self.state_throttle = PublishThrottle()
+        self.last_fan_out: FanOutStats | None = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def mac(self) -> None:
+        """Groups have no address of their own."""
+        return None
+
+    @property
+    def member_macs(self) -> list[str]:
+        return self._member_macs
+
+    @property
+    def members(self) -> list[BJLEDInstance]:
+        """Return the loaded member instances in configured order."""
+        by_mac = {
+            instance.mac.upper(): instance
+            for instance in self._hass.data.get(DOMAIN, {}).values()
+            if isinstance(instance, BJLEDInstance)
+        }
+        return [by_mac[mac] for mac in self._member_macs if mac in by_mac]
+
+    @property
+    def available(self) -> bool:
+        return any(member.available for member in self.members)
+
+    @property
+    def is_on(self) -> bool | None:
+        states = [member.is_on for member in self.members]
+        if any(states):
+            return True
+        return False if states and all(s is False for s in states) else None
+
+    @property
+    def _lead(self) -> BJLEDInstance | None:
+        """The member whose color, brightness and effect the group reports."""
+        members = self.members
+        for member in members:
+            if member.is_on:
+                return member
+        return members[0] if members else None
+
+    @property
+    def brightness(self) -> int | None:
+        lead = self._lead
+        return lead.brightness if lead else None
+
+    @property
+    def rgb_color(self) -> tuple[int, int, int] | None:
+        lead = self._lead
+        return lead.rgb_color if lead else None
+
+    @property
+    def effect(self) -> str | None:
+        lead = self._lead
+        return lead.effect if lead else None
+
+    @property
+    def effect_list(self) -> list[str]:
+        return EFFECT_LIST
+
+    @property
+    def color_mode(self) -> ColorMode:
+        return ColorMode.RGB
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Return fan-out statistics for the diagnostics download."""
+        members = self.members
+        return {
+            "members": [member.name for member in members],
+            "missing_members": len(self._member_macs) - len(members),
+            "max_parallel": self.max_parallel,
+            "last_fan_out": self.last_fan_out.as_dict() if self.last_fan_out else None,
+        }
+
+    async def _fan_out(
+        self, operation: str, call: Callable[[BJLEDInstance], Awaitable[Any]]
+    ) -> FanOutStats:
+        """Run ``call`` on every member concurrently, at most ``max_parallel`` at once.
+
+        A member that fails is logged and skipped; the error is only raised
+        when every member failed.
+        """
+        members = self.members
+        stats = FanOutStats(operation, len(members))
+        if not members:
+            LOGGER.warning("%s: No group members are loaded", self.name)
+            return stats
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_parallel)
+        started = loop.time()
+
+        async def _run(member: BJLEDInstance) -> None:
+            async with slots:
+                await call(member)
+            stats.latencies[member.name] = loop.time() - started
+
+        results = await asyncio.gather(
+            *(_run(member) for member in members), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        for member, result in zip(members, results):
+            if isinstance(result, Exception):
+                LOGGER.warning("%s: %s failed: %s", member.name, operation, result)
+            member.notify_state_changed()
+        stats.failures = len(errors)
+        self.last_fan_out = stats
+        LOGGER.debug("%s: Fan-out finished: %s", self.name, stats.as_dict())
+        if len(errors) == len(members):
+            raise errors[0]
+        return stats
+
+    async def apply_state(
+        self,
+        rgb: tuple[int, int, int] | None = None,
+        brightness: int | None = None,
+        effect: str | None = None,
+    ) -> int:
+        """Turn every member on in the requested state; return the frames sent."""
+        frames: list[int] = []
+
+        async def _apply(member: BJLEDInstance) -> None:
+            # None when a newer command superseded it
+            frames.append(await member.apply_state(rgb, brightness, effect) or 0)
+
+        await self._fan_out("apply_state", _apply)
+        return sum(frames)
+
+    async def turn_on(self) -> None:
+        await self._fan_out("turn_on", lambda member: member.turn_on())
+
+    async def turn_off(self) -> None:
+        await self._fan_out("turn_off", lambda member: member.turn_off())
+
+    async def set_effect(self, effect: str) -> None:
+        await self._fan_out("set_effect", lambda member: member.set_effect(effect))
+
+    async def write_stream_color(self, rgb: tuple[int, int, int]) -> None:
+        await self._fan_out(
+            "write_stream_color", lambda member: member.write_stream_color(rgb)
+        )
+
+    def start_transition(
+        self,
+        duration: float,
+        rgb: tuple[int, int, int] | None = None,
+        brightness: int | None = None,
+        turn_off: bool = False,
+    ) -> None:
+        """Start the same fade on every member; each runs in the background."""
+        for member in self.members:
+            member.start_transition(duration, rgb, brightness, turn_off)
+            member.notify_state_changed()
+
+    async def update(self) -> None:
+        """Nothing to poll; members hold the state."""
+
+    async def stop(self) -> None:
+        """Members are stopped with their own config entries."""
@@ -0,0 +1,119 @@
+"""Idle-disconnect delays learned from how each device is used.
+
+Keeping a connection open makes the next command fast but holds one of the
+adapter's few slots. The policy records the idle gaps between commands in a
+decaying histogram whose bin edges are the candidate delays. For a delay
+``d`` the share of gaps no longer than ``d`` is the expected hit rate (the
+next command finds the connection open) and ``E[min(gap, d)] / E[gap]`` is
+the share of time the device holds its slot. The chosen delay minimizes the
+expected reconnect time plus a small holding cost, among the delays whose
+slot share fits the device's budget on its adapter.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any
+
+# Candidate disconnect delays in seconds, also the histogram bin edges
+KEEPALIVE_DELAYS: tuple[float, ...] = (
+    10, 20, 30, 45, 60, 90, 120, 180, 240, 300, 450, 600
+)
+# Commands closer together than this belong to the same burst
+MIN_GAP = 1.0
+# Gaps recorded before the learned delay replaces the configured one
+MIN_SAMPLES = 5
+# Weight kept by older gaps each time a new one is recorded
+DECAY = 0.97
+# Seconds of reconnect latency one second of holding a slot is worth; breaks
+# ties towards shorter delays when a longer one would not save reconnects
+HOLD_COST = 0.001
+# Assumed reconnect time until one has been measured
+DEFAULT_RECONNECT_TIME = 3.0
+
+
+class KeepAlivePolicy:
+    """Pick a disconnect delay from the gaps between a device's commands."""
+
+    def __init__(self) -> None:
+        # One bin per candidate delay plus one for longer gaps
+        self._counts = [0.0] * (len(KEEPALIVE_DELAYS) + 1)
+        self._sums = [0.0] * (len(KEEPALIVE_DELAYS) + 1)
+        self.samples = 0
+        self.hits = 0
+        self.misses = 0
+        self.reconnect_time = DEFAULT_RECONNECT_TIME
+        self.delay: float | None = None
+        self.decision: dict[str, Any] | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.samples >= MIN_SAMPLES
+
+    def record_gap(self, gap: float, connected: bool) -> None:
+        """Record the idle time before a command and whether it found a connection."""
+        if gap < MIN_GAP:
+            return
+        if connected:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._counts = [count * DECAY for count in self._counts]
+        self._sums = [total * DECAY for total in self._sums]
+        index = bisect_left(KEEPALIVE_DELAYS, gap)
+        self._counts[index] += 1
+        self._sums[index] += gap
+        self.samples += 1
+
+    def record_reconnect(self, seconds: float) -> None:
+        """Track how long establishing a connection takes (moving average)."""
+        self.reconnect_time += 0.2 * (seconds - self.reconnect_time)
+
+    def choose(self, slot_share: float = 1.0) -> float | None:
+        """Return the delay to use, or None until enough gaps are recorded.
+
+        ``slot_share`` is the share of time the device may hold a slot,
+        e.g. 0.5 when twice as many devices as slots share the adapter.
+        """
+        if not self.ready:
+            return None
+        total = sum(self._counts)
+        mean_gap = sum(self._sums) / total
+        best: tuple[float, float, float, float] | None = None
+        covered_count = covered_sum = 0.0
+        for index, delay in enumerate(KEEPALIVE_DELAYS):
+            covered_count += self._counts[index]
+            covered_sum += self._sums[index]
+            hit_rate = covered_count / total
+            held = (covered_sum + (total - covered_count) * delay) / total
+            occupancy = held / mean_gap
+            if best is not None and occupancy > slot_share:
+                break
+            cost = (1 - hit_rate) * self.reconnect_time + HOLD_COST * held
+            if best is None or cost < best[0]:
+                best = (cost, delay, hit_rate, occupancy)
+        cost, delay, hit_rate, occupancy = best
+        self.delay = delay
+        self.decision = {
+            "delay": delay,
+            "slot_share": round(slot_share, 3),
+            "expected_hit_rate": round(hit_rate, 3),
+            "expected_occupancy": round(occupancy, 3),
+            "expected_cost": round(cost, 3),
+        }
+        return delay
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram, last decision and hit rates for diagnostics."""
+        commands = self.hits + self.misses
+        edges = [*(f"<={delay:g}s" for delay in KEEPALIVE_DELAYS), "longer"]
+        return {
+            "samples": self.samples,
+            "histogram": {
+                edge: round(count, 2) for edge, count in zip(edges, self._counts)
+            },
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / commands, 3) if commands else None,
+            "reconnect_time": round(self.reconnect_time, 3),
+            "decision": self.decision,
+        }
@@ -1,3 +1,5 @@
+from collections.abc import Awaitable
+from dataclasses import asdict, dataclass
 import logging
 from typing import Any
 
@@ -7,18 +9,23 @@ from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
     ATTR_EFFECT,
     ATTR_RGB_COLOR,
+    ATTR_TRANSITION,
     PLATFORM_SCHEMA,
     ColorMode,
     LightEntity,
     LightEntityFeature,
 )
-from homeassistant.const import CONF_MAC
-from homeassistant.helpers import device_registry
+from homeassistant.const import CONF_MAC, STATE_OFF, STATE_ON
+from homeassistant.core import Event, callback
+from homeassistant.helpers import device_registry, entity_registry
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.restore_state import ExtraStoredData, RestoreEntity
 
 from .dmxled import BJLEDInstance
-from .const import DOMAIN
+from .const import DOMAIN, EVENT_COMMAND_FAILED
+from .group import BJLEDGroup
 
 LOGGER = logging.getLogger(__name__)
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({vol.Required(CONF_MAC): cv.string})
@@ -26,39 +33,82 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({vol.Required(CONF_MAC): cv.string})
 
 async def async_setup_entry(hass, config_entry, async_add_devices):
     instance = hass.data[DOMAIN][config_entry.entry_id]
+    if isinstance(instance, BJLEDGroup):
+        async_add_devices(
+            [BJLEDGroupLight(instance, config_entry.data["name"], config_entry.entry_id)]
+        )
+        return
     async_add_devices(
         [BJLEDLight(instance, config_entry.data["name"], config_entry.entry_id)]
     )
 
 
-class BJLEDLight(LightEntity):
+@dataclass
+class BJLEDExtraStoredData(ExtraStoredData):
+    """Color, brightness and effect kept across restarts, also while off."""
+
+    rgb_color: tuple[int, int, int] | None
+    brightness: int | None
+    effect: str | None
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, restored: dict[str, Any]) -> "BJLEDExtraStoredData | None":
+        try:
+            rgb = restored["rgb_color"]
+            return cls(
+                tuple(rgb) if rgb is not None else None,
+                restored["brightness"],
+                restored["effect"],
+            )
+        except (KeyError, TypeError):
+            return None
+
+
+class BJLEDLight(LightEntity, RestoreEntity):
+    # Changes with every frame of a stream; kept out of the recorder
+    _unrecorded_attributes = frozenset({"output_rgb"})
+
     def __init__(self, bjledinstance: BJLEDInstance, name: str, entry_id: str) -> None:
         self._instance = bjledinstance
         self._entry_id = entry_id
         self._attr_supported_color_modes = {ColorMode.RGB}
         self._attr_supported_features = (
-            LightEntityFeature.EFFECT | LightEntityFeature.FLASH
+            LightEntityFeature.EFFECT
+            | LightEntityFeature.FLASH
+            | LightEntityFeature.TRANSITION
         )
         self._attr_brightness_step_pct = 10
         self._attr_name = name
         self._attr_unique_id = self._instance.mac
+        # Target state shown while an optimistic write is in flight
+        self._optimistic: dict[str, Any] | None = None
+        self._optimistic_generation = 0
 
     @property
-    def available(self):
-        # return self._instance.is_on != None
-        return True  # We don't know if this is working or not because there is zero feedback from the light, so assume yes
+    def available(self) -> bool:
+        # There is no feedback from the light, so reachable means advertising
+        return self._instance.available
+
+    def _state(self, key: str, value: Any) -> Any:
+        """Return the optimistic target for ``key`` while one is pending."""
+        if self._optimistic is not None and key in self._optimistic:
+            return self._optimistic[key]
+        return value
 
     @property
     def brightness(self):
-        return self._instance.brightness
+        return self._state("brightness", self._instance.brightness)
 
     @property
     def rgb_color(self):
-        return self._instance.rgb_color
+        return self._state("rgb_color", self._instance.rgb_color)
 
     @property
     def is_on(self) -> bool | None:
-        return self._instance.is_on
+        return self._state("is_on", self._instance.is_on)
 
     @property
     def effect_list(self):
@@ -66,7 +116,7 @@ class BJLEDLight(LightEntity):
 
     @property
     def effect(self):
-        return self._instance._effect
+        return self._state("effect", self._instance._effect)
 
     @property
     def supported_features(self) -> int:
@@ -96,35 +146,206 @@ class BJLEDLight(LightEntity):
     def should_poll(self):
         return False
 
-    async def async_turn_on(self, **kwargs: Any) -> None:
-        if not self.is_on:
-            await self._instance.turn_on()
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return {
+            "circuit_breaker": self._instance.circuit_state,
+            "output_rgb": self._instance.output_rgb,
+        }
 
-        if ATTR_BRIGHTNESS in kwargs and kwargs[ATTR_BRIGHTNESS] != self.brightness:
-            self._brightness = kwargs[ATTR_BRIGHTNESS]
-            await self._instance.set_brightness_local(kwargs[ATTR_BRIGHTNESS])  # FIXME
+    async def async_added_to_hass(self) -> None:
+        """Publish state changes made outside this entity, e.g. by a group.
 
-        if ATTR_RGB_COLOR in kwargs:
-            if kwargs[ATTR_RGB_COLOR] != self.rgb_color:
-                self._effect = None
-                bri = kwargs[ATTR_BRIGHTNESS] if ATTR_BRIGHTNESS in kwargs else None
-                await self._instance.set_rgb_color(kwargs[ATTR_RGB_COLOR], bri)
+        Frames written by a transition are published at the throttled rate.
+        """
+        await self._async_restore_state()
+        throttle = self._instance.state_throttle
+        self.async_on_remove(
+            self._instance.register_callback(self._async_write_state)
+        )
+        self.async_on_remove(
+            self._instance.register_output_callback(
+                lambda: throttle.intermediate(self.async_write_ha_state)
+            )
+        )
+        self.async_on_remove(throttle.cancel)
 
-        if ATTR_EFFECT in kwargs:
-            if kwargs[ATTR_EFFECT] != self.effect:
-                self._effect = kwargs[ATTR_EFFECT]
-                await self._instance.set_effect(kwargs[ATTR_EFFECT])
-        self.async_write_ha_state()
+    async def _async_restore_state(self) -> None:
+        """Restore the last known state into the instance, without writing.
+
+        The light reports no state, so the first command would otherwise
+        start from nothing and need the color sent again.
+        """
+        if (last_state := await self.async_get_last_state()) is None:
+            return
+        if last_state.state not in (STATE_ON, STATE_OFF):
+            return
+        if (extra := await self.async_get_last_extra_data()) is not None:
+            stored = BJLEDExtraStoredData.from_dict(extra.as_dict())
+        else:
+            stored = None
+        if stored is None:
+            # Stored before the extra data existed; only complete while on
+            rgb = last_state.attributes.get(ATTR_RGB_COLOR)
+            stored = BJLEDExtraStoredData(
+                tuple(rgb) if rgb is not None else None,
+                last_state.attributes.get(ATTR_BRIGHTNESS),
+                last_state.attributes.get(ATTR_EFFECT),
+            )
+        self._instance.restore_state(
+            last_state.state == STATE_ON,
+            stored.rgb_color,
+            stored.brightness,
+            stored.effect,
+        )
+
+    @property
+    def extra_restore_state_data(self) -> BJLEDExtraStoredData:
+        return BJLEDExtraStoredData(
+            self._instance.rgb_color, self._instance.brightness, self.effect
+        )
+
+    @callback
+    def _async_write_state(self) -> None:
+        """Publish a final state, replacing a pending intermediate one."""
+        self._instance.state_throttle.final(self.async_write_ha_state)
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        if kwargs.get(ATTR_TRANSITION) and ATTR_EFFECT not in kwargs:
+            self._instance.start_transition(
+                kwargs[ATTR_TRANSITION],
+                rgb=kwargs.get(ATTR_RGB_COLOR),
+                brightness=kwargs.get(ATTR_BRIGHTNESS),
+            )
+            self._async_write_state()
+            return
+        write = self._instance.apply_state(
+            rgb=kwargs.get(ATTR_RGB_COLOR),
+            brightness=kwargs.get(ATTR_BRIGHTNESS),
+            effect=kwargs.get(ATTR_EFFECT),
+        )
+        if self._instance.optimistic:
+            self._write_optimistic("turn_on", self._turn_on_target(kwargs), write)
+            return
+        await write
+        self._async_write_state()
 
     async def async_turn_off(self, **kwargs: Any) -> None:
-        await self._instance.turn_off()
-        self.async_write_ha_state()
+        if kwargs.get(ATTR_TRANSITION):
+            self._instance.start_transition(kwargs[ATTR_TRANSITION], turn_off=True)
+        elif self._instance.optimistic:
+            self._write_optimistic(
+                "turn_off", {"is_on": False}, self._instance.turn_off()
+            )
+            return
+        else:
+            await self._instance.turn_off()
+        self._async_write_state()
+
+    def _turn_on_target(self, kwargs: dict[str, Any]) -> dict[str, Any]:
+        """The state ``apply_state`` will reach, as the entity reports it."""
+        rgb = kwargs.get(ATTR_RGB_COLOR)
+        effect = kwargs.get(ATTR_EFFECT)
+        if effect == "None" or (rgb is not None and effect is None):
+            effect = None
+        else:
+            effect = effect or self.effect
+        return {
+            "is_on": True,
+            "rgb_color": rgb or self.rgb_color,
+            "brightness": kwargs.get(ATTR_BRIGHTNESS, self.brightness),
+            "effect": effect,
+        }
+
+    @callback
+    def _write_optimistic(
+        self, command: str, target: dict[str, Any], write: Awaitable[Any]
+    ) -> None:
+        """Publish ``target`` now and run ``write`` in the background.
+
+        When the write fails the target is dropped, so the entity goes back
+        to the state the instance actually reached, and an event is fired.
+        A newer command takes over the published target.
+        """
+        self._optimistic_generation += 1
+        generation = self._optimistic_generation
+        self._optimistic = target
+        self._async_write_state()
+
+        async def _async_write() -> None:
+            try:
+                await write
+            except Exception as err:  # pylint: disable=broad-except
+                LOGGER.warning("%s: %s failed, rolling back: %s", self.name, command, err)
+                self.hass.bus.async_fire(
+                    EVENT_COMMAND_FAILED,
+                    {
+                        "entity_id": self.entity_id,
+                        "command": command,
+                        "target": target,
+                        "error": str(err),
+                    },
+                )
+            if generation == self._optimistic_generation:
+                self._optimistic = None
+                self._async_write_state()
+
+        self.hass.async_create_background_task(
+            _async_write(), f"{DOMAIN} {self.entity_id} {command}"
+        )
 
     async def async_set_effect(self, effect: str) -> None:
         self._effect = effect
         await self._instance.set_effect(effect)
-        self.async_write_ha_state()
+        self._async_write_state()
 
     async def async_update(self) -> None:
         await self._instance.update()
-        self.async_write_ha_state()
+        self._async_write_state()
+
+
+class BJLEDGroupLight(BJLEDLight):
+    """A light that fans commands out to several LEDDMX strips at once."""
+
+    def __init__(self, group: BJLEDGroup, name: str, entry_id: str) -> None:
+        super().__init__(group, name, entry_id)
+        self._attr_unique_id = f"group_{entry_id}"
+
+    @property
+    def effect(self):
+        return self._instance.effect
+
+    @property
+    def color_mode(self):
+        return self._instance.color_mode
+
+    @property
+    def device_info(self):
+        return None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        stats = self._instance.last_fan_out
+        return {
+            "members": [member.name for member in self._instance.members],
+            "spread": round(stats.spread, 3) if stats else None,
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the member lights so the group reflects their changes."""
+        registry = entity_registry.async_get(self.hass)
+        member_entities = [
+            entity_id
+            for mac in self._instance.member_macs
+            if (entity_id := registry.async_get_entity_id("light", DOMAIN, mac))
+        ]
+
+        @callback
+        def _async_member_changed(event: Event) -> None:
+            self.async_write_ha_state()
+
+        self.async_on_remove(
+            async_track_state_change_event(
+                self.hass, member_entities, _async_member_changed
+            )
+        )
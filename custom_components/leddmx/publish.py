@@ -0,0 +1,95 @@
+"""Bound how often a fading light writes its state to Home Assistant.
+
+A transition writes tens of frames per second. Publishing the state for
+every one of them would put a ``state_changed`` event on the bus, a row in
+the recorder and a message to every websocket client per frame. While
+fading, the entity asks for intermediate publishes and the throttle lets
+at most ``rate`` of them through per second. One asked for within the
+interval is written when the interval ends, so the last state of a fade is
+always published. Final states (a command, a finished transition) are
+published at once and replace a pending intermediate one.
+
+Host effects and music streams never end, so even throttled they would
+record a state change twice per second forever; they publish nothing.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+# Intermediate state publishes per second while fading
+DEFAULT_STATE_RATE = 2.0
+
+
+class PublishThrottle:
+    """Rate limit intermediate state publishes of one light."""
+
+    def __init__(self, rate: float = DEFAULT_STATE_RATE) -> None:
+        self.rate = float(rate)
+        self._last: float | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        # Intermediate publishes asked for, i.e. the unthrottled load
+        self.requested = 0
+        self.published = 0
+        self.suppressed = 0
+        self.finals = 0
+
+    def configure(self, rate: float) -> None:
+        self.rate = float(rate)
+
+    def intermediate(self, publish: Callable[[], None]) -> None:
+        """Publish now, or at the end of the current interval."""
+        self.requested += 1
+        if self._timer is not None:
+            # The pending publish writes the state as it is by then
+            self.suppressed += 1
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        due = (self._last or 0.0) + 1 / self.rate
+        if self._last is None or now >= due:
+            self._publish(publish, now)
+            self.published += 1
+            return
+        self.suppressed += 1
+        self._timer = loop.call_at(due, self._publish_pending, publish)
+
+    def _publish_pending(self, publish: Callable[[], None]) -> None:
+        self._timer = None
+        # Stands in for the suppressed request, so it is not counted twice
+        self.suppressed -= 1
+        self.published += 1
+        self._publish(publish, asyncio.get_running_loop().time())
+
+    def final(self, publish: Callable[[], None]) -> None:
+        """Publish now, replacing a pending intermediate publish."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.finals += 1
+        self._publish(publish, asyncio.get_running_loop().time())
+
+    def _publish(self, publish: Callable[[], None], now: float) -> None:
+        self._last = now
+        publish()
+
+    def cancel(self) -> None:
+        """Drop a pending intermediate publish, e.g. when the entity is removed."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the publish counts for diagnostics."""
+        total = self.requested + self.finals
+        return {
+            "rate": self.rate,
+            "intermediate_requested": self.requested,
+            "intermediate_published": self.published,
+            "suppressed": self.suppressed,
+            "final_published": self.finals,
+            # State writes without throttling versus with it
+            "writes_unthrottled": total,
+            "writes": self.published + self.finals,
+        }
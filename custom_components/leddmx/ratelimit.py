@@ -0,0 +1,114 @@
+"""Shape outgoing frames to what the controller can take.
+
+Frames are written without response, so a controller fed faster than it
+can process silently drops frames and the strip can end on the wrong
+color. A token bucket per device caps the frame rate while still letting a
+short burst (a command plus its color) through at once. The write queue
+takes a token before picking the next frame, so frames arriving while it
+waits are coalesced and the newest one, the final frame of a stream, is
+the one written.
+
+With adaptation on, the rate is adjusted additively-increase,
+multiplicatively-decrease: a failed write, or one that took longer than the
+frame interval (the stack is backing up), cuts the rate, and a run of
+clean writes while frames were being held back raises it again, up to the
+configured rate.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+DEFAULT_WRITE_RATE = 30
+# Frames that may be written back to back after an idle period
+BURST = 3
+# The adaptive rate never goes below this
+MIN_RATE = 5.0
+# Share of the rate kept after a congested write
+DECREASE_FACTOR = 0.7
+# Clean writes needed, while limited, to raise the rate by one frame/s
+INCREASE_AFTER = 20
+
+
+class TokenBucket:
+    """Frames per second allowed to one device."""
+
+    def __init__(
+        self, rate: float = DEFAULT_WRITE_RATE, burst: int = BURST, adaptive: bool = True
+    ) -> None:
+        self.configured_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = burst
+        self.adaptive = adaptive
+        self._tokens = float(burst)
+        self._updated: float | None = None
+        self._limited = False
+        self._clean = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.decreases = 0
+        self.increases = 0
+
+    def configure(self, rate: float, adaptive: bool) -> None:
+        """Apply changed options; the learned rate restarts from ``rate``."""
+        self.configured_rate = self.rate = float(rate)
+        self.adaptive = adaptive
+        self._clean = 0
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns the seconds waited."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self._refill(started)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        while self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._refill(loop.time())
+        self._tokens -= 1
+        waited = loop.time() - started
+        self.waits += 1
+        self.wait_total += waited
+        self._limited = True
+        return waited
+
+    def record_write(self, seconds: float, ok: bool) -> None:
+        """Adapt the rate to how long a write took and whether it failed."""
+        if not self.adaptive:
+            return
+        if not ok or seconds > 1 / self.rate:
+            self._clean = 0
+            new_rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+            if new_rate < self.rate:
+                self.rate = new_rate
+                self.decreases += 1
+            return
+        if not self._limited or self.rate >= self.configured_rate:
+            return
+        self._clean += 1
+        if self._clean >= INCREASE_AFTER:
+            self._clean = 0
+            self._limited = False
+            self.rate = min(self.configured_rate, self.rate + 1)
+            self.increases += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the limiter state for diagnostics."""
+        return {
+            "configured_rate": self.configured_rate,
+            "rate": round(self.rate, 2),
+            "adaptive": self.adaptive,
+            "burst": self.burst,
+            "waits": self.waits,
+            "wait_total": round(self.wait_total, 3),
+            "decreases": self.decreases,
+            "increases": self.increases,
+        }
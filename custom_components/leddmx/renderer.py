@@ -0,0 +1,99 @@
+"""Host-side effects rendered with NumPy and streamed to the strip.
+
+Firmware effects are started with a single command. Host effects are
+animations the controller does not have: a whole loop is rendered as an
+``(N, 3)`` color array in one vectorized pass, cached per parameter set,
+and the instance streams it frame by frame at a fixed rate.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+HOST_EFFECT_FPS = 20
+
+RGB = tuple[int, int, int]
+
+# Colors cycled by the palette effect
+RAINBOW_PALETTE: tuple[RGB, ...] = (
+    (255, 0, 0),
+    (255, 127, 0),
+    (255, 255, 0),
+    (0, 255, 0),
+    (0, 255, 255),
+    (0, 0, 255),
+    (255, 0, 255),
+)
+
+
+@dataclass(frozen=True)
+class HostEffect:
+    """An animation rendered on the host.
+
+    ``render`` maps frame times in seconds and the base color to an
+    ``(N, 3)`` float array of colors in the 0-255 range.
+    """
+
+    name: str
+    loop_seconds: float
+    default_color: RGB
+    render: Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def _breathing(times: np.ndarray, color: np.ndarray) -> np.ndarray:
+    period = 4.0
+    intensity = (1 - np.cos(2 * np.pi * times / period)) / 2
+    return np.outer(0.05 + 0.95 * intensity**2, color)
+
+
+def _candle(times: np.ndarray, color: np.ndarray) -> np.ndarray:
+    # Seeded so the cached loop is the same on every render
+    rng = np.random.default_rng(0x1EDD)
+    noise = rng.standard_normal(len(times))
+    # Low-pass the noise so the flame wavers rather than buzzes
+    kernel = np.hanning(7)
+    flicker = np.convolve(noise, kernel / kernel.sum(), mode="same")
+    intensity = np.clip(0.8 + 0.12 * flicker, 0.4, 1.0)
+    return np.outer(intensity, color)
+
+
+def _palette_cycle(times: np.ndarray, color: np.ndarray) -> np.ndarray:
+    palette = np.array(RAINBOW_PALETTE + RAINBOW_PALETTE[:1], dtype=np.float64)
+    seconds_per_color = 2.0
+    position = (times / seconds_per_color) % len(RAINBOW_PALETTE)
+    index = position.astype(np.intp)
+    blend = (position - index)[:, None]
+    return palette[index] * (1 - blend) + palette[index + 1] * blend
+
+
+def _strobe(times: np.ndarray, color: np.ndarray) -> np.ndarray:
+    flashes_per_second = 4.0
+    duty = 0.25
+    lit = (times * flashes_per_second) % 1 < duty
+    return np.outer(lit, color)
+
+
+HOST_EFFECTS: dict[str, HostEffect] = {
+    effect.name: effect
+    for effect in (
+        HostEffect("Breathing", 4.0, (255, 255, 255), _breathing),
+        HostEffect("Candle Flicker", 10.0, (255, 147, 41), _candle),
+        HostEffect("Palette Cycle", 14.0, (255, 0, 0), _palette_cycle),
+        HostEffect("Strobe", 1.0, (255, 255, 255), _strobe),
+    )
+}
+
+
+@lru_cache(maxsize=32)
+def render_effect(name: str, color: RGB, fps: float = HOST_EFFECT_FPS) -> np.ndarray:
+    """Render one loop of a host effect as a read-only ``(N, 3)`` uint8 array."""
+    effect = HOST_EFFECTS[name]
+    count = max(1, round(effect.loop_seconds * fps))
+    times = np.arange(count) / fps
+    colors = effect.render(times, np.asarray(color, dtype=np.float64))
+    frames = np.clip(np.rint(colors), 0, 255).astype(np.uint8)
+    frames.setflags(write=False)
+    return frames
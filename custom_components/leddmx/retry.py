@@ -0,0 +1,266 @@
+"""Deadline-aware retries for Bluetooth operations.
+
+Every public instance operation runs inside a retry budget: a number of
+attempts and a deadline on the loop clock. Failed attempts back off
+exponentially with jitter, and no attempt or back-off runs past the
+deadline. Operations called from inside another one (``set_effect("None")``
+calling ``set_rgb_color``) run once and leave retrying to the outermost
+call, so they spend the same budget instead of multiplying it. A caller
+can open a budget with :func:`retry_budget` to set its own deadline and
+read the attempts and time spent afterwards.
+
+Operations can also be assigned to a lane. A newer operation supersedes the
+in-flight operations of the lanes it names: their current attempt or
+back-off is cancelled and they return without retrying, because what they were going to
+write is stale.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import functools
+import logging
+import random
+from typing import TYPE_CHECKING, Any, TypeVar, cast
+
+from bleak_retry_connector import (
+    BLEAK_RETRY_EXCEPTIONS as BLEAK_EXCEPTIONS,
+    BleakNotFoundError,
+)
+
+from .breaker import CircuitOpenError
+
+if TYPE_CHECKING:
+    from .dmxled import BJLEDInstance
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_RETRY_DEADLINE = 30.0
+BASE_BACKOFF = 0.25
+MAX_BACKOFF = 2.0
+
+WrapFuncType = TypeVar("WrapFuncType", bound=Callable[..., Any])
+
+
+@dataclass
+class RetryBudget:
+    """Attempts and time one operation may spend, and what it did spend."""
+
+    name: str
+    attempts: int
+    deadline: float
+    started: float
+    used: int = 0
+    backoff: float = 0.0
+    elapsed: float = 0.0
+    running: bool = False
+    lane: str | None = None
+    superseded: bool = False
+    # Whether supersede() cancelled the awaited attempt or back-off, as
+    # opposed to the caller being cancelled
+    cancelled_inflight: bool = False
+    # The attempt or back-off being awaited
+    inflight: asyncio.Future | None = field(default=None, repr=False)
+
+    def remaining(self) -> float:
+        return self.deadline - asyncio.get_running_loop().time()
+
+    def next_backoff(self) -> float:
+        """Exponential back-off with equal jitter for the attempt just failed."""
+        cap = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (self.used - 1))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def supersede(self) -> None:
+        """Stop retrying and cancel the attempt or back-off in flight."""
+        self.superseded = True
+        if self.inflight is not None and not self.inflight.done():
+            self.cancelled_inflight = True
+            self.inflight.cancel()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "lane": self.lane,
+            "superseded": self.superseded,
+            "attempts": self.used,
+            "max_attempts": self.attempts,
+            "elapsed": round(self.elapsed, 3),
+            "backoff": round(self.backoff, 3),
+        }
+
+
+_current_budget: ContextVar[RetryBudget | None] = ContextVar(
+    "leddmx_retry_budget", default=None
+)
+
+
+@asynccontextmanager
+async def retry_budget(
+    name: str,
+    deadline: float = DEFAULT_RETRY_DEADLINE,
+    attempts: int = DEFAULT_ATTEMPTS,
+) -> AsyncIterator[RetryBudget]:
+    """Run the operations in the block under one shared budget."""
+    now = asyncio.get_running_loop().time()
+    budget = RetryBudget(name, attempts, now + deadline, now)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+        budget.elapsed = asyncio.get_running_loop().time() - now
+
+
+class LaneRegistry:
+    """The newest in-flight operation of each lane of one device."""
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, RetryBudget] = {}
+        self.superseded: dict[str, int] = {}
+
+    def begin(self, budget: RetryBudget, supersedes: tuple[str, ...]) -> None:
+        """Register ``budget`` and supersede the older operations it replaces.
+
+        An operation always supersedes the older one in its own lane.
+        """
+        lanes = (budget.lane, *supersedes) if budget.lane else supersedes
+        for lane in lanes:
+            if (stale := self._inflight.pop(lane, None)) is not None:
+                LOGGER.debug(
+                    "%s: Newer %s operation supersedes in-flight %s operation",
+                    budget.name,
+                    budget.lane,
+                    lane,
+                )
+                stale.supersede()
+                self.superseded[lane] = self.superseded.get(lane, 0) + 1
+        if budget.lane is not None:
+            self._inflight[budget.lane] = budget
+
+    @property
+    def busy(self) -> bool:
+        """Whether an operation is in flight in any lane."""
+        return bool(self._inflight)
+
+    def end(self, budget: RetryBudget) -> None:
+        if budget.lane is not None and self._inflight.get(budget.lane) is budget:
+            del self._inflight[budget.lane]
+
+
+class _Superseded(Exception):
+    """A newer operation cancelled the attempt or back-off of this one."""
+
+
+async def _await_inflight(
+    budget: RetryBudget, awaitable: Awaitable[Any], timeout: float | None = None
+) -> Any:
+    """Await an attempt or back-off that a newer operation may cancel."""
+    budget.inflight = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.wait_for(budget.inflight, timeout)
+    except asyncio.CancelledError:
+        if budget.cancelled_inflight:
+            # Only the awaited attempt was cancelled, not the caller
+            budget.cancelled_inflight = False
+            raise _Superseded from None
+        raise
+    finally:
+        budget.inflight = None
+
+
+async def run_with_retry(
+    budget: RetryBudget, operation: Callable[[], Awaitable[Any]], label: str
+) -> Any:
+    """Attempt ``operation`` until it succeeds, is superseded or the budget is spent.
+
+    A superseded operation returns None.
+    """
+    budget.running = True
+    try:
+        while not budget.superseded:
+            budget.used += 1
+            try:
+                return await _await_inflight(
+                    budget, operation(), max(0.0, budget.remaining())
+                )
+            except (BleakNotFoundError, CircuitOpenError):
+                # The device cannot be found so there is no point in retrying.
+                raise
+            except BLEAK_EXCEPTIONS as err:
+                backoff = budget.next_backoff()
+                if budget.used >= budget.attempts or budget.remaining() <= backoff:
+                    LOGGER.debug(
+                        "%s: %s error calling %s, giving up after %s attempts in %.2fs",
+                        budget.name,
+                        type(err),
+                        label,
+                        budget.used,
+                        asyncio.get_running_loop().time() - budget.started,
+                        exc_info=True,
+                    )
+                    raise
+                LOGGER.debug(
+                    "%s: %s error calling %s, backing off %.2fs, retrying (%s/%s)...: %s",
+                    budget.name,
+                    type(err),
+                    label,
+                    backoff,
+                    budget.used,
+                    budget.attempts,
+                    err,
+                )
+                budget.backoff += backoff
+                await _await_inflight(budget, asyncio.sleep(backoff))
+    except _Superseded:
+        pass
+    finally:
+        budget.running = False
+    LOGGER.debug("%s: %s superseded by a newer operation", budget.name, label)
+    return None
+
+
+def retry_bluetooth_connection_error(
+    func: WrapFuncType | None = None,
+    *,
+    lane: str | None = None,
+    supersedes: tuple[str, ...] = (),
+) -> Any:
+    """Retry an instance operation within the current or a new budget.
+
+    Used bare or with the ``lane`` the operation runs in and the other lanes
+    whose in-flight operations it supersedes (see :class:`LaneRegistry`,
+    kept on ``instance.lanes``). The budget of the outermost call is kept on
+    ``instance.last_retry``.
+    """
+    if func is None:
+        return functools.partial(
+            retry_bluetooth_connection_error, lane=lane, supersedes=supersedes
+        )
+
+    @functools.wraps(func)
+    async def _async_wrap_retry_bluetooth_connection_error(
+        self: BJLEDInstance, *args: Any, **kwargs: Any
+    ) -> Any:
+        budget = _current_budget.get()
+        if budget is not None and budget.running:
+            # Nested call: the outer call's retry loop covers it
+            return await func(self, *args, **kwargs)
+        if budget is not None:
+            return await run_with_retry(
+                budget, lambda: func(self, *args, **kwargs), func.__name__
+            )
+        async with retry_budget(self.name, self.retry_deadline) as budget:
+            budget.lane = lane
+            self.lanes.begin(budget, supersedes)
+            try:
+                return await run_with_retry(
+                    budget, lambda: func(self, *args, **kwargs), func.__name__
+                )
+            finally:
+                self.lanes.end(budget)
+                self.last_retry = budget
+
+    return cast(WrapFuncType, _async_wrap_retry_bluetooth_connection_error)
@@ -0,0 +1,109 @@
+"""Track which scanners hear a device and which one it is connected through.
+
+With several local adapters and ESPHome proxies in range, Home Assistant's
+Bluetooth stack picks the scanner a connection goes through: it only keeps
+the address of the BLEDevice handed to it and takes the scanner with the
+best RSSI and a free slot. The tracker does not try to steer that choice.
+It keeps a short RSSI history per scanner from the advertisement callbacks,
+and the scanner a connection actually went through once it is read back
+from the slot allocations, so slots are counted on the right adapter.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Any
+
+from bleak.backends.device import BLEDevice
+
+# Advertisements kept per scanner
+RSSI_HISTORY = 10
+# A path not heard from for this long is only used if no other is left
+PATH_STALE = 120.0
+
+
+@dataclass
+class ConnectionPath:
+    """Advertisements seen through one scanner."""
+
+    source: str
+    device: BLEDevice
+    last_seen: float
+    rssi: deque[int] = field(default_factory=lambda: deque(maxlen=RSSI_HISTORY))
+
+    @property
+    def median_rssi(self) -> float:
+        return median(self.rssi) if self.rssi else -100.0
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        return {
+            "rssi": list(self.rssi),
+            "seconds_since_seen": round(now - self.last_seen, 1),
+        }
+
+
+class PathTracker:
+    """Scanners one device is heard through and the one it is connected on."""
+
+    def __init__(self) -> None:
+        self._paths: dict[str, ConnectionPath] = {}
+        # Read back after connecting; None while disconnected or unknown
+        self.connected: str | None = None
+
+    def record_advertisement(
+        self, source: str, device: BLEDevice, rssi: int | None, now: float
+    ) -> None:
+        """Remember the newest BLEDevice and RSSI seen through ``source``."""
+        if (path := self._paths.get(source)) is None:
+            path = self._paths[source] = ConnectionPath(source, device, now)
+        path.device = device
+        path.last_seen = now
+        if rssi is not None:
+            path.rssi.append(rssi)
+
+    def strongest(self, now: float) -> ConnectionPath | None:
+        """Return the fresh path with the best median RSSI, else the last heard.
+
+        That is the scanner Home Assistant is most likely to connect through.
+        """
+        if not self._paths:
+            return None
+        fresh = [
+            path for path in self._paths.values() if now - path.last_seen <= PATH_STALE
+        ]
+        if not fresh:
+            return max(self._paths.values(), key=lambda path: path.last_seen)
+        return max(fresh, key=lambda path: path.median_rssi)
+
+    def _current(self) -> ConnectionPath | None:
+        """The connected path, or the newest one heard."""
+        path = self._paths.get(self.connected) if self.connected else None
+        if path is None and self._paths:
+            path = max(self._paths.values(), key=lambda path: path.last_seen)
+        return path
+
+    @property
+    def last_rssi(self) -> int | None:
+        """RSSI of the newest advertisement through the connected path.
+
+        While not connected the newest advertisement on any path is used.
+        """
+        path = self._current()
+        return path.rssi[-1] if path and path.rssi else None
+
+    def source(self, now: float) -> str | None:
+        """Source of the scanner the device is, or likely would be, connected on."""
+        if self.connected:
+            return self.connected
+        path = self.strongest(now)
+        return path.source if path else None
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Return every path and the connected one for diagnostics."""
+        return {
+            "connected": self.connected,
+            "paths": {
+                source: path.as_dict(now) for source, path in self._paths.items()
+            },
+        }
@@ -0,0 +1,138 @@
+"""Services for the LEDDMX integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+import homeassistant.helpers.config_validation as cv
+
+from .audio import DEFAULT_MUSIC_FPS, AudioFormat, AudioSource, MusicSync
+from .const import (
+    ATTR_CHANNELS,
+    ATTR_FPS,
+    ATTR_SAMPLE_RATE,
+    ATTR_SOURCE,
+    DATA_MUSIC_SYNC,
+    DOMAIN,
+    SERVICE_MUSIC_SYNC_START,
+    SERVICE_MUSIC_SYNC_STOP,
+    SERVICE_PREPARE,
+)
+from .dmxled import BJLEDInstance
+from .group import BJLEDGroup
+
+LOGGER = logging.getLogger(__name__)
+
+MUSIC_SYNC_START_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_SOURCE): cv.string,
+        vol.Optional(ATTR_SAMPLE_RATE, default=44100): vol.All(
+            vol.Coerce(int), vol.Range(min=8000, max=192000)
+        ),
+        vol.Optional(ATTR_CHANNELS, default=1): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=8)
+        ),
+        vol.Optional(ATTR_FPS, default=DEFAULT_MUSIC_FPS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=60)
+        ),
+    }
+)
+MUSIC_SYNC_STOP_SCHEMA = vol.Schema({vol.Optional(ATTR_ENTITY_ID): cv.entity_ids})
+PREPARE_SCHEMA = vol.Schema({vol.Required(ATTR_ENTITY_ID): cv.entity_ids})
+
+
+def _instances_for_entities(
+    hass: HomeAssistant, entity_ids: list[str]
+) -> list[BJLEDInstance]:
+    """Return the instances behind a list of LEDDMX light entities.
+
+    Group lights expand to their loaded members.
+    """
+    registry = er.async_get(hass)
+    instances = []
+    for entity_id in entity_ids:
+        entry = registry.async_get(entity_id)
+        instance = (
+            hass.data.get(DOMAIN, {}).get(entry.config_entry_id) if entry else None
+        )
+        if isinstance(instance, BJLEDGroup):
+            instances.extend(instance.members)
+            continue
+        if not isinstance(instance, BJLEDInstance):
+            raise HomeAssistantError(f"{entity_id} is not a LEDDMX light")
+        instances.append(instance)
+    return list(dict.fromkeys(instances))
+
+
+async def async_stop_music_sync(
+    hass: HomeAssistant, instances: list[BJLEDInstance] | None = None
+) -> None:
+    """Stop the music sync sessions driving any of ``instances`` (or all)."""
+    sessions: list[MusicSync] = hass.data.get(DATA_MUSIC_SYNC, [])
+    for session in list(sessions):
+        if instances is None or set(instances) & set(session.instances):
+            sessions.remove(session)
+            await session.stop()
+
+
+def _check_source_allowed(hass: HomeAssistant, source: str) -> None:
+    """Only read files and sockets the configuration allows, like core services."""
+    if urlparse(source).scheme == "tcp":
+        if not hass.config.is_allowed_external_url(source):
+            raise HomeAssistantError(f"{source} is not in allowlist_external_urls")
+    elif not hass.config.is_allowed_path(source):
+        raise HomeAssistantError(f"{source} is not in allowlist_external_dirs")
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+    sessions: list[MusicSync] = hass.data.setdefault(DATA_MUSIC_SYNC, [])
+
+    async def _async_music_sync_start(call: ServiceCall) -> None:
+        _check_source_allowed(hass, call.data[ATTR_SOURCE])
+        instances = _instances_for_entities(hass, call.data[ATTR_ENTITY_ID])
+        await async_stop_music_sync(hass, instances)
+        session = MusicSync(
+            instances,
+            AudioSource(
+                call.data[ATTR_SOURCE],
+                AudioFormat(call.data[ATTR_SAMPLE_RATE], call.data[ATTR_CHANNELS]),
+            ),
+            call.data[ATTR_FPS],
+        )
+        session.start()
+        sessions.append(session)
+
+    async def _async_music_sync_stop(call: ServiceCall) -> None:
+        entity_ids = call.data.get(ATTR_ENTITY_ID)
+        await async_stop_music_sync(
+            hass, _instances_for_entities(hass, entity_ids) if entity_ids else None
+        )
+
+    async def _async_prepare(call: ServiceCall) -> None:
+        instances = _instances_for_entities(hass, call.data[ATTR_ENTITY_ID])
+        await asyncio.gather(*(instance.prepare() for instance in instances))
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_MUSIC_SYNC_START,
+        _async_music_sync_start,
+        schema=MUSIC_SYNC_START_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_MUSIC_SYNC_STOP,
+        _async_music_sync_stop,
+        schema=MUSIC_SYNC_STOP_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PREPARE, _async_prepare, schema=PREPARE_SCHEMA
+    )
@@ -0,0 +1,237 @@
+"""Software transitions for LEDDMX strips.
+
+The controller has no fade command, so transitions are rendered on the host:
+color and brightness are interpolated and written at a target frame rate.
+Frames are paced against the loop's monotonic clock; when a write overruns
+its budget the frames that are already late are dropped instead of being
+written behind schedule, so a transition always ends on time.
+
+Long fades change the 8-bit output far less often than the frame rate
+would write it. For those the exact times at which the scaled output
+changes are computed up front and only those frames are written, leaving
+the connection idle (and free to disconnect) in between.
+"""
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_right
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+import logging
+
+import numpy as np
+
+from .codec import FRAME_LENGTH, encode_rgb_batch
+from .color import ColorPipeline
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TRANSITION_FPS = 20
+# Wake up this long before a write that follows a long idle gap so the
+# connection is re-established by the time the frame is due.
+PREPARE_LEAD_TIME = 5.0
+
+MODE_PACED = "paced"
+MODE_QUANTIZED = "quantized"
+
+RGB = tuple[int, int, int]
+
+
+@dataclass
+class TransitionStats:
+    """Pacing statistics of one transition."""
+
+    target_fps: float
+    duration: float = 0.0
+    mode: str = MODE_PACED
+    frames_planned: int = 0
+    frames_saved: int = 0
+    frames_sent: int = 0
+    frames_dropped: int = 0
+    elapsed: float = 0.0
+    max_jitter: float = 0.0
+    _jitter_total: float = field(default=0.0, repr=False)
+
+    def record_jitter(self, jitter: float) -> None:
+        """Record how late a frame started against its schedule."""
+        self._jitter_total += jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+
+    @property
+    def achieved_fps(self) -> float:
+        """Frames actually written per second."""
+        return self.frames_sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_jitter(self) -> float:
+        """Average lateness of written frames in seconds."""
+        return self._jitter_total / self.frames_sent if self.frames_sent else 0.0
+
+    def as_dict(self) -> dict[str, float | str]:
+        """Return the statistics for diagnostics."""
+        return {
+            "mode": self.mode,
+            "target_fps": self.target_fps,
+            "achieved_fps": round(self.achieved_fps, 2),
+            "duration": self.duration,
+            "elapsed": round(self.elapsed, 3),
+            "frames_planned": self.frames_planned,
+            "frames_saved": self.frames_saved,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "mean_jitter": round(self.mean_jitter, 4),
+            "max_jitter": round(self.max_jitter, 4),
+        }
+
+
+def _levels_at(
+    start: tuple[RGB, int], end: tuple[RGB, int], fractions: np.ndarray
+) -> np.ndarray:
+    """Return the rounded ``(R, G, B, brightness)`` inputs at each fraction."""
+    start_values = np.array([*start[0], start[1]], dtype=np.float64)
+    delta = np.array([*end[0], end[1]], dtype=np.float64) - start_values
+    values = start_values + np.outer(fractions, delta)
+    return np.clip(np.floor(values + 0.5), 0, 255).astype(np.uint8)
+
+
+def paced_schedule(
+    start: tuple[RGB, int],
+    end: tuple[RGB, int],
+    duration: float,
+    fps: float,
+    pipeline: ColorPipeline,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return frame times and ``(N, 9)`` frames for a fixed frame rate."""
+    total = max(1, round(duration * fps))
+    fractions = np.arange(1, total + 1) / total
+    levels = _levels_at(start, end, fractions)
+    colors = pipeline.scale_batch(levels[:, :3], levels[:, 3])
+    return fractions * duration, encode_rgb_batch(colors)
+
+
+def quantized_schedule(
+    start: tuple[RGB, int],
+    end: tuple[RGB, int],
+    duration: float,
+    pipeline: ColorPipeline,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return only the times and frames at which the 8-bit output changes.
+
+    Each input (R, G, B, brightness) is linear in time, so its rounded
+    value changes exactly when it crosses a half level. Between two
+    consecutive crossings every input is constant, hence so is the scaled
+    output; the segments whose output equals the one before (or the start
+    state) are dropped.
+    The last frame always carries the exact end state.
+    """
+    start_values = np.array([*start[0], start[1]], dtype=np.float64)
+    delta = np.array([*end[0], end[1]], dtype=np.float64) - start_values
+    crossings = [np.zeros(1)]
+    for value, change in zip(start_values, delta):
+        if not change:
+            continue
+        low, high = sorted((value, value + change))
+        halves = np.arange(np.floor(low + 0.5), np.ceil(high - 0.5)) + 0.5
+        halves = halves[(halves > low) & (halves < high)]
+        crossings.append((halves - value) / change)
+    fractions = np.unique(np.concatenate(crossings))
+    midpoints = (fractions + np.append(fractions[1:], 1.0)) / 2
+    levels = np.clip(
+        np.floor(start_values + np.outer(midpoints, delta) + 0.5), 0, 255
+    ).astype(np.uint8)
+    colors = np.concatenate(
+        [
+            pipeline.scale_batch(levels[:, :3], levels[:, 3]),
+            np.array([pipeline.scale(end[0], end[1])], dtype=np.uint8),
+        ]
+    )
+    times = np.append(fractions * duration, duration)
+    previous = np.concatenate(
+        [np.array([pipeline.scale(start[0], start[1])], dtype=np.uint8), colors[:-1]]
+    )
+    changed = np.any(colors != previous, axis=1)
+    if not changed.any():
+        changed[-1] = True
+    return times[changed], encode_rgb_batch(colors[changed])
+
+
+class TransitionEngine:
+    """Interpolate color and brightness over time at a target frame rate."""
+
+    def __init__(self, fps: float = DEFAULT_TRANSITION_FPS) -> None:
+        self.fps = fps
+        self.last_stats: TransitionStats | None = None
+
+    def plan(
+        self,
+        start: tuple[RGB, int],
+        end: tuple[RGB, int],
+        duration: float,
+        pipeline: ColorPipeline,
+    ) -> tuple[str, np.ndarray, np.ndarray, int]:
+        """Pick the cheaper schedule for a fade.
+
+        Returns the mode, frame times, frames and the number of frames the
+        fixed frame rate would have written.
+        """
+        paced_times, paced_frames = paced_schedule(
+            start, end, duration, self.fps, pipeline
+        )
+        times, frames = quantized_schedule(start, end, duration, pipeline)
+        if len(times) < len(paced_times):
+            return MODE_QUANTIZED, times, frames, len(paced_times)
+        return MODE_PACED, paced_times, paced_frames, len(paced_times)
+
+    async def run(
+        self,
+        start: tuple[RGB, int],
+        end: tuple[RGB, int],
+        duration: float,
+        pipeline: ColorPipeline,
+        write_frame: Callable[[memoryview], Awaitable[None]],
+        prepare: Callable[[], Awaitable[None]] | None = None,
+    ) -> TransitionStats:
+        """Fade from ``start`` to ``end`` (color, brightness) over ``duration``.
+
+        ``write_frame`` receives encoded frames; the last one is always the
+        exact end state. ``prepare`` is awaited ahead of a frame that follows
+        an idle gap long enough for the connection to have been dropped.
+        """
+        loop = asyncio.get_running_loop()
+        mode, times, frames, paced_count = self.plan(start, end, duration, pipeline)
+        stats = self.last_stats = TransitionStats(
+            self.fps,
+            duration,
+            mode,
+            frames_planned=len(times),
+            frames_saved=paced_count - len(times),
+        )
+        due_times = times.tolist()
+        stream = memoryview(frames).cast("B")
+        last = len(due_times) - 1
+        started = loop.time()
+        index = 0
+        while index <= last:
+            due = started + due_times[index]
+            now = loop.time()
+            if prepare is not None and due - now > 2 * PREPARE_LEAD_TIME:
+                await asyncio.sleep(due - now - PREPARE_LEAD_TIME)
+                await prepare()
+                now = loop.time()
+            if now < due:
+                await asyncio.sleep(due - now)
+                now = loop.time()
+            # Skip the frames whose successor is already due
+            latest = min(bisect_right(due_times, now - started) - 1, last)
+            if latest > index:
+                stats.frames_dropped += latest - index
+                index = latest
+                due = started + due_times[index]
+            stats.record_jitter(max(0.0, now - due))
+            offset = index * FRAME_LENGTH
+            await write_frame(stream[offset : offset + FRAME_LENGTH])
+            stats.frames_sent += 1
+            index += 1
+        stats.elapsed = loop.time() - started
+        LOGGER.debug("Transition finished: %s", stats.as_dict())
+        return stats
@@ -8,7 +8,8 @@ from bleak.backends.device import BLEDevice
 from bleak.backends.service import BleakGATTCharacteristic, BleakGATTServiceCollection
 from home_assistant_bluetooth import BluetoothServiceInfo
 from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
-from homeassistant.core import HomeAssistant
+from homeassistant.components.bluetooth.const import DATA_MANAGER as BLUETOOTH_MANAGER
+from homeassistant.core import CoreState, HomeAssistant
 
 from custom_components.leddmx.const import DOMAIN
 
@@ -18,12 +19,16 @@ def hass():
     """Create a mock Home Assistant instance."""
     hass = MagicMock(spec=HomeAssistant)
     hass.data = {}
+    hass.state = CoreState.not_running
     hass.config_entries = MagicMock()
     hass.config_entries.async_forward_entry_setups = AsyncMock()
     hass.config_entries.async_unload_platforms = AsyncMock(return_value=True)
     hass.config_entries.async_reload = AsyncMock()
     hass.bus = MagicMock()
     hass.bus.async_listen_once = MagicMock(return_value=MagicMock())
+    # A Bluetooth manager that knows no scanners
+    hass.data[BLUETOOTH_MANAGER] = MagicMock()
+    hass.data[BLUETOOTH_MANAGER].async_scanner_devices_by_address.return_value = []
     return hass
 
 
@@ -0,0 +1,181 @@
+"""Tests for audio module."""
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+import wave
+
+import numpy as np
+import pytest
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.leddmx.audio import (
+    AudioFormat,
+    AudioSource,
+    BandAnalyzer,
+    MusicSync,
+    iter_blocks,
+)
+from custom_components.leddmx.const import ATTR_SOURCE, SERVICE_MUSIC_SYNC_START
+from custom_components.leddmx.services import async_setup_services
+
+SAMPLE_RATE = 22050
+
+
+def _write_wav(path, frequencies, seconds, channels=1):
+    """Write a 16-bit WAV fixture with one tone per second segment."""
+    times = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    segment = len(times) // len(frequencies)
+    signal = np.concatenate(
+        [
+            0.5 * np.sin(2 * np.pi * frequency * times[:segment])
+            for frequency in frequencies
+        ]
+    )
+    samples = (signal * 32767).astype("<i2")
+    if channels > 1:
+        samples = np.repeat(samples[:, None], channels, axis=1)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+@pytest.fixture
+def wav_fixture(tmp_path):
+    """Create a one second WAV fixture: bass, then mid, then treble."""
+    return _write_wav(tmp_path / "tones.wav", [100, 1000, 5000], 1.0)
+
+
+def test_band_analyzer_maps_bands_to_channels():
+    """Test bass, mid and treble tones light red, green and blue."""
+    analyzer = BandAnalyzer(SAMPLE_RATE)
+    times = np.arange(analyzer.block_size) / SAMPLE_RATE
+    blocks = np.stack(
+        [np.sin(2 * np.pi * frequency * times) for frequency in (100, 1000, 5000)]
+    )
+
+    energies = analyzer.energies(blocks)
+
+    assert energies.argmax(axis=1).tolist() == [0, 1, 2]
+
+
+def test_band_analyzer_batch_is_fast():
+    """Test a minute of audio is analyzed in one vectorized pass quickly."""
+    analyzer = BandAnalyzer(SAMPLE_RATE)
+    blocks = np.random.default_rng(0).standard_normal((60 * 30, analyzer.block_size))
+
+    started = time.perf_counter()
+    colors = analyzer.colors(blocks)
+    elapsed = time.perf_counter() - started
+
+    assert colors.shape == (1800, 3)
+    assert elapsed < 2
+
+
+def test_audio_source_reads_stereo_wav(tmp_path):
+    """Test stereo WAV input is folded to mono at the file sample rate."""
+    path = _write_wav(tmp_path / "stereo.wav", [440], 0.5, channels=2)
+    source = AudioSource(str(path))
+    source.open()
+    try:
+        assert source.format == AudioFormat(SAMPLE_RATE, 2)
+        blocks = list(iter_blocks(source, 735, 1024))
+    finally:
+        source.close()
+
+    assert len(blocks) == 15
+    assert all(block.shape == (1024,) for block in blocks)
+
+
+def test_audio_source_reads_raw_pcm(tmp_path):
+    """Test raw PCM input uses the given format."""
+    path = tmp_path / "audio.pcm"
+    path.write_bytes(np.zeros(1000, dtype="<i2").tobytes())
+    source = AudioSource(str(path), AudioFormat(8000, 1))
+    source.open()
+    try:
+        assert len(source.read(600)) == 600
+        assert len(source.read(600)) == 400
+        assert len(source.read(600)) == 0
+    finally:
+        source.close()
+
+
+@pytest.mark.asyncio
+async def test_music_sync_streams_wav_fixture(wav_fixture):
+    """Test a WAV fixture is streamed at a sustained rate with latency stats."""
+    instances = [MagicMock(), MagicMock()]
+    for instance in instances:
+        instance.write_stream_color = AsyncMock()
+    session = MusicSync(instances, AudioSource(str(wav_fixture)), fps=30)
+
+    session.start()
+    while session.running:
+        await asyncio.sleep(0.05)
+
+    stats = session.stats
+    assert stats.frames_analyzed == 30
+    assert stats.frames_sent + stats.frames_dropped == stats.frames_analyzed
+    assert stats.frames_sent >= 25
+    assert 20 < stats.achieved_fps < 40
+    assert stats.max_latency < 0.1
+    colors = [
+        call.args[0] for call in instances[0].write_stream_color.call_args_list
+    ]
+    assert colors[5][0] > colors[5][2]
+    assert colors[-1][2] > colors[-1][0]
+    assert instances[1].write_stream_color.call_count == stats.frames_sent
+
+
+@pytest.mark.asyncio
+async def test_music_sync_stop(wav_fixture):
+    """Test stopping a session ends the writer promptly."""
+    instance = MagicMock()
+    instance.write_stream_color = AsyncMock()
+    session = MusicSync([instance], AudioSource(str(wav_fixture)), fps=30)
+
+    session.start()
+    await asyncio.sleep(0.1)
+    await session.stop()
+
+    assert not session.running
+    assert session.stats.frames_analyzed < 30
+
+
+def _music_sync_start_handler(hass):
+    """Register the services and return the music_sync_start handler."""
+    hass.services = MagicMock()
+    async_setup_services(hass)
+    for call in hass.services.async_register.call_args_list:
+        if call.args[1] == SERVICE_MUSIC_SYNC_START:
+            return call.args[2]
+    raise AssertionError("music_sync_start not registered")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("source", "check"),
+    [
+        ("/etc/shadow", "is_allowed_path"),
+        ("tcp://10.0.0.1:22", "is_allowed_external_url"),
+    ],
+)
+async def test_music_sync_rejects_sources_not_allowlisted(hass, source, check):
+    """Test files and sockets outside the allowlists are not opened."""
+    hass.config = MagicMock()
+    getattr(hass.config, check).return_value = False
+    handler = _music_sync_start_handler(hass)
+    call = MagicMock()
+    call.data = {ATTR_ENTITY_ID: ["light.strip"], ATTR_SOURCE: source}
+
+    with patch("custom_components.leddmx.services.MusicSync") as music_sync:
+        with pytest.raises(HomeAssistantError):
+            await handler(call)
+
+    music_sync.assert_not_called()
+    getattr(hass.config, check).assert_called_once_with(source)
@@ -0,0 +1,113 @@
+"""Tests for breaker module."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bleak.exc import BleakError
+
+from custom_components.leddmx.breaker import (
+    FAILURE_THRESHOLD,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from custom_components.leddmx.dmxled import BJLEDInstance
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff():
+    """Shrink the retry back-off so tests run quickly."""
+    with patch("custom_components.leddmx.retry.BASE_BACKOFF", 0.001):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_opens_after_threshold():
+    """Test the breaker opens after consecutive failures and rejects calls."""
+    breaker = CircuitBreaker("test")
+    for _ in range(FAILURE_THRESHOLD - 1):
+        assert not breaker.record_failure(BleakError("gone"))
+    breaker.check()
+
+    assert breaker.record_failure(BleakError("gone"))
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_success_resets_failure_count():
+    """Test failures must be consecutive to open the breaker."""
+    breaker = CircuitBreaker("test")
+    for _ in range(FAILURE_THRESHOLD - 1):
+        breaker.record_failure(BleakError("gone"))
+    breaker.record_success()
+    breaker.record_failure(BleakError("gone"))
+
+    assert breaker.state == STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial():
+    """Test an advertisement allows one trial whose failure re-opens."""
+    breaker = CircuitBreaker("test", threshold=1)
+    breaker.record_failure(BleakError("gone"))
+
+    assert breaker.advertisement_seen()
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.check()
+    assert breaker.record_failure(BleakError("still gone"))
+    assert breaker.state == STATE_OPEN
+
+    breaker.advertisement_seen()
+    assert breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_cooldown_half_opens():
+    """Test the breaker half-opens on its own after the cooldown."""
+    breaker = CircuitBreaker("test", threshold=1, cooldown=0)
+    breaker.record_failure(BleakError("gone"))
+
+    assert breaker.state == STATE_HALF_OPEN
+
+
+@pytest.mark.asyncio
+async def test_unreachable_device_fails_fast(
+    hass, mock_ble_device, mock_async_ble_device_from_address, mock_bleak_client
+):
+    """Test commands stop connecting once the breaker opened, until it advertises."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.offline_max_age = 0
+    with patch(
+        "custom_components.leddmx.dmxled.establish_connection",
+        side_effect=BleakError("Device not reachable"),
+    ) as establish:
+        with pytest.raises(BleakError):
+            await instance.turn_on()
+        assert establish.call_count == FAILURE_THRESHOLD
+        assert instance.circuit_state == STATE_OPEN
+
+        with pytest.raises(CircuitOpenError):
+            await instance.turn_off()
+        assert establish.call_count == FAILURE_THRESHOLD
+        assert instance.last_retry.used == 1
+
+    instance.prepare = AsyncMock()
+    instance.advertisement_seen()
+    assert instance.circuit_state == STATE_HALF_OPEN
+
+    with patch(
+        "custom_components.leddmx.dmxled.establish_connection",
+        return_value=mock_bleak_client,
+    ):
+        await instance.turn_off()
+
+    assert instance.circuit_state == STATE_CLOSED
+    assert instance.diagnostics()["circuit_breaker"]["opened"] == 1
+    await instance.stop()
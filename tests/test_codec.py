@@ -0,0 +1,98 @@
+"""Tests for codec module."""
+import numpy as np
+import pytest
+
+from custom_components.leddmx.codec import (
+    CMD_EFFECT,
+    CMD_RGB,
+    EFFECT_FRAMES,
+    FRAME_LENGTH,
+    TURN_OFF_FRAME,
+    TURN_ON_FRAME,
+    FrameError,
+    decode_frame,
+    encode_effect,
+    encode_rgb,
+    encode_rgb_batch,
+    iter_frames,
+)
+from custom_components.leddmx.effects import effects_dmx
+
+
+def test_power_frames_match_protocol():
+    """Test the precomputed on/off frames."""
+    assert TURN_ON_FRAME == bytes.fromhex("7b ff 07 00 00 ff 00 ff bf")
+    assert TURN_OFF_FRAME == bytes.fromhex("7b ff 07 00 00 00 00 ff bf")
+
+
+def test_encode_rgb():
+    """Test RGB frame encoding."""
+    assert encode_rgb(0x12, 0x34, 0x56) == bytes.fromhex("7b ff 07 12 34 56 00 ff bf")
+
+
+def test_effect_frames_precomputed():
+    """Test every firmware effect has a precomputed frame."""
+    assert set(EFFECT_FRAMES) == set(effects_dmx)
+    for name, effect_id in effects_dmx.items():
+        assert EFFECT_FRAMES[name] == bytes.fromhex(
+            f"7b ff 03 {effect_id:02x} ff ff ff ff bf"
+        )
+
+
+def test_decode_round_trip():
+    """Test decoding frames produced by the encoders."""
+    decoded = decode_frame(encode_rgb(10, 20, 30))
+    assert decoded.command == CMD_RGB
+    assert decoded.rgb == (10, 20, 30)
+    assert decoded.effect_id is None
+
+    decoded = decode_frame(encode_effect(0x25))
+    assert decoded.command == CMD_EFFECT
+    assert decoded.effect_id == 0x25
+    assert decoded.rgb is None
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        bytes.fromhex("7b ff 07 00 00 00 00 ff"),
+        bytes.fromhex("7a ff 07 00 00 00 00 ff bf"),
+        bytes.fromhex("7b ff 07 00 00 00 00 ff be"),
+        bytes.fromhex("7b ff 09 00 00 00 00 ff bf"),
+    ],
+)
+def test_decode_rejects_invalid_frames(frame):
+    """Test malformed frames are rejected."""
+    with pytest.raises(FrameError):
+        decode_frame(frame)
+
+
+def test_encode_rgb_batch():
+    """Test batch encoding produces a contiguous frame stream."""
+    colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+
+    frames = encode_rgb_batch(colors)
+
+    assert frames.shape == (3, FRAME_LENGTH)
+    assert frames.flags["C_CONTIGUOUS"]
+    stream = frames.tobytes()
+    assert [bytes(frame) for frame in iter_frames(stream)] == [
+        encode_rgb(255, 0, 0),
+        encode_rgb(0, 255, 0),
+        encode_rgb(0, 0, 255),
+    ]
+
+
+def test_encode_rgb_batch_reuses_output():
+    """Test batch encoding into a preallocated array."""
+    out = np.zeros((2, FRAME_LENGTH), dtype=np.uint8)
+    result = encode_rgb_batch(np.array([[1, 2, 3], [4, 5, 6]]), out=out)
+
+    assert result is out
+    assert bytes(out[1]) == encode_rgb(4, 5, 6)
+
+
+def test_encode_rgb_batch_rejects_bad_shape():
+    """Test batch encoding validates the color array shape."""
+    with pytest.raises(ValueError):
+        encode_rgb_batch(np.zeros((4, 4), dtype=np.uint8))
@@ -0,0 +1,72 @@
+"""Tests for color module."""
+import numpy as np
+import pytest
+
+from custom_components.leddmx.color import (
+    BRIGHTNESS_LUT,
+    DEFAULT_PIPELINE,
+    ColorPipeline,
+    gamma_lut,
+)
+
+
+def test_brightness_lut_rounds_once():
+    """Test the brightness table is exact to the nearest level."""
+    assert BRIGHTNESS_LUT.shape == (256, 256)
+    assert BRIGHTNESS_LUT.dtype == np.uint8
+    for brightness in (0, 1, 77, 128, 200, 255):
+        for value in (0, 1, 100, 254, 255):
+            assert BRIGHTNESS_LUT[brightness, value] == round(value * brightness / 255)
+
+
+def test_brightness_lut_keeps_all_levels():
+    """Test full red keeps 256 distinct output levels, not 101."""
+    assert len(set(BRIGHTNESS_LUT[:, 255].tolist())) == 256
+
+
+def test_default_pipeline_scale():
+    """Test scaling a color with the identity pipeline."""
+    assert DEFAULT_PIPELINE.scale((255, 128, 0), 255) == (255, 128, 0)
+    assert DEFAULT_PIPELINE.scale((255, 128, 0), 128) == (128, 64, 0)
+    assert DEFAULT_PIPELINE.scale((255, 128, 0), 0) == (0, 0, 0)
+
+
+def test_gamma_lut():
+    """Test gamma correction keeps the end points and darkens mid tones."""
+    lut = gamma_lut(2.2)
+    assert lut[0] == 0
+    assert lut[255] == 255
+    assert lut[128] < 128
+    with pytest.raises(ValueError):
+        gamma_lut(0)
+
+
+def test_white_balance():
+    """Test white balance scales each channel to its white point."""
+    pipeline = ColorPipeline(white_balance=(255, 128, 0))
+    assert pipeline.scale((255, 255, 255), 255) == (255, 128, 0)
+
+
+def test_scale_batch_matches_scalar_path():
+    """Test the vectorized path matches the per-color path."""
+    pipeline = ColorPipeline(gamma=2.2, white_balance=(255, 200, 180))
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, size=(64, 3), dtype=np.uint8)
+    levels = rng.integers(0, 256, size=64, dtype=np.uint8)
+
+    batch = pipeline.scale_batch(colors, levels)
+
+    expected = [
+        pipeline.scale(tuple(color), int(level))
+        for color, level in zip(colors.tolist(), levels.tolist())
+    ]
+    assert batch.tolist() == [list(color) for color in expected]
+
+
+def test_scale_batch_single_brightness():
+    """Test scaling a batch by one brightness level."""
+    colors = np.array([[255, 255, 255], [100, 50, 0]], dtype=np.uint8)
+    assert DEFAULT_PIPELINE.scale_batch(colors, 128).tolist() == [
+        [128, 128, 128],
+        [50, 25, 0],
+    ]
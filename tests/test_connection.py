@@ -0,0 +1,223 @@
+"""Tests for connection module."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+
+from custom_components.leddmx.connection import (
+    ConnectionManager,
+    get_connection_manager,
+)
+from custom_components.leddmx.const import DATA_CONNECTION_MANAGER
+from custom_components.leddmx.dmxled import BJLEDInstance
+
+
+class FakeInstance:
+    """Stand-in for a BJLEDInstance on a given adapter."""
+
+    def __init__(self, manager, name, source="hci0", idle=True, details=None):
+        self.name = name
+        self.mac = name
+        # No advertisement seen yet; the details name the adapter
+        self.source = None
+        self.ble_device = BLEDevice(name, name, details or {"source": source})
+        self.connection_idle = idle
+        self.released = 0
+        self._manager = manager
+
+    async def release_connection(self):
+        self.released += 1
+        self._manager.release(self)
+
+
+@pytest.fixture
+def manager(hass):
+    """Create a manager whose adapters have two slots."""
+    manager = ConnectionManager(hass, default_slots=2)
+    with patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_by_source",
+        return_value=MagicMock(get_allocations=MagicMock(return_value=None)),
+    ):
+        yield manager
+
+
+@pytest.mark.asyncio
+async def test_slots_granted_up_to_limit_then_fifo(manager):
+    """Test busy devices queue in arrival order once the adapter is full."""
+    first, second, third, fourth = (
+        FakeInstance(manager, name, idle=False) for name in "abcd"
+    )
+    await manager.acquire(first)
+    await manager.acquire(second)
+
+    order = []
+
+    async def _acquire(instance):
+        await manager.acquire(instance)
+        order.append(instance.name)
+
+    waiting = [
+        asyncio.create_task(_acquire(third)),
+        asyncio.create_task(_acquire(fourth)),
+    ]
+    await asyncio.sleep(0)
+    assert manager.diagnostics()["hci0"]["waiting"] == ["c", "d"]
+
+    manager.release(first)
+    await asyncio.wait_for(waiting[0], 1)
+    assert order == ["c"]
+    manager.release(second)
+    await asyncio.gather(*waiting)
+    assert order == ["c", "d"]
+    assert manager.diagnostics()["hci0"]["holders"] == ["c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_idle_device_is_evicted(manager):
+    """Test a device needing a slot takes it from the LRU idle device."""
+    first, second, third = (FakeInstance(manager, name) for name in "abc")
+    await manager.acquire(first)
+    await manager.acquire(second)
+    manager.touch(first)
+
+    await manager.acquire(third)
+
+    assert second.released == 1
+    assert first.released == 0
+    slots = manager.diagnostics()["hci0"]
+    assert slots["holders"] == ["a", "c"]
+    assert slots["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_prewarm_does_not_evict(manager):
+    """Test a speculative connect only takes a free slot."""
+    first, second, third = (FakeInstance(manager, name) for name in "abc")
+    await manager.acquire(first)
+    await manager.acquire(second)
+
+    with pytest.raises(BleakError):
+        await manager.acquire(third, evict=False)
+
+    assert first.released == second.released == 0
+    slots = manager.diagnostics()["hci0"]
+    assert slots["holders"] == ["a", "b"]
+    assert slots["declined"] == 1
+
+    manager.release(first)
+    await manager.acquire(third, evict=False)
+    assert manager.diagnostics()["hci0"]["holders"] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_adapters_have_separate_slots(manager):
+    """Test devices on different adapters do not compete."""
+    local = [FakeInstance(manager, name, idle=False) for name in "ab"]
+    proxy = FakeInstance(manager, "c", source="proxy", idle=False)
+    for instance in local:
+        await manager.acquire(instance)
+
+    await asyncio.wait_for(manager.acquire(proxy), 1)
+
+    assert manager.diagnostics()["proxy"]["in_use"] == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_times_out(manager):
+    """Test a device gives up when no slot frees up in time."""
+    busy = [FakeInstance(manager, name, idle=False) for name in "ab"]
+    for instance in busy:
+        await manager.acquire(instance)
+
+    with patch("custom_components.leddmx.connection.SLOT_WAIT_TIMEOUT", 0.01):
+        with pytest.raises(BleakError):
+            await manager.acquire(FakeInstance(manager, "c"))
+
+    slots = manager.diagnostics()["hci0"]
+    assert slots["timeouts"] == 1
+    assert slots["waiting"] == []
+
+
+@pytest.mark.asyncio
+async def test_idle_device_hands_slot_to_waiter(manager):
+    """Test a device that goes idle releases its slot to a queued device."""
+    first, second = (FakeInstance(manager, name, idle=False) for name in "ab")
+    await manager.acquire(first)
+    await manager.acquire(second)
+    waiter = asyncio.create_task(manager.acquire(FakeInstance(manager, "c")))
+    await asyncio.sleep(0)
+
+    first.connection_idle = True
+    manager.notify_idle(first)
+    await asyncio.wait_for(waiter, 1)
+
+    assert first.released == 1
+    assert manager.diagnostics()["hci0"]["holders"] == ["b", "c"]
+
+
+def test_slot_limit_excludes_foreign_allocations(hass):
+    """Test slots held by other integrations are not handed out."""
+    manager = ConnectionManager(hass)
+    allocations = MagicMock(slots=3, allocated=["11:22:33:44:55:66"])
+    scanner = MagicMock(get_allocations=MagicMock(return_value=allocations))
+    instance = FakeInstance(manager, "a")
+    with patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_by_source",
+        return_value=scanner,
+    ):
+        slots = manager._slots(instance)
+
+    assert slots.limit == 2
+
+
+def test_local_adapter_uses_its_allocations(hass):
+    """Test a BlueZ device is counted on its adapter, not on a default bucket."""
+    manager = ConnectionManager(hass, default_slots=5)
+    allocations = MagicMock(slots=3, allocated=[])
+    scanner = MagicMock(
+        source="00:1A:7D:DA:71:13",
+        adapter="hci1",
+        get_allocations=MagicMock(return_value=allocations),
+    )
+    instance = FakeInstance(
+        manager,
+        "a",
+        details={"path": "/org/bluez/hci1/dev_a", "props": {"Adapter": "/org/bluez/hci1"}},
+    )
+    with patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_devices_by_address",
+        return_value=[MagicMock(scanner=scanner)],
+    ), patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_by_source",
+        return_value=scanner,
+    ) as scanner_by_source:
+        assert manager.adapter_for(instance) == "00:1A:7D:DA:71:13"
+        slots = manager._slots(instance)
+
+        # Once advertisements were seen, their source is used directly
+        instance.source = "00:1A:7D:DA:71:13"
+        assert manager.adapter_for(instance) == "00:1A:7D:DA:71:13"
+
+    assert slots.limit == 3
+    scanner_by_source.assert_called_with(hass, "00:1A:7D:DA:71:13")
+
+
+@pytest.mark.asyncio
+async def test_instances_share_one_manager(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test every instance registers its connection with the shared manager."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    await instance.apply_state(rgb=(1, 2, 3))
+
+    manager = get_connection_manager(hass)
+    assert hass.data[DATA_CONNECTION_MANAGER] is manager
+    assert manager.holds_slot(instance)
+    await instance.stop()
+    assert not manager.holds_slot(instance)
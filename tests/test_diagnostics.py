@@ -0,0 +1,22 @@
+"""Tests for diagnostics."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.leddmx.const import DOMAIN
+from custom_components.leddmx.diagnostics import async_get_config_entry_diagnostics
+
+
+@pytest.mark.asyncio
+async def test_config_entry_diagnostics(hass, mock_config_entry):
+    """Test diagnostics redact the MAC and include instance statistics."""
+    instance = MagicMock()
+    instance.diagnostics.return_value = {"write_queue": {"coalesced": 3}}
+    hass.data[DOMAIN] = {mock_config_entry.entry_id: instance}
+
+    result = await async_get_config_entry_diagnostics(hass, mock_config_entry)
+
+    assert result["entry"]["data"]["mac"] == "**REDACTED**"
+    assert result["instance"] == {"write_queue": {"coalesced": 3}}
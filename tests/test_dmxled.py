@@ -1,13 +1,15 @@
 """Tests for dmxled module."""
 from __future__ import annotations
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from bleak.exc import BleakDBusError
 from bleak_retry_connector import BleakNotFoundError
 from homeassistant.components.light import ColorMode
-from custom_components.leddmx.dmxled import BJLEDInstance
+from custom_components.leddmx.color import ColorPipeline
+from custom_components.leddmx.dmxled import TURN_OFF_CMD, BJLEDInstance, BJLEDWriteQueue
 from custom_components.leddmx.effects import effects_dmx
 
 
@@ -236,3 +238,1010 @@ async def test_retry_on_bleak_not_found_error(
     
     with pytest.raises(BleakNotFoundError):
         await instance.turn_on()
+
+
+@pytest.mark.asyncio
+async def test_write_queue_coalesces_state_writes():
+    """Test pending state frames collapse into the newest one."""
+    written = []
+    gate = asyncio.Event()
+
+    async def _writer(data):
+        await gate.wait()
+        written.append(bytes(data))
+
+    queue = BJLEDWriteQueue("test", _writer)
+    tasks = [asyncio.create_task(queue.submit(bytearray([1])))]
+    # Let the first frame go in flight before the others arrive
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    tasks += [
+        asyncio.create_task(queue.submit(bytearray([2]))),
+        asyncio.create_task(queue.submit(bytearray([3]))),
+        asyncio.create_task(queue.submit(bytearray([4]))),
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+
+    # The first frame is already in flight, the next three collapse into one
+    assert written == [b"\x01", b"\x04"]
+    assert queue.coalesced == 2
+    assert queue.written == 2
+
+
+@pytest.mark.asyncio
+async def test_write_queue_power_lane_preempts_state():
+    """Test power frames are written in order, ahead of waiting state frames."""
+    written = []
+    gate = asyncio.Event()
+
+    async def _writer(data):
+        await gate.wait()
+        written.append(bytes(data))
+
+    queue = BJLEDWriteQueue("test", _writer)
+    tasks = [asyncio.create_task(queue.submit(bytearray([1])))]
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    tasks += [
+        asyncio.create_task(queue.submit(bytearray([2]))),
+        asyncio.create_task(queue.submit(bytearray([0xF0]), power=True)),
+        asyncio.create_task(queue.submit(bytearray([3]))),
+        asyncio.create_task(queue.submit(bytearray([0xF1]), power=True)),
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+
+    assert written == [b"\x01", b"\xf0", b"\xf1", b"\x03"]
+    assert queue.coalesced == 1
+    lanes = queue.as_dict()["lanes"]
+    assert lanes["power"]["frames"] == 2
+    assert lanes["state"]["frames"] == 2
+    assert lanes["state"]["max_wait"] >= lanes["power"]["max_wait"]
+
+
+@pytest.mark.asyncio
+async def test_write_queue_off_supersedes_waiting_state():
+    """Test an off frame drops the waiting color so the strip stays off."""
+    written = []
+    gate = asyncio.Event()
+
+    async def _writer(data):
+        await gate.wait()
+        written.append(bytes(data))
+
+    queue = BJLEDWriteQueue("test", _writer)
+    tasks = [asyncio.create_task(queue.submit(bytearray([1])))]
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    tasks += [
+        asyncio.create_task(queue.submit(bytearray([2]))),
+        asyncio.create_task(queue.submit(bytearray([0xF1]), power=True, supersede=True)),
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+
+    # The color being written is abandoned too, off does not wait for it
+    assert written == [b"\xf1"]
+    assert queue.superseded == 1
+    assert queue.abandoned == 1
+
+
+@pytest.mark.asyncio
+async def test_turn_off_skips_stale_connect(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test turning off does not wait for the connect of a color it supersedes."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    connects = []
+
+    async def _establish_connection(*args, **kwargs):
+        connects.append(asyncio.get_running_loop().time())
+        if len(connects) == 1:
+            # The stale connect hangs
+            await asyncio.sleep(10)
+        return mock_bleak_client
+
+    mock_establish_connection.side_effect = _establish_connection
+    color = asyncio.create_task(instance.apply_state(rgb=(255, 0, 0)))
+    await asyncio.sleep(0.05)
+    started = asyncio.get_running_loop().time()
+    await asyncio.wait_for(instance.turn_off(), 1)
+
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert await color is None
+    assert len(connects) == 2
+    written = [bytes(call.args[1]) for call in mock_bleak_client.write_gatt_char.call_args_list]
+    assert written == [bytes(instance._turn_off_cmd or TURN_OFF_CMD)]
+    assert instance.is_on is False
+    assert instance._write_queue.abandoned == 1
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_queue_propagates_errors():
+    """Test a failed write is raised to every caller waiting on it."""
+    gate = asyncio.Event()
+
+    async def _writer(data):
+        await gate.wait()
+        if data == bytearray([2]):
+            raise BleakDBusError("test error", {"error": "test"})
+
+    queue = BJLEDWriteQueue("test", _writer)
+    first = asyncio.create_task(queue.submit(bytearray([1])))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    stale = asyncio.create_task(queue.submit(bytearray([9])))
+    newest = asyncio.create_task(queue.submit(bytearray([2])))
+    await asyncio.sleep(0)
+    gate.set()
+
+    await first
+    with pytest.raises(BleakDBusError):
+        await stale
+    with pytest.raises(BleakDBusError):
+        await newest
+
+
+@pytest.mark.asyncio
+async def test_apply_state_brightness_and_color_single_frame(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test brightness plus color from off is written as one RGB frame."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = False
+
+    sent = await instance.apply_state(rgb=(255, 0, 0), brightness=255)
+
+    assert sent == 1
+    mock_bleak_client.write_gatt_char.assert_called_once()
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 ff 00 00 00 ff bf")
+    assert instance.is_on is True
+    assert instance.rgb_color == (255, 0, 0)
+    assert instance.brightness == 255
+
+
+@pytest.mark.asyncio
+async def test_apply_state_unchanged_sends_nothing(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test nothing is written when the target state is already applied."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = True
+    instance._rgb_color = (0, 255, 0)
+
+    sent = await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+
+    assert sent == 0
+    mock_bleak_client.write_gatt_char.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_apply_state_effect_single_frame(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test an effect from off is written as a single effect frame."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = False
+
+    sent = await instance.apply_state(effect="AUTO")
+
+    assert sent == 1
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 03 ff ff ff ff ff bf")
+    assert instance.effect == "AUTO"
+
+
+@pytest.mark.asyncio
+async def test_apply_state_plain_turn_on(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test turning on without a known color sends the power frame."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    sent = await instance.apply_state()
+
+    assert sent == 1
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 00 00 ff 00 ff bf")
+    assert instance.is_on is True
+
+
+@pytest.mark.asyncio
+async def test_apply_state_scales_with_color_pipeline(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test RGB frames are scaled through the instance color pipeline."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.color_pipeline = ColorPipeline(white_balance=(255, 255, 128))
+
+    await instance.apply_state(rgb=(255, 255, 255), brightness=128)
+
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 80 80 40 00 ff bf")
+
+
+@pytest.mark.asyncio
+async def test_restored_state_makes_first_command_one_frame(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a brightness change after a restart is one frame in the restored color."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.restore_state(True, (255, 0, 0), 255, None)
+
+    sent = await instance.apply_state(brightness=128)
+
+    assert sent == 1
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 80 00 00 00 ff bf")
+    assert instance.rgb_color == (255, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_restore_state_keeps_known_state(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test restoring does not overwrite a state the instance already has."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._rgb_color = (0, 0, 255)
+
+    instance.restore_state(False, (255, 0, 0), 10, "Unknown effect")
+
+    assert instance.rgb_color == (0, 0, 255)
+    assert instance.brightness == 255
+
+
+@pytest.mark.asyncio
+async def test_start_transition_fades_to_target(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a background transition reports the target and ends on it."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = False
+    instance.transition_fps = 50
+
+    instance.start_transition(0.1, rgb=(0, 255, 0), brightness=255)
+
+    assert instance.is_on is True
+    assert instance.rgb_color == (0, 255, 0)
+    assert instance.transitioning is True
+    await instance._transition_task
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 00 ff 00 00 ff bf")
+    assert instance.diagnostics()["transition"]["last"]["frames_sent"] > 1
+
+
+@pytest.mark.asyncio
+async def test_transition_reports_output_then_final_state(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test each transition frame is reported and the end publishes the state."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = False
+    instance.transition_fps = 50
+    outputs = []
+    finals = []
+    instance.register_output_callback(lambda: outputs.append(instance.output_rgb))
+    instance.register_callback(lambda: finals.append(instance.output_rgb))
+
+    instance.start_transition(0.1, rgb=(0, 255, 0), brightness=255)
+    await instance._transition_task
+
+    assert len(outputs) > 1
+    assert outputs[-1] == (0, 255, 0)
+    assert finals == [(0, 255, 0)]
+
+
+@pytest.mark.asyncio
+async def test_command_cancels_transition(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a new command cancels a running transition and is written."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = True
+    instance._rgb_color = (255, 0, 0)
+
+    instance.start_transition(10, rgb=(0, 0, 255))
+    task = instance._transition_task
+    await asyncio.sleep(0)
+    await instance.apply_state(rgb=(0, 0, 255))
+
+    assert task.cancelled() or task.done()
+    assert instance.transitioning is False
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 00 00 ff 00 ff bf")
+
+
+@pytest.mark.asyncio
+async def test_host_effect_streams_until_next_command(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a host effect streams frames and stops on the next command."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    assert "Breathing" in instance.effect_list
+
+    sent = await instance.apply_state(effect="Breathing")
+    await asyncio.sleep(0.2)
+
+    assert sent == 0
+    assert instance.effect == "Breathing"
+    assert mock_bleak_client.write_gatt_char.call_count > 1
+    assert instance.diagnostics()["host_effect"]["running"] is True
+
+    await instance.apply_state(rgb=(255, 0, 0))
+    count = mock_bleak_client.write_gatt_char.call_count
+    await asyncio.sleep(0.1)
+
+    assert instance.effect is None
+    assert mock_bleak_client.write_gatt_char.call_count == count
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 ff 00 00 00 ff bf")
+
+
+@pytest.mark.asyncio
+async def test_endless_streams_do_not_report_output(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test host effect and music frames are written without publishing the state."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    outputs = []
+    instance.register_output_callback(lambda: outputs.append(instance.output_rgb))
+
+    await instance.apply_state(effect="Breathing")
+    await asyncio.sleep(0.1)
+    for value in range(10, 50, 10):
+        await instance.write_stream_color((value, 0, 0))
+
+    assert mock_bleak_client.write_gatt_char.call_count > 4
+    assert instance.output_rgb == (40, 0, 0)
+    assert outputs == []
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_delay_learned_from_gaps(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test the learned delay replaces the configured one once trained."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    assert instance._disconnect_delay() == 120
+
+    for _ in range(6):
+        instance._last_activity = instance.loop.time() - 170
+        await instance._ensure_connected()
+
+    assert instance._disconnect_delay() == 180
+    assert instance._disconnect_timer.when() - instance.loop.time() > 170
+    keepalive = instance.diagnostics()["keepalive"]
+    assert keepalive["hits"] == 5
+    assert keepalive["misses"] == 1
+    instance.adaptive_delay = False
+    assert instance._disconnect_delay() == 120
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_prepare_connects_ahead_of_command(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test pre-warming connects once and the command then only writes."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    await instance.prepare("service")
+    await instance.prepare("service")
+    assert mock_establish_connection.call_count == 1
+    await instance.apply_state(rgb=(0, 255, 0))
+
+    assert mock_establish_connection.call_count == 1
+    mock_bleak_client.write_gatt_char.assert_called_once()
+    assert instance.diagnostics()["prewarm"]["count"] == 1
+    assert instance.diagnostics()["keepalive"]["samples"] == 0
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_prepare_failure_is_not_raised(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test a failed pre-warm is recorded and left to the next command."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    with patch(
+        "custom_components.leddmx.dmxled.establish_connection",
+        side_effect=BleakDBusError("org.bluez.Error", []),
+    ):
+        await instance.prepare("startup")
+
+    assert instance.diagnostics()["prewarm"]["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_advertisement_after_absence_prewarms(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test only an advertisement after a period of absence pre-warms."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.prepare = AsyncMock()
+
+    instance.advertisement_seen()
+    instance.advertisement_seen()
+    await asyncio.sleep(0)
+    assert instance.prepare.call_count == 1
+
+    instance._last_seen -= 600
+    instance.advertisement_seen()
+    await asyncio.sleep(0)
+    assert instance.prepare.call_count == 2
+    instance.prepare.assert_called_with("advertisement")
+
+
+@pytest.mark.asyncio
+async def test_idle_disconnect_is_not_absence(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test a long connection without advertisements is not followed by a pre-warm."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.prepare = AsyncMock()
+    instance.advertisement_seen()
+    await asyncio.sleep(0)
+    assert instance.prepare.call_count == 1
+
+    # Connected for ten minutes, not advertising meanwhile
+    instance._last_seen -= 600
+    instance._expected_disconnect = True
+    instance._disconnected(MagicMock())
+    instance.advertisement_seen()
+    await asyncio.sleep(0)
+
+    assert instance.prepare.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_prewarm(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test a pre-warm still running when the entry unloads is cancelled."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    started = asyncio.Event()
+
+    async def _prepare(trigger):
+        started.set()
+        await asyncio.sleep(10)
+
+    instance.prepare = _prepare
+    instance.advertisement_seen()
+    await started.wait()
+    (task,) = instance._prepare_tasks
+
+    await instance.stop()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_state_pushed_again_after_unexpected_disconnect(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test the known state is written once when the device advertises again."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+    mock_bleak_client.write_gatt_char.reset_mock()
+
+    instance._disconnected(mock_bleak_client)
+    instance.advertisement_seen()
+    instance.advertisement_seen()
+    await instance._reconcile_task
+
+    mock_bleak_client.write_gatt_char.assert_called_once()
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 00 ff 00 00 ff bf")
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["pushed"] == 1
+    assert stats["frames"] == 1
+    assert stats["pending"] is False
+
+
+@pytest.mark.asyncio
+async def test_reconcile_skipped_after_command_and_rate_limited(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a command after the drop replaces the push and flapping is limited."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+
+    instance._disconnected(mock_bleak_client)
+    await instance.apply_state(rgb=(255, 0, 0))
+    instance.advertisement_seen()
+    await instance._reconcile_task
+    assert instance.diagnostics()["reconcile"]["skipped"] == 1
+
+    # Dropping out again within the interval waits for a later advertisement
+    mock_bleak_client.write_gatt_char.reset_mock()
+    instance._disconnected(mock_bleak_client)
+    instance.advertisement_seen()
+    await asyncio.sleep(0)
+    mock_bleak_client.write_gatt_char.assert_not_called()
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["rate_limited"] == 1
+    assert stats["pending"] is True
+
+
+@pytest.mark.asyncio
+async def test_reconcile_does_not_supersede_command_in_flight(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test the push waits for a command still retrying instead of cancelling it."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+    instance._disconnected(mock_bleak_client)
+    attempts = []
+
+    async def _write(uuid, data, response):
+        attempts.append(bytes(data))
+        if len(attempts) == 1:
+            raise BleakDBusError("org.bluez.Error.Failed", [])
+
+    mock_bleak_client.write_gatt_char.side_effect = _write
+    with patch("custom_components.leddmx.retry.BASE_BACKOFF", 0.1):
+        command = asyncio.create_task(instance.apply_state(rgb=(255, 0, 0)))
+        await asyncio.sleep(0.02)
+        # The first attempt failed; the command is backing off
+        instance.advertisement_seen()
+        await instance._reconcile_task
+        assert await command == 1
+
+    red = instance._rgb_frame((255, 0, 0), 255)
+    assert attempts == [red, red]
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["deferred"] == 1
+    assert stats["pushed"] == 0
+    assert instance.diagnostics()["write_queue"]["commands_superseded"] == {}
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_restarting_host_effect_is_pushed(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test restarting a host effect is a push, not a deferral behind its frames."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.restore_state(True, (255, 0, 0), 255, "Breathing")
+    instance._disconnected(mock_bleak_client)
+
+    instance.advertisement_seen()
+    await instance._reconcile_task
+
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["pushed"] == 1
+    assert stats["deferred"] == 0
+    # The effect's own frames are not the push's
+    assert stats["frames"] == 0
+    assert stats["pending"] is False
+    assert instance.diagnostics()["host_effect"]["running"] is True
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_unknown_state_not_pushed_after_drop(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test nothing is owed to a device whose state was never set."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.prepare = AsyncMock()
+
+    instance._disconnected(MagicMock())
+    instance.advertisement_seen()
+
+    assert instance._reconcile_task is None
+    assert instance.diagnostics()["reconcile"]["drops"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unavailable_device_is_not_connected(
+    hass, mock_establish_connection, mock_bleak_client
+):
+    """Test a device the Bluetooth stack has not seen is not connected to."""
+    with patch(
+        "custom_components.leddmx.dmxled.bluetooth.async_ble_device_from_address",
+        return_value=None,
+    ):
+        instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    assert instance.available is False
+    instance.offline_max_age = 0
+
+    with pytest.raises(BleakNotFoundError):
+        await instance.turn_on()
+    mock_establish_connection.assert_not_called()
+
+    instance.prepare = AsyncMock()
+    instance.advertisement_seen()
+    await instance.turn_on()
+    mock_bleak_client.write_gatt_char.assert_called_once()
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_commands_queued_while_unreachable_flush_on_advertisement(
+    hass, mock_establish_connection, mock_bleak_client
+):
+    """Test commands to an unreachable device collapse into one later write."""
+    with patch(
+        "custom_components.leddmx.dmxled.bluetooth.async_ble_device_from_address",
+        return_value=None,
+    ):
+        instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    assert await instance.apply_state(rgb=(255, 0, 0)) == 0
+    await instance.turn_off()
+    await instance.apply_state(rgb=(0, 0, 255), brightness=128)
+    mock_establish_connection.assert_not_called()
+    assert instance.is_on is True
+    assert instance.rgb_color == (0, 0, 255)
+
+    instance.advertisement_seen()
+    await instance._reconcile_task
+
+    mock_bleak_client.write_gatt_char.assert_called_once()
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 00 00 80 00 ff bf")
+    stats = instance.diagnostics()["offline_queue"]
+    assert stats["queued"] == 3
+    assert stats["flushed"] == 1
+    assert stats["queued_age"] is None
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_flush_is_not_queued_again(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a flush to a device gone again fails and stays owed, not queued anew."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.set_available(False)
+    await instance.apply_state(rgb=(255, 0, 0), brightness=255)
+    mock_bleak_client.write_gatt_char.assert_not_called()
+
+    instance.advertisement_seen()
+    # Dropped out again before the flush ran
+    instance.set_available(False)
+    await instance._reconcile_task
+
+    mock_bleak_client.write_gatt_char.assert_not_called()
+    assert instance.diagnostics()["offline_queue"]["queued"] == 1
+    assert instance.diagnostics()["offline_queue"]["flushed"] == 0
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["failures"] == 1
+    assert stats["pushed"] == 0
+    assert stats["pending"] is True
+
+    # A later advertisement, past the reconcile interval
+    instance._last_reconcile -= 120
+    instance.advertisement_seen()
+    await instance._reconcile_task
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == instance._rgb_frame((255, 0, 0), 255)
+    assert instance.diagnostics()["offline_queue"]["flushed"] == 1
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_superseded_push_stays_owed(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a push that wrote nothing is not counted and is tried again."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+    instance._disconnected(mock_bleak_client)
+
+    with patch.object(instance, "apply_state", AsyncMock(return_value=None)):
+        instance.advertisement_seen()
+        await instance._reconcile_task
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["pushed"] == 0
+    assert stats["pending"] is True
+
+    instance.advertisement_seen()
+    await instance._reconcile_task
+    stats = instance.diagnostics()["reconcile"]
+    assert stats["pushed"] == 1
+    assert stats["pending"] is False
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_skipped_reconcile_forgets_queued_command(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a command written after a queued one leaves no stale base behind."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.offline_max_age = 60
+    await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+    instance.set_available(False)
+    await instance.apply_state(rgb=(255, 0, 0))
+    instance.set_available(True)
+    await instance.apply_state(rgb=(0, 0, 255))
+
+    instance.advertisement_seen()
+    await instance._reconcile_task
+    assert instance.diagnostics()["reconcile"]["skipped"] == 1
+    assert instance.diagnostics()["offline_queue"]["queued_age"] is None
+
+    # Dropping out again much later pushes blue, not the old base
+    instance.set_available(False)
+    instance._last_reconcile -= 120
+    instance.advertisement_seen()
+    await instance._reconcile_task
+    assert instance.rgb_color == (0, 0, 255)
+    assert instance.diagnostics()["offline_queue"]["expired"] == 0
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == instance._rgb_frame((0, 0, 255), 255)
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_expired_queued_command_is_not_written(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a queued command older than the limit is dropped for the prior state."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.offline_max_age = 60
+    await instance.apply_state(rgb=(0, 255, 0), brightness=255)
+    instance.set_available(False)
+    mock_bleak_client.write_gatt_char.reset_mock()
+    states = []
+    instance.register_callback(lambda: states.append(instance.rgb_color))
+
+    await instance.apply_state(rgb=(255, 0, 0))
+    instance._offline_queued_at -= 120
+    instance.advertisement_seen()
+    await instance._reconcile_task
+
+    assert instance.rgb_color == (0, 255, 0)
+    assert (0, 255, 0) in states
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == bytes.fromhex("7b ff 07 00 ff 00 00 ff bf")
+    assert instance.diagnostics()["offline_queue"]["expired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_connected_device_stays_available_without_advertising(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a device quiet while connected keeps taking commands over the link."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    await instance.apply_state(rgb=(255, 0, 0))
+
+    instance.advertising_stopped()
+    assert instance.available is True
+    await instance.apply_state(rgb=(0, 255, 0))
+    frame = mock_bleak_client.write_gatt_char.call_args[0][1]
+    assert bytes(frame) == instance._rgb_frame((0, 255, 0), 255)
+    assert instance.diagnostics()["offline_queue"]["queued"] == 0
+
+    # Once the link is gone, the missing advertisements count
+    instance._disconnected(mock_bleak_client)
+    assert instance.available is False
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_connect_makes_device_available(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a successful connect marks the device available again."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    async def _establish_connection(*args, **kwargs):
+        # The advertisement expires while the connection is being set up
+        instance.advertising_stopped()
+        return mock_bleak_client
+
+    mock_establish_connection.side_effect = _establish_connection
+    await instance.apply_state(rgb=(255, 0, 0))
+
+    assert instance.available is True
+    assert instance.diagnostics()["availability"]["changes"] == 2
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_availability_published_only_on_change(
+    hass, mock_ble_device, mock_async_ble_device_from_address
+):
+    """Test listeners are told about availability flips, not every advertisement."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.prepare = AsyncMock()
+    listener = MagicMock()
+    instance.register_callback(listener)
+
+    for _ in range(5):
+        instance.advertisement_seen()
+    listener.assert_not_called()
+
+    instance.set_available(False)
+    instance.set_available(False)
+    instance.advertisement_seen()
+    instance.advertisement_seen()
+
+    assert listener.call_count == 2
+    assert instance.diagnostics()["availability"]["changes"] == 2
+
+
+@pytest.mark.asyncio
+async def test_turn_off_cancels_stale_color_retry(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a color stuck in retries stops retrying once the light is turned off."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._rgb_color = (0, 0, 255)
+    written = []
+
+    async def _write(uuid, data, response):
+        if bytes(data) == instance._rgb_frame((255, 0, 0), 255):
+            # The red frame keeps failing
+            raise BleakDBusError("org.bluez.Error.Failed", [])
+        written.append(bytes(data))
+
+    mock_bleak_client.write_gatt_char.side_effect = _write
+    with patch("custom_components.leddmx.retry.BASE_BACKOFF", 0.2):
+        color = asyncio.create_task(instance.apply_state(rgb=(255, 0, 0)))
+        await asyncio.sleep(0.05)
+        started = asyncio.get_running_loop().time()
+        await instance.turn_off()
+        assert await color is None
+
+    assert asyncio.get_running_loop().time() - started < 0.1
+    assert written == [instance._turn_off_cmd]
+    assert instance.is_on is False
+    assert instance.rgb_color == (0, 0, 255)
+    assert instance.diagnostics()["write_queue"]["commands_superseded"] == {"state": 1}
+    await instance.stop()
+
+
+async def _stream_then_wait(instance, colors):
+    for rgb in colors:
+        await instance.write_stream_color(rgb)
+    # Let the quiet period and the re-sends pass
+    await asyncio.sleep(0.2)
+
+
+@pytest.mark.asyncio
+async def test_final_frame_of_burst_is_resent(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test the last frame of a burst is sent again once writes go quiet."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    colors = [(value, 0, 0) for value in range(10, 60, 10)]
+
+    with patch("custom_components.leddmx.dmxled.SETTLE_QUIET", 0.02):
+        await _stream_then_wait(instance, colors)
+
+    calls = mock_bleak_client.write_gatt_char.call_args_list
+    final = instance._rgb_frame(colors[-1], 255)
+    assert [bytes(call.args[1]) for call in calls[-3:]] == [final] * 3
+    assert all(call.args[2] is False for call in calls)
+    stats = instance.diagnostics()["final_frame"]
+    assert stats["bursts"] == 1
+    assert stats["resends"] == 2
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_final_frame_confirmed_with_response(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a characteristic that acknowledges writes confirms the final frame once."""
+    mock_bleak_client.services.get_characteristic.return_value.properties = [
+        "write",
+        "write-without-response",
+    ]
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    colors = [(0, value, 0) for value in range(10, 40, 10)]
+
+    with patch("custom_components.leddmx.dmxled.SETTLE_QUIET", 0.02):
+        await _stream_then_wait(instance, colors)
+
+    calls = mock_bleak_client.write_gatt_char.call_args_list
+    assert len(calls) == len(colors) + 1
+    assert bytes(calls[-1].args[1]) == instance._rgb_frame(colors[-1], 255)
+    assert calls[-1].args[2] is True
+    assert instance.diagnostics()["final_frame"]["confirmed"] == 1
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_turn_off_after_burst_is_not_undone(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test turning off right after a burst is not followed by its final color."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    colors = [(value, 0, 0) for value in range(10, 60, 10)]
+
+    with patch("custom_components.leddmx.dmxled.SETTLE_QUIET", 0.02):
+        for rgb in colors:
+            await instance.write_stream_color(rgb)
+        await instance.turn_off()
+        await asyncio.sleep(0.2)
+
+    calls = mock_bleak_client.write_gatt_char.call_args_list
+    assert bytes(calls[-1].args[1]) == bytes(instance._turn_off_cmd or TURN_OFF_CMD)
+    assert len(calls) == len(colors) + 1
+    stats = instance.diagnostics()["final_frame"]
+    assert stats["resends"] == 0
+    assert instance._write_queue.burst == 0
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_stream_arms_one_settle_timer(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test idles between stream frames reuse one timer instead of starting tasks."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    timers = set()
+
+    with patch("custom_components.leddmx.dmxled.SETTLE_QUIET", 0.3), patch.object(
+        instance, "_settle", wraps=instance._settle
+    ) as settle:
+        for value in range(10, 110, 10):
+            await instance.write_stream_color((value, 0, 0))
+            if instance._settle_timer is not None:
+                timers.add(instance._settle_timer)
+            assert instance._settle_task is None
+        await asyncio.sleep(0.8)
+
+    assert len(timers) == 1
+    settle.assert_called_once()
+    assert instance.diagnostics()["final_frame"]["resends"] == 2
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_single_command_is_not_resent(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a lone command is not a burst and is written once."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    with patch("custom_components.leddmx.dmxled.SETTLE_QUIET", 0.02):
+        await instance.apply_state(rgb=(1, 2, 3))
+        await asyncio.sleep(0.1)
+
+    assert mock_bleak_client.write_gatt_char.call_count == 1
+    await instance.stop()
@@ -0,0 +1,148 @@
+"""Tests for gatt_cache module."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bleak.exc import BleakCharacteristicNotFoundError, BleakError
+
+from custom_components.leddmx.const import DATA_GATT_CACHE
+from custom_components.leddmx.dmxled import BJLEDInstance
+from custom_components.leddmx.gatt_cache import GattCache, async_get_gatt_cache
+
+WRITE_UUID = "0000ffe1-0000-1000-8000-00805f9b34fb"
+STORED = {
+    "AA:BB:CC:DD:EE:FF": {
+        "write_uuid": WRITE_UUID,
+        "handle": 12,
+        "service_uuid": "0000ffe0-0000-1000-8000-00805f9b34fb",
+        "properties": ["write-without-response"],
+    }
+}
+
+
+@pytest.fixture
+def mock_store():
+    """Mock the storage helper."""
+    with patch("custom_components.leddmx.gatt_cache.Store") as store_class:
+        store = store_class.return_value
+        store.async_load = AsyncMock(return_value=None)
+        yield store
+
+
+@pytest.mark.asyncio
+async def test_cache_loaded_once(hass, mock_store):
+    """Test every entry shares one cache loaded from storage."""
+    mock_store.async_load.return_value = STORED
+
+    cache = await async_get_gatt_cache(hass)
+
+    assert await async_get_gatt_cache(hass) is cache
+    assert hass.data[DATA_GATT_CACHE] is cache
+    assert cache.get("aa:bb:cc:dd:ee:ff")["handle"] == 12
+    mock_store.async_load.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_update_saves_only_changes(hass, mock_store, mock_bleak_client):
+    """Test resolving the same characteristic again does not rewrite storage."""
+    cache = await async_get_gatt_cache(hass)
+    char = mock_bleak_client.services.get_characteristic()
+    char.handle = 12
+    char.service_uuid = "0000ffe0-0000-1000-8000-00805f9b34fb"
+    char.properties = ["write-without-response"]
+
+    cache.update("AA:BB:CC:DD:EE:FF", char)
+    cache.update("AA:BB:CC:DD:EE:FF", char)
+
+    assert cache.get("AA:BB:CC:DD:EE:FF") == STORED["AA:BB:CC:DD:EE:FF"]
+    assert mock_store.async_delay_save.call_count == 1
+    cache.invalidate("AA:BB:CC:DD:EE:FF")
+    assert cache.get("AA:BB:CC:DD:EE:FF") is None
+    assert mock_store.async_delay_save.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_restored_characteristic_skips_resolution(
+    hass, mock_store, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a cold start writes to the stored characteristic without resolving."""
+    mock_store.async_load.return_value = dict(STORED)
+    await async_get_gatt_cache(hass)
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    await instance.apply_state(rgb=(255, 0, 0))
+    await instance._execute_disconnect()
+    await instance.apply_state(rgb=(0, 255, 0))
+
+    mock_bleak_client.services.get_characteristic.assert_not_called()
+    assert mock_bleak_client.write_gatt_char.call_args[0][0] == WRITE_UUID
+    assert instance.diagnostics()["gatt_cache"]["restored"] is True
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_keeps_resolved_characteristic(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test reconnecting reuses the characteristic resolved before."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+
+    await instance.apply_state(rgb=(255, 0, 0))
+    await instance._execute_disconnect()
+    await instance.apply_state(rgb=(0, 255, 0))
+
+    assert mock_bleak_client.services.get_characteristic.call_count == 1
+    assert instance.diagnostics()["gatt_cache"]["resolved"] == 1
+    # The UUID is written, so the next client resolves it in its own services
+    written = [call[0][0] for call in mock_bleak_client.write_gatt_char.call_args_list]
+    assert written and all(isinstance(uuid, str) for uuid in written)
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_characteristic_error_invalidates_cache(
+    hass, mock_store, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a missing characteristic drops the cache and resolves again."""
+    mock_store.async_load.return_value = dict(STORED)
+    cache = await async_get_gatt_cache(hass)
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    mock_bleak_client.write_gatt_char.side_effect = [
+        BleakCharacteristicNotFoundError(WRITE_UUID),
+        None,
+    ]
+
+    await instance.apply_state(rgb=(255, 0, 0))
+
+    assert mock_bleak_client.write_gatt_char.call_count == 2
+    mock_bleak_client.clear_cache.assert_called_once()
+    mock_bleak_client.services.get_characteristic.assert_called()
+    assert instance.diagnostics()["gatt_cache"]["invalidated"] == 1
+    assert cache.get("AA:BB:CC:DD:EE:FF")["write_uuid"] == WRITE_UUID
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_other_write_error_keeps_characteristic(
+    hass, mock_store, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test only a missing characteristic drops the cache, not any mention of one."""
+    mock_store.async_load.return_value = dict(STORED)
+    cache = await async_get_gatt_cache(hass)
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    mock_bleak_client.write_gatt_char.side_effect = [
+        BleakError("Failed to write characteristic 12: Not connected"),
+        None,
+    ]
+
+    await instance.apply_state(rgb=(255, 0, 0))
+
+    mock_bleak_client.clear_cache.assert_not_called()
+    assert instance.diagnostics()["gatt_cache"]["invalidated"] == 0
+    assert cache.get("AA:BB:CC:DD:EE:FF") is not None
+    await instance.stop()
@@ -0,0 +1,148 @@
+"""Tests for group module."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bleak.exc import BleakDBusError
+
+from custom_components.leddmx.const import DOMAIN
+from custom_components.leddmx.dmxled import BJLEDInstance
+from custom_components.leddmx.group import BJLEDGroup
+
+MACS = [f"AA:BB:CC:DD:EE:0{index}" for index in range(4)]
+CONNECT_TIME = 0.05
+
+
+@pytest.fixture
+async def members(hass):
+    """Create four member instances, each with its own connection delay."""
+    clients = {}
+    connecting = {"now": 0, "max": 0}
+
+    async def _establish_connection(client_class, device, *args, **kwargs):
+        connecting["now"] += 1
+        connecting["max"] = max(connecting["max"], connecting["now"])
+        try:
+            await asyncio.sleep(CONNECT_TIME)
+        finally:
+            connecting["now"] -= 1
+        client = MagicMock()
+        client.is_connected = True
+        client.write_gatt_char = AsyncMock()
+        client.disconnect = AsyncMock()
+        clients[device.address] = client
+        return client
+
+    with patch(
+        "custom_components.leddmx.dmxled.bluetooth.async_ble_device_from_address",
+        return_value=None,
+    ), patch(
+        "custom_components.leddmx.dmxled.establish_connection",
+        side_effect=_establish_connection,
+    ):
+        instances = [
+            BJLEDInstance(mac, f"LEDDMX-{index}", False, 0, hass)
+            for index, mac in enumerate(MACS)
+        ]
+        for instance in instances:
+            instance.set_available(True)
+        hass.data[DOMAIN] = {
+            f"entry_{index}": instance for index, instance in enumerate(instances)
+        }
+        yield instances, clients, connecting
+
+
+@pytest.mark.asyncio
+async def test_group_fans_out_concurrently(hass, members):
+    """Test members connect and write in parallel, not one after another."""
+    instances, clients, connecting = members
+    group = BJLEDGroup("Stage", MACS, hass, max_parallel=4)
+
+    sent = await group.apply_state(rgb=(255, 0, 0), brightness=255)
+
+    assert sent == 4
+    assert connecting["max"] == len(MACS)
+    stats = group.last_fan_out
+    assert set(stats.latencies) == {instance.name for instance in instances}
+    assert stats.failures == 0
+    assert all(instance.is_on for instance in instances)
+    assert group.rgb_color == (255, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_group_bounds_parallelism(hass, members):
+    """Test no more than max_parallel members are in flight at once."""
+    _, _, connecting = members
+    group = BJLEDGroup("Stage", MACS, hass, max_parallel=2)
+
+    await group.apply_state(rgb=(0, 255, 0))
+
+    assert connecting["max"] == 2
+    assert group.last_fan_out.spread >= CONNECT_TIME * 0.8
+
+
+@pytest.mark.asyncio
+async def test_group_shares_encoded_frame(hass, members):
+    """Test members with the same pipeline write the same frame object."""
+    _, clients, _ = members
+    group = BJLEDGroup("Stage", MACS, hass)
+
+    await group.apply_state(rgb=(12, 34, 56), brightness=200)
+
+    frames = [client.write_gatt_char.call_args[0][1] for client in clients.values()]
+    assert len(frames) == 4
+    assert all(frame is frames[0] for frame in frames)
+
+
+@pytest.mark.asyncio
+async def test_group_notifies_members(hass, members):
+    """Test member entities are told to publish the state the group set."""
+    instances, _, _ = members
+    callbacks = [MagicMock() for _ in instances]
+    for instance, callback in zip(instances, callbacks):
+        instance.register_callback(callback)
+    group = BJLEDGroup("Stage", MACS, hass)
+
+    await group.turn_off()
+
+    assert all(callback.call_count == 1 for callback in callbacks)
+    assert group.is_on is False
+
+
+@pytest.mark.asyncio
+async def test_group_tolerates_partial_failure(hass, members):
+    """Test one failing member does not fail the group command."""
+    instances, _, _ = members
+    instances[1].apply_state = AsyncMock(side_effect=BleakDBusError("err", []))
+    group = BJLEDGroup("Stage", MACS, hass)
+
+    await group.apply_state(rgb=(0, 0, 255))
+
+    assert group.last_fan_out.failures == 1
+    assert instances[1].name not in group.last_fan_out.latencies
+
+
+@pytest.mark.asyncio
+async def test_group_raises_when_all_members_fail(hass, members):
+    """Test the error surfaces when no member could be written."""
+    instances, _, _ = members
+    for instance in instances:
+        instance.turn_off = AsyncMock(side_effect=BleakDBusError("err", []))
+    group = BJLEDGroup("Stage", MACS, hass)
+
+    with pytest.raises(BleakDBusError):
+        await group.turn_off()
+
+
+@pytest.mark.asyncio
+async def test_group_diagnostics_reports_missing_members(hass, members):
+    """Test members that are not loaded are skipped and counted."""
+    group = BJLEDGroup("Stage", MACS + ["AA:BB:CC:DD:EE:99"], hass)
+
+    diagnostics = group.diagnostics()
+
+    assert diagnostics["members"] == [f"LEDDMX-{index}" for index in range(4)]
+    assert diagnostics["missing_members"] == 1
+    assert diagnostics["last_fan_out"] is None
@@ -8,7 +8,9 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
 from custom_components.leddmx import async_setup_entry, async_unload_entry
+from custom_components.leddmx.color import DEFAULT_PIPELINE
 from custom_components.leddmx.const import DOMAIN
+from custom_components.leddmx.dmxled import _scaled_rgb_frame
 
 
 @pytest.fixture
@@ -23,6 +25,35 @@ def mock_config_entry():
     return entry
 
 
+@pytest.fixture(autouse=True)
+def mock_gatt_cache():
+    """Mock loading the persistent GATT cache."""
+    with patch(
+        "custom_components.leddmx.async_get_gatt_cache", AsyncMock()
+    ) as mock:
+        yield mock
+
+
+@pytest.fixture(autouse=True)
+def mock_track_unavailable():
+    """Mock the bluetooth unavailable tracking."""
+    with patch(
+        "custom_components.leddmx.bluetooth.async_track_unavailable",
+        return_value=MagicMock(),
+    ) as mock:
+        yield mock
+
+
+@pytest.fixture(autouse=True)
+def mock_register_callback():
+    """Mock the bluetooth advertisement callback registration."""
+    with patch(
+        "custom_components.leddmx.bluetooth.async_register_callback",
+        return_value=MagicMock(),
+    ) as mock:
+        yield mock
+
+
 @pytest.fixture
 def mock_bjled_instance():
     """Create a mock BJLEDInstance."""
@@ -97,3 +128,78 @@ async def test_async_unload_entry_failure(
     mock_bjled_instance.stop.assert_not_called()
     # The code removes the entry from hass.data even on failure (line 44 always executes)
     assert mock_config_entry.entry_id not in hass.data[DOMAIN]
+
+
+@pytest.mark.asyncio
+@patch("custom_components.leddmx.BJLEDInstance")
+async def test_async_setup_entry_prewarms_on_advertisement(
+    mock_bjled_class,
+    hass: HomeAssistant,
+    mock_config_entry,
+    mock_bjled_instance,
+    mock_register_callback,
+):
+    """Test advertisements of the device are routed to the instance."""
+    mock_bjled_class.return_value = mock_bjled_instance
+
+    await async_setup_entry(hass, mock_config_entry)
+
+    matcher = mock_register_callback.call_args[0][2]
+    assert matcher["address"] == "AA:BB:CC:DD:EE:FF"
+    advertisement_callback = mock_register_callback.call_args[0][1]
+    advertisement_callback(MagicMock(), MagicMock())
+    mock_bjled_instance.advertisement_seen.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("custom_components.leddmx.BJLEDInstance")
+async def test_async_setup_entry_tracks_unavailable(
+    mock_bjled_class,
+    hass: HomeAssistant,
+    mock_config_entry,
+    mock_bjled_instance,
+    mock_track_unavailable,
+):
+    """Test the device is marked unavailable when it stops advertising."""
+    mock_bjled_class.return_value = mock_bjled_instance
+
+    await async_setup_entry(hass, mock_config_entry)
+
+    assert mock_track_unavailable.call_args[0][2] == mock_bjled_instance.mac
+    unavailable_callback = mock_track_unavailable.call_args[0][1]
+    unavailable_callback(MagicMock())
+    mock_bjled_instance.advertising_stopped.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+@patch("custom_components.leddmx.BJLEDInstance")
+async def test_entries_share_color_pipeline_and_frames(
+    mock_bjled_class, hass: HomeAssistant
+):
+    """Test entries with the same color options share encoded frames."""
+    mock_bjled_class.side_effect = lambda *args: MagicMock()
+    options = [
+        {},
+        {"gamma": 1.0, "white_balance": [255, 255, 255]},
+        {"gamma": 2.2},
+        {"gamma": 2.2},
+    ]
+    instances = []
+    for index, entry_options in enumerate(options):
+        entry = MagicMock(spec=ConfigEntry)
+        entry.entry_id = f"entry_{index}"
+        entry.data = {"mac": f"AA:BB:CC:DD:EE:0{index}", "name": f"Strip {index}"}
+        entry.options = entry_options
+        entry.add_update_listener = MagicMock(return_value=MagicMock())
+        await async_setup_entry(hass, entry)
+        instances.append(hass.data[DOMAIN][entry.entry_id])
+
+    pipelines = [instance.color_pipeline for instance in instances]
+    assert pipelines[0] is DEFAULT_PIPELINE
+    assert pipelines[1] is DEFAULT_PIPELINE
+    assert pipelines[2] == pipelines[3] != DEFAULT_PIPELINE
+    frames = [
+        _scaled_rgb_frame(pipeline, (200, 100, 50), 128) for pipeline in pipelines
+    ]
+    assert frames[0] is frames[1]
+    assert frames[2] is frames[3]
@@ -0,0 +1,81 @@
+"""Tests for keepalive module."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.leddmx.keepalive import (
+    KEEPALIVE_DELAYS,
+    MIN_SAMPLES,
+    KeepAlivePolicy,
+)
+
+
+def _policy(gaps, reconnect_time=3.0):
+    policy = KeepAlivePolicy()
+    policy.reconnect_time = reconnect_time
+    for gap in gaps:
+        policy.record_gap(gap, connected=False)
+    return policy
+
+
+def test_not_ready_until_enough_gaps():
+    """Test the configured delay is kept until enough gaps are seen."""
+    policy = _policy([180] * (MIN_SAMPLES - 1))
+
+    assert policy.choose() is None
+
+
+def test_bursts_are_not_gaps():
+    """Test commands in the same burst are not counted as idle gaps."""
+    policy = _policy([0.05] * 20)
+
+    assert policy.samples == 0
+
+
+def test_regular_use_keeps_connection_open():
+    """Test a strip used every three minutes stays connected in between."""
+    policy = _policy([170, 180, 175, 185, 178, 182])
+
+    delay = policy.choose()
+
+    assert delay == 240
+    assert policy.decision["expected_hit_rate"] == 1.0
+
+
+def test_rare_use_disconnects_quickly():
+    """Test a strip used once an hour releases its slot at once."""
+    policy = _policy([3600, 4000, 3800, 5000, 3700])
+
+    assert policy.choose() == KEEPALIVE_DELAYS[0]
+
+
+def test_slot_budget_limits_delay():
+    """Test a tight slot share trades hit rate for slot time."""
+    gaps = [20] * 10 + [280] * 10
+
+    generous = _policy(gaps).choose(slot_share=1.0)
+    tight = _policy(gaps).choose(slot_share=0.3)
+
+    assert generous == 300
+    assert tight == 20
+
+
+def test_recent_gaps_outweigh_old_ones():
+    """Test the histogram decays so the policy follows new habits."""
+    policy = _policy([20] * 30 + [500] * 60)
+
+    assert policy.choose() == 600
+
+
+def test_diagnostics_report_hit_rate():
+    """Test diagnostics carry the histogram, hits and the decision."""
+    policy = KeepAlivePolicy()
+    for connected in (True, True, False, True, True):
+        policy.record_gap(60, connected)
+    policy.choose()
+
+    result = policy.as_dict()
+
+    assert result["hit_rate"] == 0.8
+    assert result["histogram"]["<=60s"] == pytest.approx(4.71, abs=0.01)
+    assert result["decision"]["delay"] == 60
@@ -1,14 +1,29 @@
 """Tests for light platform."""
 from __future__ import annotations
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from homeassistant.components.light import ATTR_BRIGHTNESS, ATTR_EFFECT, ATTR_RGB_COLOR
+from bleak.exc import BleakError
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_EFFECT,
+    ATTR_RGB_COLOR,
+    ATTR_TRANSITION,
+)
 from homeassistant.const import CONF_MAC
+from homeassistant.core import State
 
-from custom_components.leddmx.light import BJLEDLight, async_setup_entry
-from custom_components.leddmx.const import DOMAIN
+from custom_components.leddmx.group import BJLEDGroup
+from custom_components.leddmx.light import (
+    BJLEDExtraStoredData,
+    BJLEDGroupLight,
+    BJLEDLight,
+    async_setup_entry,
+)
+from custom_components.leddmx.const import DOMAIN, EVENT_COMMAND_FAILED
+from custom_components.leddmx.publish import PublishThrottle
 
 
 @pytest.fixture
@@ -17,6 +32,10 @@ def mock_bjled_instance():
     instance = MagicMock()
     instance.mac = "AA:BB:CC:DD:EE:FF"
     instance.name = "Test LEDDMX"
+    instance.available = True
+    instance.optimistic = False
+    instance.state_throttle = PublishThrottle()
+    instance.output_rgb = None
     instance.is_on = True
     instance.brightness = 255
     instance.rgb_color = (255, 0, 0)
@@ -28,6 +47,7 @@ def mock_bjled_instance():
     instance.set_rgb_color = AsyncMock()
     instance.set_brightness_local = AsyncMock()
     instance.set_effect = AsyncMock()
+    instance.apply_state = AsyncMock(return_value=1)
     instance.update = AsyncMock()
     return instance
 
@@ -61,6 +81,9 @@ class TestBJLEDLight:
         light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry_id")
         assert light.available is True
 
+        mock_bjled_instance.available = False
+        assert light.available is False
+
     def test_brightness(self, mock_bjled_instance):
         """Test brightness property."""
         light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry_id")
@@ -99,13 +122,15 @@ class TestBJLEDLight:
     @pytest.mark.asyncio
     async def test_async_turn_on(self, mock_bjled_instance):
         """Test turning on the light."""
-        mock_bjled_instance.is_on = False  # Light is off, so turn_on should be called
+        mock_bjled_instance.is_on = False
         light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry_id")
         light.async_write_ha_state = MagicMock()
         
         await light.async_turn_on()
         
-        mock_bjled_instance.turn_on.assert_called_once()
+        mock_bjled_instance.apply_state.assert_called_once_with(
+            rgb=None, brightness=None, effect=None
+        )
         light.async_write_ha_state.assert_called_once()
 
     @pytest.mark.asyncio
@@ -116,7 +141,9 @@ class TestBJLEDLight:
         
         await light.async_turn_on(**{ATTR_BRIGHTNESS: 128})
         
-        mock_bjled_instance.set_brightness_local.assert_called_once_with(128)
+        mock_bjled_instance.apply_state.assert_called_once_with(
+            rgb=None, brightness=128, effect=None
+        )
         light.async_write_ha_state.assert_called_once()
 
     @pytest.mark.asyncio
@@ -127,9 +154,25 @@ class TestBJLEDLight:
         
         await light.async_turn_on(**{ATTR_RGB_COLOR: (0, 255, 0)})
         
-        mock_bjled_instance.set_rgb_color.assert_called_once_with((0, 255, 0), None)
+        mock_bjled_instance.apply_state.assert_called_once_with(
+            rgb=(0, 255, 0), brightness=None, effect=None
+        )
         light.async_write_ha_state.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_async_turn_on_with_brightness_and_rgb(self, mock_bjled_instance):
+        """Test brightness and color are applied in a single call."""
+        light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry_id")
+        light.async_write_ha_state = MagicMock()
+
+        await light.async_turn_on(**{ATTR_BRIGHTNESS: 128, ATTR_RGB_COLOR: (0, 255, 0)})
+
+        mock_bjled_instance.apply_state.assert_called_once_with(
+            rgb=(0, 255, 0), brightness=128, effect=None
+        )
+        mock_bjled_instance.turn_on.assert_not_called()
+        mock_bjled_instance.set_brightness_local.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_async_turn_on_with_effect(self, mock_bjled_instance):
         """Test turning on with effect."""
@@ -138,9 +181,36 @@ class TestBJLEDLight:
         
         await light.async_turn_on(**{ATTR_EFFECT: "AUTO"})
         
-        mock_bjled_instance.set_effect.assert_called_once_with("AUTO")
+        mock_bjled_instance.apply_state.assert_called_once_with(
+            rgb=None, brightness=None, effect="AUTO"
+        )
         light.async_write_ha_state.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_async_turn_on_with_transition(self, mock_bjled_instance):
+        """Test a transition is handed to the instance."""
+        light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry_id")
+        light.async_write_ha_state = MagicMock()
+
+        await light.async_turn_on(**{ATTR_TRANSITION: 2, ATTR_RGB_COLOR: (0, 0, 255)})
+
+        mock_bjled_instance.start_transition.assert_called_once_with(
+            2, rgb=(0, 0, 255), brightness=None
+        )
+        mock_bjled_instance.apply_state.assert_not_called()
+        light.async_write_ha_state.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_async_turn_off_with_transition(self, mock_bjled_instance):
+        """Test turning off with a transition fades out."""
+        light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry_id")
+        light.async_write_ha_state = MagicMock()
+
+        await light.async_turn_off(**{ATTR_TRANSITION: 1})
+
+        mock_bjled_instance.start_transition.assert_called_once_with(1, turn_off=True)
+        mock_bjled_instance.turn_off.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_async_turn_off(self, mock_bjled_instance):
         """Test turning off the light."""
@@ -176,6 +246,187 @@ class TestBJLEDLight:
         light.async_write_ha_state.assert_called_once()
 
 
+def _optimistic_light(instance, hass):
+    light = BJLEDLight(instance, "Test Light", "test_entry_id")
+    light.hass = hass
+    light.entity_id = "light.test_light"
+    hass.async_create_background_task = MagicMock(
+        side_effect=lambda coro, name: asyncio.create_task(coro)
+    )
+    published = []
+    light.async_write_ha_state = MagicMock(
+        side_effect=lambda: published.append((light.is_on, light.rgb_color))
+    )
+    instance.optimistic = True
+    return light, published
+
+
+@pytest.mark.asyncio
+async def test_optimistic_turn_on_publishes_before_write(hass, mock_bjled_instance):
+    """Test the target is published at once and kept when the write succeeds."""
+    mock_bjled_instance.is_on = False
+    gate = asyncio.Event()
+
+    async def _apply_state(**kwargs):
+        await gate.wait()
+        mock_bjled_instance.is_on = True
+        mock_bjled_instance.rgb_color = kwargs["rgb"]
+        return 1
+
+    mock_bjled_instance.apply_state = AsyncMock(side_effect=_apply_state)
+    light, published = _optimistic_light(mock_bjled_instance, hass)
+
+    await light.async_turn_on(**{ATTR_RGB_COLOR: (0, 0, 255)})
+    assert published == [(True, (0, 0, 255))]
+
+    gate.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert published[-1] == (True, (0, 0, 255))
+    assert light._optimistic is None
+    hass.bus.async_fire.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_optimistic_failure_rolls_back(hass, mock_bjled_instance):
+    """Test a failed write restores the previous state and fires an event."""
+    mock_bjled_instance.is_on = True
+    mock_bjled_instance.turn_off = AsyncMock(side_effect=BleakError("unreachable"))
+    light, published = _optimistic_light(mock_bjled_instance, hass)
+
+    await light.async_turn_off()
+    await asyncio.sleep(0)
+
+    assert published == [(False, (255, 0, 0)), (True, (255, 0, 0))]
+    event, data = hass.bus.async_fire.call_args[0]
+    assert event == EVENT_COMMAND_FAILED
+    assert data["entity_id"] == "light.test_light"
+    assert data["command"] == "turn_off"
+    assert data["target"] == {"is_on": False}
+
+
+@pytest.mark.asyncio
+async def test_optimistic_newer_command_keeps_its_target(hass, mock_bjled_instance):
+    """Test a stale write finishing does not clear a newer optimistic target."""
+    turn_on_done = asyncio.Event()
+    turn_off_done = asyncio.Event()
+
+    async def _apply_state(**kwargs):
+        await turn_on_done.wait()
+
+    async def _turn_off():
+        await turn_off_done.wait()
+
+    mock_bjled_instance.apply_state = AsyncMock(side_effect=_apply_state)
+    mock_bjled_instance.turn_off = AsyncMock(side_effect=_turn_off)
+    light, published = _optimistic_light(mock_bjled_instance, hass)
+
+    await light.async_turn_on(**{ATTR_RGB_COLOR: (0, 255, 0)})
+    await light.async_turn_off()
+    turn_on_done.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert light.is_on is False
+    assert len(published) == 2
+
+    turn_off_done.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert light._optimistic is None
+    assert len(published) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_frames_publish_throttled(hass, mock_bjled_instance):
+    """Test stream frames are published at the throttled rate, commands at once."""
+    output_callbacks = []
+    mock_bjled_instance.register_output_callback = lambda cb: output_callbacks.append(cb)
+    mock_bjled_instance.state_throttle = PublishThrottle(rate=1)
+    light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry")
+    light.hass = hass
+    light.async_on_remove = MagicMock()
+    light.async_write_ha_state = MagicMock()
+    await light.async_added_to_hass()
+
+    for _ in range(10):
+        output_callbacks[0]()
+    assert light.async_write_ha_state.call_count == 1
+
+    await light.async_turn_off()
+    assert light.async_write_ha_state.call_count == 2
+    stats = mock_bjled_instance.state_throttle.as_dict()
+    assert stats["writes_unthrottled"] == 11
+    assert stats["writes"] == 2
+
+
+def test_output_color_not_recorded(mock_bjled_instance):
+    """Test the per-frame output color is kept out of the recorder."""
+    mock_bjled_instance.output_rgb = (10, 20, 30)
+    light = BJLEDLight(mock_bjled_instance, "Test Light", "test_entry")
+
+    assert light.extra_state_attributes["output_rgb"] == (10, 20, 30)
+    assert "output_rgb" in light._unrecorded_attributes
+
+
+async def _added_with_restored(instance, hass, state, extra=None):
+    light = BJLEDLight(instance, "Test Light", "test_entry")
+    light.hass = hass
+    light.async_on_remove = MagicMock()
+    with patch.object(
+        BJLEDLight, "async_get_last_state", AsyncMock(return_value=state)
+    ), patch.object(
+        BJLEDLight, "async_get_last_extra_data", AsyncMock(return_value=extra)
+    ):
+        await light.async_added_to_hass()
+    return light
+
+
+@pytest.mark.asyncio
+async def test_restores_last_state_into_instance(hass, mock_bjled_instance):
+    """Test the stored color and brightness are restored, also while off."""
+    extra = BJLEDExtraStoredData((0, 128, 255), 100, None)
+
+    light = await _added_with_restored(
+        mock_bjled_instance, hass, State("light.test", "off"), extra
+    )
+
+    mock_bjled_instance.restore_state.assert_called_once_with(
+        False, (0, 128, 255), 100, None
+    )
+    assert light.extra_restore_state_data.as_dict() == {
+        "rgb_color": (255, 0, 0),
+        "brightness": 255,
+        "effect": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_restores_from_attributes_without_extra_data(hass, mock_bjled_instance):
+    """Test a state stored without extra data is restored from its attributes."""
+    state = State(
+        "light.test",
+        "on",
+        {ATTR_RGB_COLOR: [1, 2, 3], ATTR_BRIGHTNESS: 50, ATTR_EFFECT: "Candle Flicker"},
+    )
+
+    await _added_with_restored(mock_bjled_instance, hass, state)
+
+    mock_bjled_instance.restore_state.assert_called_once_with(
+        True, (1, 2, 3), 50, "Candle Flicker"
+    )
+
+
+@pytest.mark.asyncio
+async def test_unavailable_state_not_restored(hass, mock_bjled_instance):
+    """Test nothing is restored from an unavailable state."""
+    await _added_with_restored(
+        mock_bjled_instance, hass, State("light.test", "unavailable")
+    )
+
+    mock_bjled_instance.restore_state.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_async_setup_entry(hass, mock_config_entry, mock_bjled_instance):
     """Test async_setup_entry."""
@@ -187,3 +438,43 @@ async def test_async_setup_entry(hass, mock_config_entry, mock_bjled_instance):
     async_add_devices.assert_called_once()
     assert len(async_add_devices.call_args[0][0]) == 1
     assert isinstance(async_add_devices.call_args[0][0][0], BJLEDLight)
+
+
+@pytest.mark.asyncio
+async def test_async_setup_entry_group(hass, mock_config_entry):
+    """Test a group entry adds a group light with its own unique id."""
+    group = BJLEDGroup("Stage", ["AA:BB:CC:DD:EE:FF"], hass)
+    hass.data[DOMAIN] = {mock_config_entry.entry_id: group}
+    async_add_devices = MagicMock()
+
+    await async_setup_entry(hass, mock_config_entry, async_add_devices)
+
+    light = async_add_devices.call_args[0][0][0]
+    assert isinstance(light, BJLEDGroupLight)
+    assert light.unique_id == "group_test_entry_id"
+    assert light.device_info is None
+
+
+@pytest.mark.asyncio
+async def test_group_light_publishes_after_fan_out(hass):
+    """Test a group light is never optimistic and publishes once members are written."""
+    group = BJLEDGroup("Stage", ["AA:BB:CC:DD:EE:FF"], hass)
+    gate = asyncio.Event()
+
+    async def _apply_state(**kwargs):
+        await gate.wait()
+
+    group.apply_state = AsyncMock(side_effect=_apply_state)
+    light = BJLEDGroupLight(group, "Stage", "test_entry_id")
+    light.hass = hass
+    light.async_write_ha_state = MagicMock()
+    hass.async_create_background_task = MagicMock()
+
+    turn_on = asyncio.create_task(light.async_turn_on(**{ATTR_RGB_COLOR: (0, 0, 255)}))
+    await asyncio.sleep(0)
+    light.async_write_ha_state.assert_not_called()
+
+    gate.set()
+    await turn_on
+    light.async_write_ha_state.assert_called_once()
+    hass.async_create_background_task.assert_not_called()
@@ -0,0 +1,76 @@
+"""Tests for publish module."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.leddmx.publish import PublishThrottle
+
+
+@pytest.mark.asyncio
+async def test_intermediate_publishes_are_rate_limited():
+    """Test the first intermediate publish is immediate and the rest wait."""
+    throttle = PublishThrottle(rate=20)
+    publish = MagicMock()
+
+    for _ in range(5):
+        throttle.intermediate(publish)
+    assert publish.call_count == 1
+
+    await asyncio.sleep(0.08)
+    # The suppressed requests are written once, at the end of the interval
+    assert publish.call_count == 2
+    assert throttle.as_dict()["intermediate_published"] == 2
+    assert throttle.as_dict()["suppressed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_final_replaces_pending_publish():
+    """Test a final state is published at once and drops the pending one."""
+    throttle = PublishThrottle(rate=20)
+    publish = MagicMock()
+
+    throttle.intermediate(publish)
+    throttle.intermediate(publish)
+    throttle.final(publish)
+    await asyncio.sleep(0.08)
+
+    assert publish.call_count == 2
+    assert throttle.as_dict()["final_published"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_drops_pending_publish():
+    """Test a removed entity is not written after it is gone."""
+    throttle = PublishThrottle(rate=20)
+    publish = MagicMock()
+
+    throttle.intermediate(publish)
+    throttle.intermediate(publish)
+    throttle.cancel()
+    await asyncio.sleep(0.08)
+
+    assert publish.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_bus_load_with_and_without_throttling():
+    """Measure state writes for a 50 fps stream with and without throttling."""
+    unthrottled = MagicMock()
+    throttled = MagicMock()
+    throttle = PublishThrottle(rate=10)
+
+    for _ in range(25):
+        unthrottled()
+        throttle.intermediate(throttled)
+        await asyncio.sleep(0.02)
+    unthrottled()
+    throttle.final(throttled)
+
+    stats = throttle.as_dict()
+    assert stats["writes_unthrottled"] == unthrottled.call_count == 26
+    assert stats["writes"] == throttled.call_count
+    # Half a second at 10 writes/s, plus the final state
+    assert 4 <= throttled.call_count <= 8
@@ -0,0 +1,109 @@
+"""Tests for ratelimit module."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.leddmx.dmxled import BJLEDInstance, BJLEDWriteQueue
+from custom_components.leddmx.ratelimit import (
+    BURST,
+    DECREASE_FACTOR,
+    INCREASE_AFTER,
+    MIN_RATE,
+    TokenBucket,
+)
+
+
+@pytest.mark.asyncio
+async def test_burst_then_paced():
+    """Test a burst goes through at once and later frames are paced."""
+    bucket = TokenBucket(rate=50)
+
+    waits = [await bucket.acquire() for _ in range(BURST + 2)]
+
+    assert waits[:BURST] == [0.0] * BURST
+    assert all(0.01 < wait < 0.1 for wait in waits[BURST:])
+    assert bucket.waits == 2
+
+
+def test_congestion_lowers_rate():
+    """Test failed and slow writes cut the rate, down to the minimum."""
+    bucket = TokenBucket(rate=20)
+
+    bucket.record_write(0.001, ok=False)
+    assert bucket.rate == 20 * DECREASE_FACTOR
+
+    bucket.record_write(1.0, ok=True)
+    assert bucket.rate == 20 * DECREASE_FACTOR**2
+
+    for _ in range(20):
+        bucket.record_write(0.001, ok=False)
+    assert bucket.rate == MIN_RATE
+
+
+@pytest.mark.asyncio
+async def test_clean_writes_recover_up_to_configured_rate():
+    """Test the rate climbs back while frames are held back, never above the cap."""
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.record_write(0.001, ok=False)
+    low = bucket.rate
+
+    for _ in range(4):
+        await bucket.acquire()
+        for _ in range(INCREASE_AFTER):
+            bucket.record_write(0.001, ok=True)
+
+    assert bucket.rate == 10
+    assert bucket.rate > low
+    assert bucket.increases == 3
+
+
+def test_fixed_rate_does_not_adapt():
+    """Test adaptation can be turned off."""
+    bucket = TokenBucket(rate=20, adaptive=False)
+
+    bucket.record_write(1.0, ok=False)
+
+    assert bucket.rate == 20
+
+
+@pytest.mark.asyncio
+async def test_queue_keeps_final_frame_of_a_flood():
+    """Test frames above the rate are coalesced and the last one is written."""
+    written = []
+
+    async def _writer(data):
+        written.append(bytes(data))
+
+    queue = BJLEDWriteQueue("test", _writer, limiter=TokenBucket(rate=20))
+    tasks = []
+    for value in range(30):
+        tasks.append(asyncio.create_task(queue.submit(bytearray([value]))))
+        await asyncio.sleep(0.005)
+    await asyncio.gather(*tasks)
+
+    assert written[-1] == bytes([29])
+    assert len(written) < 15
+    assert queue.coalesced == 30 - len(written)
+
+
+@pytest.mark.asyncio
+async def test_transition_ends_on_target_when_limited(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a fade faster than the controller rate still lands on the target."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance._is_on = True
+    instance._rgb_color = (0, 0, 255)
+    instance.transition_fps = 60
+    instance.rate_limiter.configure(10, adaptive=False)
+
+    instance.start_transition(0.3, rgb=(255, 0, 0))
+    await instance._transition_task
+
+    frames = [call.args[1] for call in mock_bleak_client.write_gatt_char.call_args_list]
+    assert bytes(frames[-1]) == instance._rgb_frame((255, 0, 0), 255)
+    assert len(frames) <= BURST + 0.3 * 10 + 1
+    await instance.stop()
@@ -0,0 +1,65 @@
+"""Tests for renderer module."""
+import time
+
+import numpy as np
+import pytest
+
+from custom_components.leddmx.renderer import (
+    HOST_EFFECT_FPS,
+    HOST_EFFECTS,
+    HostEffect,
+    render_effect,
+)
+
+
+@pytest.mark.parametrize("name", list(HOST_EFFECTS))
+def test_render_effect_shape(name):
+    """Test every host effect renders one loop of colors."""
+    effect = HOST_EFFECTS[name]
+
+    frames = render_effect(name, effect.default_color)
+
+    assert frames.shape == (round(effect.loop_seconds * HOST_EFFECT_FPS), 3)
+    assert frames.dtype == np.uint8
+    assert not frames.flags.writeable
+
+
+def test_render_effect_is_cached():
+    """Test rendering the same parameters returns the cached loop."""
+    first = render_effect("Breathing", (255, 0, 0))
+
+    assert render_effect("Breathing", (255, 0, 0)) is first
+    assert render_effect("Breathing", (0, 255, 0)) is not first
+
+
+def test_breathing_follows_base_color():
+    """Test breathing scales the base color and peaks at full intensity."""
+    frames = render_effect("Breathing", (255, 0, 0))
+
+    assert frames[:, 1:].max() == 0
+    assert frames[:, 0].max() == 255
+    assert frames[:, 0].min() < 20
+
+
+def test_strobe_is_on_or_off():
+    """Test strobe frames are either off or the full color."""
+    frames = render_effect("Strobe", (10, 20, 30))
+
+    assert {tuple(color) for color in frames.tolist()} == {(0, 0, 0), (10, 20, 30)}
+
+
+def test_render_sixty_second_loop_is_fast():
+    """Test a 60 second loop renders in milliseconds, not per frame."""
+    HOST_EFFECTS["Test Loop"] = HostEffect(
+        "Test Loop", 60.0, (255, 255, 255), HOST_EFFECTS["Candle Flicker"].render
+    )
+    try:
+        started = time.perf_counter()
+        frames = render_effect("Test Loop", (255, 147, 41), 60)
+        elapsed = time.perf_counter() - started
+    finally:
+        del HOST_EFFECTS["Test Loop"]
+        render_effect.cache_clear()
+
+    assert len(frames) == 3600
+    assert elapsed < 0.1
@@ -0,0 +1,182 @@
+"""Tests for retry module."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from bleak.exc import BleakDBusError, BleakError
+
+from custom_components.leddmx.dmxled import BJLEDInstance
+from custom_components.leddmx.retry import (
+    LaneRegistry,
+    RetryBudget,
+    retry_bluetooth_connection_error,
+    retry_budget,
+)
+
+
+def _dbus_error():
+    return BleakDBusError("org.bluez.Error.Failed", [])
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff():
+    """Shrink the back-off so tests run quickly."""
+    with patch("custom_components.leddmx.retry.BASE_BACKOFF", 0.01):
+        yield
+
+
+def test_backoff_grows_exponentially_with_jitter():
+    """Test each back-off lies in the upper half of a doubling cap."""
+    budget = RetryBudget("test", 5, 100.0, 0.0)
+    with patch("custom_components.leddmx.retry.BASE_BACKOFF", 0.25):
+        for used, cap in ((1, 0.25), (2, 0.5), (3, 1.0), (4, 2.0), (5, 2.0)):
+            budget.used = used
+            assert cap / 2 <= budget.next_backoff() <= cap
+
+
+@pytest.mark.asyncio
+async def test_nested_calls_share_one_budget(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test set_effect("None") calling set_rgb_color retries 3 times, not 9."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    mock_bleak_client.write_gatt_char.side_effect = _dbus_error()
+
+    with pytest.raises(BleakDBusError):
+        await instance.set_effect("None")
+
+    assert mock_bleak_client.write_gatt_char.call_count == 3
+    assert instance.last_retry.used == 3
+    assert instance.last_retry.elapsed > 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_total_time(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test a hanging write is abandoned at the deadline."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    instance.retry_deadline = 0.2
+
+    async def _hang(*args):
+        await asyncio.sleep(10)
+
+    mock_bleak_client.write_gatt_char.side_effect = _hang
+    started = asyncio.get_running_loop().time()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await instance.turn_on()
+
+    assert asyncio.get_running_loop().time() - started < 0.5
+    instance._write_queue.clear()
+
+
+@pytest.mark.asyncio
+async def test_caller_budget_spans_calls(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test calls made under one caller budget draw from the same attempts."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    mock_bleak_client.write_gatt_char.side_effect = [
+        _dbus_error(),
+        None,
+        _dbus_error(),
+        None,
+    ]
+
+    with pytest.raises(BleakDBusError):
+        async with retry_budget(instance.name, attempts=3) as budget:
+            await instance.turn_on()
+            await instance.turn_off()
+
+    assert budget.used == 3
+    assert budget.elapsed > 0
+    assert instance.last_retry is None
+
+
+@pytest.mark.asyncio
+async def test_last_retry_in_diagnostics(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection, mock_bleak_client
+):
+    """Test the attempts and time of the last call are reported."""
+    instance = BJLEDInstance("AA:BB:CC:DD:EE:FF", "LEDDMX-03-DD2B", False, 120, hass)
+    mock_bleak_client.write_gatt_char.side_effect = [BleakError("busy"), None]
+
+    await instance.turn_on()
+
+    last = instance.diagnostics()["retry"]["last"]
+    assert last["attempts"] == 2
+    assert last["backoff"] > 0
+    await instance.stop()
+
+
+@pytest.mark.asyncio
+async def test_newer_operation_supersedes_same_lane():
+    """Test a newer operation cancels the in-flight one of its lane only."""
+
+    class _Device:
+        name = "test"
+        retry_deadline = 5.0
+        last_retry = None
+
+        def __init__(self):
+            self.lanes = LaneRegistry()
+            self.calls = []
+
+        @retry_bluetooth_connection_error(lane="state")
+        async def slow(self, label):
+            self.calls.append(label)
+            await asyncio.sleep(10)
+
+        @retry_bluetooth_connection_error(lane="state")
+        async def fast(self, label):
+            self.calls.append(label)
+            return label
+
+        @retry_bluetooth_connection_error(lane="power")
+        async def power(self):
+            await asyncio.sleep(0.05)
+            return "power"
+
+    device = _Device()
+    stale = asyncio.create_task(device.slow("old"))
+    power = asyncio.create_task(device.power())
+    await asyncio.sleep(0.01)
+
+    assert await device.fast("new") == "new"
+    assert await stale is None
+    assert await power == "power"
+    assert device.calls == ["old", "new"]
+    assert device.lanes.superseded == {"state": 1}
+
+
+@pytest.mark.asyncio
+async def test_cancelling_caller_is_not_superseded():
+    """Test cancelling the caller propagates even once the lane was superseded."""
+
+    class _Device:
+        name = "test"
+        retry_deadline = 5.0
+        last_retry = None
+
+        def __init__(self):
+            self.lanes = LaneRegistry()
+
+        @retry_bluetooth_connection_error(lane="state")
+        async def slow(self):
+            await asyncio.sleep(10)
+
+    device = _Device()
+    task = asyncio.create_task(device.slow())
+    await asyncio.sleep(0.01)
+    device.lanes._inflight["state"].superseded = True
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
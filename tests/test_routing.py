@@ -0,0 +1,127 @@
+"""Tests for routing module."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from bleak.backends.device import BLEDevice
+
+from custom_components.leddmx.dmxled import BJLEDInstance
+from custom_components.leddmx.routing import PATH_STALE, PathTracker
+
+MAC = "AA:BB:CC:DD:EE:FF"
+
+
+def _device(source: str) -> BLEDevice:
+    return BLEDevice(MAC, "LEDDMX-03-DD2B", {"source": source})
+
+
+def _tracker(**rssi_by_source: list[int]) -> PathTracker:
+    tracker = PathTracker()
+    for source, history in rssi_by_source.items():
+        for rssi in history:
+            tracker.record_advertisement(source, _device(source), rssi, 0.0)
+    return tracker
+
+
+def test_strongest_median_rssi_wins():
+    """Test a single strong outlier does not beat a steadily stronger path."""
+    tracker = _tracker(near=[-60, -62, -61], far=[-85, -40, -86])
+
+    assert tracker.strongest(1.0).source == "near"
+    assert tracker.source(1.0) == "near"
+
+
+def test_stale_paths_are_skipped():
+    """Test a scanner that stopped hearing the device is not likely used."""
+    tracker = _tracker(near=[-50])
+    tracker.record_advertisement("far", _device("far"), -90, PATH_STALE + 10)
+
+    assert tracker.strongest(PATH_STALE + 11).source == "far"
+
+
+def test_connected_path_overrides_strongest():
+    """Test the scanner read back from the connection is reported."""
+    tracker = _tracker(near=[-50], far=[-80, -82])
+    tracker.connected = "far"
+
+    assert tracker.source(1.0) == "far"
+    assert tracker.last_rssi == -82
+    assert tracker.as_dict(1.0)["connected"] == "far"
+
+
+@pytest.mark.asyncio
+async def test_slot_follows_scanner_home_assistant_connected_through(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection
+):
+    """Test the slot is charged to the scanner the connection went through."""
+    instance = BJLEDInstance(MAC, "LEDDMX-03-DD2B", False, 120, hass)
+    instance.prepare = MagicMock()
+    with patch.object(instance.loop, "create_task"):
+        for source, rssi in (("hci0", -88), ("proxy", -55), ("hci0", -90)):
+            info = MagicMock(source=source, rssi=rssi, device=_device(source))
+            instance.advertisement_seen(info)
+    assert instance.source == "proxy"
+
+    # Home Assistant picked hci0 anyway, e.g. because the proxy was full
+    hci0 = MagicMock(
+        source="hci0",
+        get_allocations=MagicMock(return_value=MagicMock(slots=3, allocated=[MAC])),
+    )
+    proxy = MagicMock(
+        source="proxy",
+        get_allocations=MagicMock(return_value=MagicMock(slots=3, allocated=[])),
+    )
+    with patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_by_source",
+        return_value=None,
+    ), patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_devices_by_address",
+        return_value=[MagicMock(scanner=proxy), MagicMock(scanner=hci0)],
+    ):
+        await instance.turn_on()
+
+    routing = instance.diagnostics()["routing"]
+    assert routing["connected"] == "hci0"
+    assert routing["paths"]["hci0"]["rssi"] == [-88, -90]
+    assert instance.source == "hci0"
+    assert instance.rssi == -90
+    slots = instance._connections.diagnostics()
+    assert slots["hci0"]["holders"] == ["LEDDMX-03-DD2B"]
+    assert slots["proxy"]["holders"] == []
+    await instance.stop()
+    assert instance.diagnostics()["routing"]["connected"] is None
+
+
+@pytest.mark.asyncio
+async def test_local_adapter_path_is_keyed_by_scanner(
+    hass, mock_ble_device, mock_async_ble_device_from_address,
+    mock_establish_connection
+):
+    """Test a BlueZ path, whose details name no source, is keyed by the scanner."""
+    instance = BJLEDInstance(MAC, "LEDDMX-03-DD2B", False, 120, hass)
+    instance.prepare = MagicMock()
+    bluez = BLEDevice(
+        MAC,
+        "LEDDMX-03-DD2B",
+        {"path": "/org/bluez/hci0/dev_AA", "props": {"Adapter": "/org/bluez/hci0"}},
+    )
+    with patch.object(instance.loop, "create_task"):
+        instance.advertisement_seen(
+            MagicMock(source="00:1A:7D:DA:71:13", rssi=-60, device=bluez)
+        )
+
+    with patch(
+        "custom_components.leddmx.connection.bluetooth.async_scanner_by_source",
+        return_value=None,
+    ):
+        await instance.turn_on()
+
+    routing = instance.diagnostics()["routing"]
+    assert list(routing["paths"]) == ["00:1A:7D:DA:71:13"]
+    # No scanner reports the connection, so the likely one is kept
+    assert routing["connected"] is None
+    assert instance.source == "00:1A:7D:DA:71:13"
+    assert mock_establish_connection.call_args[0][1] is bluez
+    await instance.stop()
@@ -0,0 +1,163 @@
+"""Tests for transition module."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from custom_components.leddmx.codec import decode_frame, encode_rgb
+from custom_components.leddmx.color import DEFAULT_PIPELINE, ColorPipeline
+from custom_components.leddmx.transition import (
+    MODE_PACED,
+    MODE_QUANTIZED,
+    TransitionEngine,
+    paced_schedule,
+    quantized_schedule,
+)
+
+
+def _colors(frames):
+    return [decode_frame(frame).rgb for frame in frames]
+
+
+def test_paced_schedule():
+    """Test a fixed rate schedule has one frame per slot ending on target."""
+    times, frames = paced_schedule(
+        ((0, 0, 0), 255), ((255, 0, 0), 255), 1.0, 10, DEFAULT_PIPELINE
+    )
+
+    assert len(times) == 10
+    assert times[-1] == pytest.approx(1.0)
+    assert _colors(frames)[4] == (128, 0, 0)
+    assert _colors(frames)[-1] == (255, 0, 0)
+
+
+def test_quantized_schedule_matches_sampled_output():
+    """Test change times are exact against densely sampled output."""
+    start, end = ((255, 40, 0), 30), ((255, 160, 20), 90)
+    pipeline = ColorPipeline(gamma=2.2)
+    times, frames = quantized_schedule(start, end, 100.0, pipeline)
+    colors = _colors(frames)
+
+    # Every frame differs from the one before, and the last is the target
+    assert all(a != b for a, b in zip(colors, colors[1:]))
+    assert colors[-1] == pipeline.scale(end[0], end[1])
+
+    # Sampling between change times yields the frame written last
+    sample_times = np.linspace(0, 99.99, 2000)
+    fractions = sample_times / 100.0
+    levels = np.floor(
+        np.array([255, 40, 0, 30]) + np.outer(fractions, [0, 120, 20, 60]) + 0.5
+    ).astype(np.uint8)
+    expected = pipeline.scale_batch(levels[:, :3], levels[:, 3])
+    start_output = pipeline.scale(start[0], start[1])
+    for sample_time, color in zip(sample_times, expected.tolist()):
+        index = np.searchsorted(times, sample_time, side="right") - 1
+        current = colors[index] if index >= 0 else start_output
+        assert current == tuple(color)
+
+
+def test_quantized_schedule_is_sparse_for_long_fades():
+    """Test a 30 minute sunrise writes far fewer frames than a fixed rate."""
+    times, _ = quantized_schedule(
+        ((255, 120, 0), 1), ((255, 120, 0), 255), 1800.0, DEFAULT_PIPELINE
+    )
+
+    assert len(times) <= 255
+    assert len(times) < 1800 * 20 / 100
+
+
+def test_plan_picks_cheaper_mode():
+    """Test short fades are paced and long fades are quantized."""
+    engine = TransitionEngine(fps=20)
+    mode, *_ = engine.plan(((0, 0, 0), 255), ((255, 255, 255), 255), 0.5, DEFAULT_PIPELINE)
+    assert mode == MODE_PACED
+
+    mode, times, _, paced_count = engine.plan(
+        ((0, 0, 0), 255), ((255, 255, 255), 255), 600, DEFAULT_PIPELINE
+    )
+    assert mode == MODE_QUANTIZED
+    assert len(times) < paced_count
+
+
+@pytest.mark.asyncio
+async def test_run_writes_every_frame_and_ends_exactly():
+    """Test a transition writes one frame per slot and ends on the target."""
+    frames = []
+
+    async def _write(frame):
+        frames.append(bytes(frame))
+
+    engine = TransitionEngine(fps=50)
+    stats = await engine.run(
+        ((0, 0, 0), 0), ((255, 0, 0), 255), 0.2, DEFAULT_PIPELINE, _write
+    )
+
+    assert len(frames) == 10
+    assert frames[-1] == encode_rgb(255, 0, 0)
+    assert stats.mode == MODE_PACED
+    assert stats.frames_sent == 10
+    assert stats.frames_dropped == 0
+    assert engine.last_stats is stats
+    assert stats.elapsed == pytest.approx(0.2, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_run_drops_frames_when_writes_overrun():
+    """Test slow writes drop late frames instead of falling behind."""
+    frames = []
+
+    async def _slow_write(frame):
+        await asyncio.sleep(0.05)
+        frames.append(bytes(frame))
+
+    engine = TransitionEngine(fps=100)
+    stats = await engine.run(
+        ((0, 0, 0), 255), ((0, 0, 255), 255), 0.3, DEFAULT_PIPELINE, _slow_write
+    )
+
+    assert stats.frames_dropped > 0
+    assert stats.frames_sent + stats.frames_dropped == stats.frames_planned
+    assert frames[-1] == encode_rgb(0, 0, 255)
+    assert stats.elapsed < 0.5
+    assert stats.as_dict()["frames_dropped"] == stats.frames_dropped
+
+
+@pytest.mark.asyncio
+async def test_run_quantized_prepares_before_long_gaps():
+    """Test the connection is prepared ahead of a frame after an idle gap."""
+    frames = []
+    prepared = []
+
+    async def _write(frame):
+        frames.append(bytes(frame))
+
+    async def _prepare():
+        prepared.append(True)
+
+    engine = TransitionEngine(fps=20)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            "custom_components.leddmx.transition.PREPARE_LEAD_TIME", 0.01
+        )
+        stats = await engine.run(
+            ((0, 0, 0), 255), ((2, 0, 0), 255), 0.2, DEFAULT_PIPELINE, _write, _prepare
+        )
+
+    assert stats.mode == MODE_QUANTIZED
+    assert frames == [encode_rgb(1, 0, 0), encode_rgb(2, 0, 0)]
+    assert prepared
+
+
+@pytest.mark.asyncio
+async def test_run_zero_duration_writes_target():
+    """Test a zero length transition writes the end state once."""
+    frames = []
+
+    async def _write(frame):
+        frames.append(bytes(frame))
+
+    await TransitionEngine().run(
+        ((0, 0, 0), 0), ((1, 2, 3), 255), 0, DEFAULT_PIPELINE, _write
+    )
+
+    assert frames == [encode_rgb(1, 2, 3)]